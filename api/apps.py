@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        # Đăng ký signal và lookup __any (api/utils/lookups.py) cho mọi process dùng app
+        from api import signals  # noqa: F401
+        from api.utils import lookups  # noqa: F401
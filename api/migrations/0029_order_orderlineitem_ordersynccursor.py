@@ -0,0 +1,95 @@
+# Generated by Django 5.1 on 2026-10-17 20:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_alter_usergroup_role_combinelabeltask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(max_length=100)),
+                ('status', models.CharField(max_length=50)),
+                ('buyer_user_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('create_time', models.BigIntegerField()),
+                ('update_time', models.BigIntegerField()),
+                ('paid_time', models.BigIntegerField(null=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('currency', models.CharField(blank=True, max_length=10, null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='api.shop')),
+            ],
+            options={
+                'db_table': 'tiktok_orders',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderLineItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_item_id', models.CharField(max_length=100)),
+                ('product_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('product_name', models.CharField(blank=True, max_length=1000, null=True)),
+                ('sku_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('sku_name', models.CharField(blank=True, max_length=500, null=True)),
+                ('seller_sku', models.CharField(blank=True, max_length=500, null=True)),
+                ('sku_image', models.CharField(blank=True, max_length=1000, null=True)),
+                ('sale_price', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('original_price', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('currency', models.CharField(blank=True, max_length=10, null=True)),
+                ('display_status', models.CharField(blank=True, max_length=50, null=True)),
+                ('package_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='api.order')),
+            ],
+            options={
+                'db_table': 'tiktok_order_line_items',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderSyncCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('update_time_ge', models.BigIntegerField(default=0)),
+                ('backfilled_from', models.BigIntegerField(null=True)),
+                ('last_synced_at', models.DateTimeField(null=True)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('locked_until', models.DateTimeField(null=True)),
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='order_sync_cursor', to='api.shop')),
+            ],
+            options={
+                'db_table': 'tiktok_order_sync_cursors',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', '-create_time'], name='tiktok_order_shop_ctime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', 'status', '-create_time'], name='tiktok_order_shop_st_ctime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['buyer_user_id'], name='tiktok_order_buyer_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('shop', 'order_id'), name='uniq_tiktok_order_shop_order_id'),
+        ),
+        migrations.AddIndex(
+            model_name='orderlineitem',
+            index=models.Index(fields=['product_id'], name='tiktok_line_item_prod_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderlineitem',
+            index=models.Index(fields=['seller_sku'], name='tiktok_line_item_sku_idx'),
+        ),
+    ]
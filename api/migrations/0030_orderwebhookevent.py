@@ -0,0 +1,32 @@
+# Generated by Django 5.1 on 2026-10-17 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_order_orderlineitem_ordersynccursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shop_id_author', models.CharField(max_length=500)),
+                ('order_id', models.CharField(max_length=100)),
+                ('order_status', models.CharField(blank=True, max_length=50, null=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(null=True)),
+                ('locked_until', models.DateTimeField(null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'tiktok_order_webhook_events',
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['received_at'], name='tiktok_webhook_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.1 on 2026-10-17 20:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_orderwebhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_frozen_before', models.DateField(null=True)),
+                ('statement_frozen_before', models.DateField(null=True)),
+                ('statement_backfilled_from', models.DateField(null=True)),
+                ('statement_synced_at', models.DateTimeField(null=True)),
+                ('statement_last_error', models.TextField(blank=True, null=True)),
+                ('statement_locked_until', models.DateTimeField(null=True)),
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup_cursor', to='api.shop')),
+            ],
+            options={
+                'db_table': 'tiktok_rollup_cursors',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=50)),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_daily_rollups', to='api.shop')),
+            ],
+            options={
+                'db_table': 'tiktok_order_daily_rollups',
+                'constraints': [models.UniqueConstraint(fields=('shop', 'day', 'status'), name='uniq_order_rollup_shop_day_st')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderProductDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('product_id', models.CharField(max_length=100)),
+                ('status', models.CharField(max_length=50)),
+                ('product_name', models.CharField(blank=True, max_length=1000, null=True)),
+                ('sku_image', models.CharField(blank=True, max_length=1000, null=True)),
+                ('item_count', models.IntegerField(default=0)),
+                ('sale_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_product_daily_rollups', to='api.shop')),
+            ],
+            options={
+                'db_table': 'tiktok_order_product_daily_rollups',
+                'constraints': [models.UniqueConstraint(fields=('shop', 'day', 'product_id', 'status'), name='uniq_product_rollup_shop_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatementDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('payment_status', models.CharField(max_length=50)),
+                ('statement_count', models.IntegerField(default=0)),
+                ('revenue_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('settlement_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('fee_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('adjustment_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statement_daily_rollups', to='api.shop')),
+            ],
+            options={
+                'db_table': 'tiktok_statement_daily_rollups',
+                'constraints': [models.UniqueConstraint(fields=('shop', 'day', 'payment_status'), name='uniq_statement_rollup_shop_day')],
+            },
+        ),
+    ]
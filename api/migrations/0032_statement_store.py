@@ -0,0 +1,65 @@
+# Generated by Django 5.1 on 2026-10-17 21:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Statement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statement_id', models.CharField(max_length=100)),
+                ('statement_time', models.BigIntegerField()),
+                ('payment_status', models.CharField(max_length=50)),
+                ('currency', models.CharField(blank=True, max_length=10, null=True)),
+                ('revenue_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('settlement_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('fee_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('adjustment_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('data', models.JSONField(default=dict)),
+                ('transactions_summary', models.JSONField(null=True)),
+                ('transactions_synced_at', models.DateTimeField(null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statements', to='api.shop')),
+            ],
+            options={
+                'db_table': 'tiktok_statements',
+            },
+        ),
+        migrations.CreateModel(
+            name='StatementTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.CharField(max_length=100)),
+                ('order_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('statement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='api.statement')),
+            ],
+            options={
+                'db_table': 'tiktok_statement_transactions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='statement',
+            index=models.Index(fields=['shop', 'statement_time'], name='tiktok_stmt_shop_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='statement',
+            constraint=models.UniqueConstraint(fields=('shop', 'statement_id'), name='uniq_tiktok_statement_shop_id'),
+        ),
+        migrations.AddIndex(
+            model_name='statementtransaction',
+            index=models.Index(fields=['order_id'], name='tiktok_stmt_tx_order_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='statementtransaction',
+            constraint=models.UniqueConstraint(fields=('statement', 'transaction_id'), name='uniq_stmt_transaction_id'),
+        ),
+    ]
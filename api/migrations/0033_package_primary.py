@@ -0,0 +1,39 @@
+# Generated by Django 5.1 on 2026-10-17 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_statement_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='is_primary',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['pack_id', 'created_at', 'id'], name='package_pack_ctime_idx'),
+        ),
+        # Đánh dấu package đầu tiên của mỗi pack_id trước khi tạo partial index
+        migrations.RunSQL(
+            sql="""
+                UPDATE api_package p SET is_primary = TRUE
+                FROM (
+                    SELECT DISTINCT ON (pack_id) id FROM api_package
+                    WHERE pack_id IS NOT NULL
+                    ORDER BY pack_id, created_at, id
+                ) first
+                WHERE p.id = first.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(condition=models.Q(('is_primary', True)), fields=['-created_at', '-id'], name='package_primary_ctime_idx'),
+        ),
+    ]
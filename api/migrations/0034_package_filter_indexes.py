@@ -0,0 +1,43 @@
+# Generated by Django 5.1 on 2026-10-17 21:09
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+from api.migrations._trigram import add_trigram_indexes, trigram_index
+
+
+class Migration(migrations.Migration):
+    # Tạo index CONCURRENTLY để không khoá ghi bảng package lớn
+    atomic = False
+
+    dependencies = [
+        ('api', '0033_package_primary'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='package',
+            index=models.Index(condition=models.Q(('is_primary', True)), fields=['shop', '-created_at', '-id'], name='package_shop_ctime_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='package',
+            index=models.Index(condition=models.Q(('is_primary', True)), fields=['fulfillment_name', '-created_at', '-id'], name='package_ff_ctime_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='package',
+            index=models.Index(condition=models.Q(('is_primary', True)), fields=['status', '-created_at', '-id'], name='package_status_ctime_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='package',
+            index=models.Index(condition=models.Q(('is_primary', True)), fields=['shop', 'supify_create_time'], name='package_shop_supify_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='package',
+            index=models.Index(fields=['fulfillment_name', 'supify_create_time'], name='package_ff_supify_idx'),
+        ),
+        # Index trigram cho order_id__icontains / products__product_name__icontains, chỉ khi có pg_trgm
+        add_trigram_indexes([
+            ('package', trigram_index('order_id', 'package_order_id_trgm_idx')),
+            ('productpackage', trigram_index('product_name', 'product_pkg_name_trgm_idx')),
+        ]),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-17 21:16
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+from api.migrations._trigram import add_trigram_indexes, trigram_index
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('api', '0034_package_filter_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='designsku',
+            index=models.Index(fields=['department', 'sku_id'], name='design_sku_dept_sku_idx'),
+        ),
+        # Index trigram cho DesignSkuSearch (icontains và TrigramSimilarity), chỉ khi có pg_trgm
+        add_trigram_indexes([
+            ('designsku', trigram_index('sku_id', 'design_sku_sku_trgm_idx')),
+            ('designsku', trigram_index('product_name', 'design_sku_name_trgm_idx')),
+            ('designsku', trigram_index('variation', 'design_sku_var_trgm_idx')),
+        ]),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0035_design_sku_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSortCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fulfillment_name', models.CharField(max_length=500)),
+                ('day', models.DateField()),
+                ('last_value', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'package_number_sort_counters',
+                'constraints': [models.UniqueConstraint(fields=('fulfillment_name', 'day'), name='uniq_number_sort_ff_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1 on 2026-10-17 21:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0036_number_sort_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='locked_by',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='combinelabeltask',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'PROCESSING'])), fields=['created_at'], name='combine_task_claim_idx'),
+        ),
+        # Báo cho background_processor (LISTEN combine_label_tasks) khi có task cần xử lý,
+        # kể cả task tạo từ script / admin chứ không chỉ từ CombineLabelAPI
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION combine_label_tasks_notify() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('combine_label_tasks', NEW.id::text);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER combine_label_tasks_notify
+                AFTER INSERT OR UPDATE OF status ON combine_label_tasks
+                FOR EACH ROW WHEN (NEW.status = 'PENDING')
+                EXECUTE FUNCTION combine_label_tasks_notify();
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS combine_label_tasks_notify ON combine_label_tasks;
+                DROP FUNCTION IF EXISTS combine_label_tasks_notify();
+            """,
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1 on 2026-10-17 21:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0037_combine_task_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='downloaded_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='downloaded_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='merged_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='merged_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='output_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='progress_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='stage',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='combinelabeltask',
+            name='uploaded_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,47 @@
+"""
+Index trigram (pg_trgm) dùng chung cho các migration.
+
+Server không có contrib pg_trgm thì bỏ qua, các filter icontains vẫn chạy (quét tuần tự). Vì có thể
+không được tạo, các index này không nằm trong model state (không khai báo trong Meta.indexes của
+model), nên state và schema không bao giờ lệch nhau.
+"""
+
+import logging
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import migrations
+from django.db.models.functions import Upper
+
+logger = logging.getLogger(__name__)
+
+
+def trigram_index(field: str, name: str) -> GinIndex:
+    """Index GIN trigram trên UPPER(field), dùng cho field__icontains (UPPER(...) LIKE UPPER('%...%'))."""
+    return GinIndex(OpClass(Upper(field), name="gin_trgm_ops"), name=name)
+
+
+def has_trigram(schema_editor) -> bool:
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def add_trigram_indexes(indexes):
+    """
+    RunPython tạo (CONCURRENTLY) các index ``[(model_name, index), ...]`` của app api nếu có pg_trgm.
+    Migration dùng nó phải đặt ``atomic = False``.
+    """
+
+    def add(apps, schema_editor):
+        if not has_trigram(schema_editor):
+            logger.warning("pg_trgm is not available, skip trigram indexes")
+            return
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for model_name, index in indexes:
+            schema_editor.add_index(apps.get_model("api", model_name), index, concurrently=True)
+
+    def remove(apps, schema_editor):
+        for model_name, index in indexes:
+            schema_editor.remove_index(apps.get_model("api", model_name), index, concurrently=True)
+
+    return migrations.RunPython(add, remove)
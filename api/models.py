@@ -136,6 +136,15 @@ class DesignSku(models.Model):
     type_print = models.CharField(null=True, max_length=50, help_text="type_print", blank=True)
     type_shirt = models.CharField(null=True, max_length=50, help_text="type_shirt", blank=True)
 
+    class Meta:
+        indexes = [
+            # CsvFulfillmentSkuValidationAPI / DesignSkuBySkuId: department + sku_id
+            models.Index(fields=["department", "sku_id"], name="design_sku_dept_sku_idx"),
+        ]
+        # Index trigram cho DesignSkuSearch (icontains trên sku_id / product_name / variation) được
+        # migration 0035 tạo nếu server có pg_trgm, không khai báo ở đây (api/migrations/_trigram.py)
+
+
 class DesignSkuChangeHistory(models.Model):
     design_sku = models.ForeignKey(DesignSku, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
@@ -197,10 +206,32 @@ class CombineLabelTask(models.Model):
     
     # Task tracking
     celery_task_id = models.CharField(max_length=255, null=True, blank=True)
+    # Lease của worker đang xử lý (api/utils/combine_queue.py), được gia hạn bằng heartbeat;
+    # task PROCESSING có lease hết hạn (worker chết) được worker khác nhận lại
+    locked_by = models.CharField(max_length=255, null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    
+    # Tiến độ (api/utils/combine_pipeline.py ghi định kỳ bằng một câu UPDATE)
+    stage = models.CharField(max_length=20, null=True, blank=True)  # download / merge / upload
+    downloaded_count = models.IntegerField(default=0)
+    downloaded_bytes = models.BigIntegerField(default=0)
+    merged_count = models.IntegerField(default=0)
+    merged_bytes = models.BigIntegerField(default=0)
+    output_bytes = models.BigIntegerField(default=0)
+    uploaded_bytes = models.BigIntegerField(default=0)
+    progress_updated_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
         db_table = 'combine_label_tasks'
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                name='combine_task_claim_idx',
+                condition=models.Q(status__in=['PENDING', 'PROCESSING']),
+            ),
+        ]
     
     def __str__(self):
         return f"Combine Task {self.id} - {self.status} - {self.user.username}"
@@ -264,8 +295,44 @@ class Package(models.Model):
         choices=PackageStatus.choices,
         default=PackageStatus.INIT
     )
+    # Package đầu tiên (created_at, id nhỏ nhất) của pack_id, do api/utils/package_query.py duy trì
+    is_primary = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["pack_id", "created_at", "id"], name="package_pack_ctime_idx"),
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="package_primary_ctime_idx",
+                condition=models.Q(is_primary=True),
+            ),
+            # Các bộ lọc của PackageFilter (luôn kèm is_primary, sort created_at desc)
+            models.Index(
+                fields=["shop", "-created_at", "-id"],
+                name="package_shop_ctime_idx",
+                condition=models.Q(is_primary=True),
+            ),
+            models.Index(
+                fields=["fulfillment_name", "-created_at", "-id"],
+                name="package_ff_ctime_idx",
+                condition=models.Q(is_primary=True),
+            ),
+            models.Index(
+                fields=["status", "-created_at", "-id"],
+                name="package_status_ctime_idx",
+                condition=models.Q(is_primary=True),
+            ),
+            models.Index(
+                fields=["shop", "supify_create_time"],
+                name="package_shop_supify_idx",
+                condition=models.Q(is_primary=True),
+            ),
+            # GetNumbersortMax: fulfillment_name + supify_create_time trong ngày
+            models.Index(fields=["fulfillment_name", "supify_create_time"], name="package_ff_supify_idx"),
+        ]
+        # Index trigram cho order_id__icontains được migration 0034 tạo nếu server có pg_trgm
+        # (api/migrations/_trigram.py)
 
-  
 
 
 class ProductPackage(models.Model):
@@ -283,6 +350,9 @@ class ProductPackage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     product_name = models.CharField(max_length=500, null=True)
     sku_custom = models.CharField(null=True, blank=True, max_length=500)
+
+    # Index trigram cho products__product_name__icontains: migration 0034 (api/migrations/_trigram.py)
+
 class CustomUserSendPrint(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     user_code = models.CharField(max_length=1000, blank=True, null=True)
@@ -358,3 +428,248 @@ class CkfVariant(models.Model):
     def __str__(self):
         return f"{self.variant_id} - {self.color} - {self.product_type}"
 
+
+
+class Order(models.Model):
+    """Bản sao đơn hàng TikTok, đồng bộ bởi api.tasks.sync_shop_orders (api/utils/order_sync.py)."""
+
+    shop = models.ForeignKey(Shop, related_name="orders", on_delete=models.CASCADE)
+    order_id = models.CharField(max_length=100)
+    status = models.CharField(max_length=50)
+    buyer_user_id = models.CharField(max_length=100, blank=True, null=True)
+    create_time = models.BigIntegerField()
+    update_time = models.BigIntegerField()
+    paid_time = models.BigIntegerField(null=True)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    currency = models.CharField(max_length=10, blank=True, null=True)
+    # Payload gốc từ TikTok search API (không chứa thông tin shop/credentials)
+    data = JSONField(default=dict)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "tiktok_orders"
+        constraints = [
+            models.UniqueConstraint(fields=["shop", "order_id"], name="uniq_tiktok_order_shop_order_id"),
+        ]
+        indexes = [
+            models.Index(fields=["shop", "-create_time"], name="tiktok_order_shop_ctime_idx"),
+            models.Index(fields=["shop", "status", "-create_time"], name="tiktok_order_shop_st_ctime_idx"),
+            models.Index(fields=["buyer_user_id"], name="tiktok_order_buyer_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} - {self.status}"
+
+
+class OrderLineItem(models.Model):
+    order = models.ForeignKey(Order, related_name="line_items", on_delete=models.CASCADE)
+    line_item_id = models.CharField(max_length=100)
+    product_id = models.CharField(max_length=100, blank=True, null=True)
+    product_name = models.CharField(max_length=1000, blank=True, null=True)
+    sku_id = models.CharField(max_length=100, blank=True, null=True)
+    sku_name = models.CharField(max_length=500, blank=True, null=True)
+    seller_sku = models.CharField(max_length=500, blank=True, null=True)
+    sku_image = models.CharField(max_length=1000, blank=True, null=True)
+    sale_price = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    original_price = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    currency = models.CharField(max_length=10, blank=True, null=True)
+    display_status = models.CharField(max_length=50, blank=True, null=True)
+    package_id = models.CharField(max_length=100, blank=True, null=True)
+
+    class Meta:
+        db_table = "tiktok_order_line_items"
+        indexes = [
+            models.Index(fields=["product_id"], name="tiktok_line_item_prod_idx"),
+            models.Index(fields=["seller_sku"], name="tiktok_line_item_sku_idx"),
+        ]
+
+
+class OrderSyncCursor(models.Model):
+    """Cursor đồng bộ đơn hàng theo update_time của từng shop."""
+
+    shop = models.OneToOneField(Shop, related_name="order_sync_cursor", on_delete=models.CASCADE)
+    # Lần sync tiếp theo lấy các đơn có update_time >= giá trị này
+    update_time_ge = models.BigIntegerField(default=0)
+    # Mốc update_time bắt đầu của lần backfill đầu tiên: mọi đơn tạo từ mốc này đều có trong mirror
+    backfilled_from = models.BigIntegerField(null=True)
+    last_synced_at = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True, null=True)
+    # Khoá để 2 worker không sync cùng một shop
+    locked_until = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = "tiktok_order_sync_cursors"
+
+    def __str__(self):
+        return f"Order sync {self.shop_id} - {self.update_time_ge}"
+
+
+class OrderWebhookEvent(models.Model):
+    """Hàng đợi sự kiện order từ TikTok webhook, được xử lý theo batch bởi api.tasks.process_order_webhook_events."""
+
+    shop_id_author = models.CharField(max_length=500)
+    order_id = models.CharField(max_length=100)
+    order_status = models.CharField(max_length=50, blank=True, null=True)
+    payload = JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True)
+    # Lease của consumer đang xử lý / thời điểm được thử lại sau khi lỗi
+    locked_until = models.DateTimeField(null=True)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        db_table = "tiktok_order_webhook_events"
+        indexes = [
+            models.Index(
+                fields=["received_at"],
+                name="tiktok_webhook_pending_idx",
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+
+class OrderDailyRollup(models.Model):
+    """Tổng hợp đơn theo ngày (UTC, theo create_time) × shop × status, duy trì bởi api/utils/rollup.py."""
+
+    shop = models.ForeignKey(Shop, related_name="order_daily_rollups", on_delete=models.CASCADE)
+    day = models.DateField()
+    status = models.CharField(max_length=50)
+    order_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "tiktok_order_daily_rollups"
+        constraints = [
+            models.UniqueConstraint(fields=["shop", "day", "status"], name="uniq_order_rollup_shop_day_st"),
+        ]
+
+
+class OrderProductDailyRollup(models.Model):
+    """Tổng hợp line item theo ngày × shop × product × status của đơn."""
+
+    shop = models.ForeignKey(Shop, related_name="order_product_daily_rollups", on_delete=models.CASCADE)
+    day = models.DateField()
+    product_id = models.CharField(max_length=100)
+    status = models.CharField(max_length=50)
+    product_name = models.CharField(max_length=1000, blank=True, null=True)
+    sku_image = models.CharField(max_length=1000, blank=True, null=True)
+    item_count = models.IntegerField(default=0)
+    sale_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "tiktok_order_product_daily_rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shop", "day", "product_id", "status"], name="uniq_product_rollup_shop_day"
+            ),
+        ]
+
+
+class StatementDailyRollup(models.Model):
+    """Tổng hợp statement theo ngày (UTC, theo statement_time) × shop × payment_status."""
+
+    shop = models.ForeignKey(Shop, related_name="statement_daily_rollups", on_delete=models.CASCADE)
+    day = models.DateField()
+    payment_status = models.CharField(max_length=50)
+    statement_count = models.IntegerField(default=0)
+    revenue_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    settlement_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    fee_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    adjustment_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "tiktok_statement_daily_rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shop", "day", "payment_status"], name="uniq_statement_rollup_shop_day"
+            ),
+        ]
+
+
+class RollupCursor(models.Model):
+    """Trạng thái rollup thống kê của từng shop."""
+
+    shop = models.OneToOneField(Shop, related_name="rollup_cursor", on_delete=models.CASCADE)
+    # Các ngày trước mốc này đã chốt, không tổng hợp lại nữa (null: chưa build lần đầu)
+    order_frozen_before = models.DateField(null=True)
+    statement_frozen_before = models.DateField(null=True)
+    # Ngày bắt đầu của lần đồng bộ statement đầu tiên: rollup statement đầy đủ từ ngày này
+    statement_backfilled_from = models.DateField(null=True)
+    statement_synced_at = models.DateTimeField(null=True)
+    statement_last_error = models.TextField(blank=True, null=True)
+    # Khoá để 2 worker không sync statement cùng một shop
+    statement_locked_until = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = "tiktok_rollup_cursors"
+
+    def __str__(self):
+        return f"Rollup {self.shop_id} - {self.order_frozen_before}"
+
+
+class Statement(models.Model):
+    """Statement tài chính TikTok của shop, đồng bộ bởi api/utils/statement_sync.py. Statement PAID không thay đổi nữa."""
+
+    shop = models.ForeignKey(Shop, related_name="statements", on_delete=models.CASCADE)
+    statement_id = models.CharField(max_length=100)
+    statement_time = models.BigIntegerField()
+    payment_status = models.CharField(max_length=50)
+    currency = models.CharField(max_length=10, blank=True, null=True)
+    revenue_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    settlement_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    fee_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    adjustment_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # Payload gốc từ TikTok (không chứa thông tin shop)
+    data = JSONField(default=dict)
+    # Phần còn lại của response statement_transactions (ngoài danh sách transaction), có khi đã lưu transaction
+    transactions_summary = JSONField(null=True)
+    transactions_synced_at = models.DateTimeField(null=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "tiktok_statements"
+        constraints = [
+            models.UniqueConstraint(fields=["shop", "statement_id"], name="uniq_tiktok_statement_shop_id"),
+        ]
+        indexes = [
+            models.Index(fields=["shop", "statement_time"], name="tiktok_stmt_shop_time_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.statement_id} - {self.payment_status}"
+
+
+class StatementTransaction(models.Model):
+    statement = models.ForeignKey(Statement, related_name="transactions", on_delete=models.CASCADE)
+    transaction_id = models.CharField(max_length=100)
+    order_id = models.CharField(max_length=100, blank=True, null=True)
+    data = JSONField(default=dict)
+
+    class Meta:
+        db_table = "tiktok_statement_transactions"
+        constraints = [
+            models.UniqueConstraint(fields=["statement", "transaction_id"], name="uniq_stmt_transaction_id"),
+        ]
+        indexes = [
+            models.Index(fields=["order_id"], name="tiktok_stmt_tx_order_idx"),
+        ]
+
+
+class NumberSortCounter(models.Model):
+    """number_sort đã cấp cho package của một fulfillment trong một ngày (giờ Việt Nam), xem api/utils/number_sort.py."""
+
+    fulfillment_name = models.CharField(max_length=500)
+    day = models.DateField()
+    # Số lớn nhất đã cấp trong ngày
+    last_value = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "package_number_sort_counters"
+        constraints = [
+            models.UniqueConstraint(fields=["fulfillment_name", "day"], name="uniq_number_sort_ff_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.fulfillment_name} {self.day} - {self.last_value}"
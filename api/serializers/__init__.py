@@ -263,6 +263,13 @@ class PackageSerializer(serializers.ModelSerializer):
         return package
 
 
+class PackageBulkSerializer(PackageSerializer):
+    """Validate từng dòng của PackageBulkCreate, shop / seller / fulfillment_name do view gán cho cả batch."""
+
+    class Meta(PackageSerializer.Meta):
+        read_only_fields = ["shop", "seller", "fulfillment_name"]
+
+
 class PackageDeactiveSerializer(serializers.ModelSerializer):
     class Meta:
         model = Package
@@ -374,12 +381,15 @@ class CombineLabelTaskSerializer(serializers.ModelSerializer):
             'id', 'user', 'created_at', 'updated_at', 'started_at', 'completed_at',
             'urls', 'total_urls', 'status', 'status_display', 'successful_count',
             'failed_count', 'successful_urls', 'failed_urls', 'drive_link',
-            'error_message', 'duration'
+            'error_message', 'duration', 'stage', 'downloaded_count', 'downloaded_bytes',
+            'merged_count', 'merged_bytes', 'output_bytes', 'uploaded_bytes', 'progress_updated_at'
         ]
         read_only_fields = [
             'id', 'user', 'created_at', 'updated_at', 'started_at', 'completed_at',
             'status', 'successful_count', 'failed_count', 'successful_urls',
-            'failed_urls', 'drive_link', 'error_message'
+            'failed_urls', 'drive_link', 'error_message', 'stage', 'downloaded_count',
+            'downloaded_bytes', 'merged_count', 'merged_bytes', 'output_bytes', 'uploaded_bytes',
+            'progress_updated_at'
         ]
     
     def get_duration(self, obj):
@@ -0,0 +1,40 @@
+"""
+Signal của app api, được đăng ký trong ApiConfig.ready() để mọi nơi lưu model (view, admin, shell,
+Celery, management command) đều chạy chúng.
+
+Package.is_primary (api/utils/package_query.py) được duy trì khi Package được tạo / đổi pack_id / xoá.
+"""
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from api.models import Package
+from api.utils.package_query import refresh_primary
+
+
+@receiver(post_init, sender=Package, dispatch_uid="package_primary_init")
+def remember_pack_id(sender, instance, **kwargs):
+    # Đọc qua __dict__ để không kích hoạt query khi pack_id bị defer
+    instance._loaded_pack_id = instance.__dict__.get("pack_id")
+
+
+@receiver(post_save, sender=Package, dispatch_uid="package_primary_save")
+def refresh_saved_primary(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields is not None and "pack_id" not in update_fields:
+        return
+    loaded = getattr(instance, "_loaded_pack_id", None)
+    if not created and instance.pack_id == loaded:
+        return
+    if instance.pack_id is None and instance.is_primary:
+        Package.objects.filter(pk=instance.pk).update(is_primary=False)
+        instance.is_primary = False
+    changed = refresh_primary([instance.pack_id, loaded])
+    # Giữ instance khớp với DB để lần save() đầy đủ sau không ghi đè is_primary cũ
+    instance.is_primary = changed.get(instance.pk, instance.is_primary)
+    instance._loaded_pack_id = instance.pack_id
+
+
+@receiver(post_delete, sender=Package, dispatch_uid="package_primary_delete")
+def refresh_deleted_primary(sender, instance, **kwargs):
+    if instance.is_primary:
+        refresh_primary([instance.pack_id])
@@ -1,9 +1,6 @@
 from celery import shared_task
-from django.utils import timezone
-from api.models import CombineLabelTask
-from api.utils.pdf.download_pdf import download_pdf_from_url
-from api.utils.pdf.merge_pdf import merge_pdf_files
-from api.utils.google.googleapi import GoogleDriveService
+from api.models import CombineLabelTask, Shop
+from api.utils import combine_pipeline, combine_queue, order_sync, statement_sync
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,83 +15,31 @@ def process_combine_label_task(self, task_id):
     """
     Background task để xử lý combine label
     """
+    worker = combine_queue.worker_name(self.request.id)
+    combine_task = None
     try:
         # Lấy task từ database
-        combine_task = CombineLabelTask.objects.get(id=task_id)
+        CombineLabelTask.objects.get(id=task_id)
         
-        # Update status thành PROCESSING
-        combine_task.status = 'PROCESSING'
-        combine_task.started_at = timezone.now()
+        # Claim task (PENDING -> PROCESSING với lease), background_processor có thể đã nhận task này
+        combine_task = combine_queue.claim_task(worker, task_id=task_id)
+        if combine_task is None:
+            logger.info(f"Combine label task {task_id} is not pending or already claimed, skip")
+            return {'status': 'SKIPPED'}
         combine_task.celery_task_id = self.request.id
-        combine_task.save()
+        CombineLabelTask.objects.filter(pk=task_id, locked_by=worker).update(celery_task_id=self.request.id)
         
         logger.info(f"Starting combine label task {task_id} with {len(combine_task.urls)} URLs")
         
-        # Download PDFs với retry mechanism
-        download_results = []
-        for url in combine_task.urls:
-            result = download_pdf_from_url(url)
-            download_results.append(result)
-            
-            # Update progress (optional)
-            self.update_state(
-                state='PROGRESS',
-                meta={'current': len(download_results), 'total': len(combine_task.urls)}
-            )
-        
-        # Merge PDFs
-        merge_result = merge_pdf_files(download_results)
-        
-        if not merge_result['success']:
-            # Task failed
-            combine_task.status = 'FAILED'
-            combine_task.completed_at = timezone.now()
-            combine_task.error_message = merge_result['error']
-            combine_task.failed_count = len(combine_task.urls)
-            combine_task.failed_urls = merge_result.get('failed_urls', [])
-            combine_task.save()
-            
-            logger.error(f"Combine label task {task_id} failed: {merge_result['error']}")
-            return {'status': 'FAILED', 'error': merge_result['error']}
-        
-        # Upload to Google Drive
-        filename = f"combined_labels_{combine_task.id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        upload_result = GoogleDriveService().upload_pdf_to_drive(
-            merge_result['pdf_buffer'], 
-            filename
-        )
+        def on_progress(stage, done, total):
+            self.update_state(state='PROGRESS', meta={'stage': stage, 'current': done, 'total': total})
         
-        if not upload_result['success']:
-            # Upload failed
-            combine_task.status = 'FAILED'
-            combine_task.completed_at = timezone.now()
-            combine_task.error_message = f"Failed to upload to Google Drive: {upload_result['error']}"
-            combine_task.successful_count = len(merge_result['successful_urls'])
-            combine_task.failed_count = len(merge_result['failed_urls'])
-            combine_task.successful_urls = merge_result['successful_urls']
-            combine_task.failed_urls = merge_result['failed_urls']
-            combine_task.save()
-            
-            logger.error(f"Combine label task {task_id} upload failed: {upload_result['error']}")
-            return {'status': 'FAILED', 'error': upload_result['error']}
-        
-        # Success - Update task với kết quả
-        combine_task.status = 'COMPLETED'
-        combine_task.completed_at = timezone.now()
-        combine_task.drive_link = upload_result['link']
-        combine_task.successful_count = len(merge_result['successful_urls'])
-        combine_task.failed_count = len(merge_result['failed_urls'])
-        combine_task.successful_urls = merge_result['successful_urls']
-        combine_task.failed_urls = merge_result['failed_urls']
-        combine_task.save()
-        
-        logger.info(f"Combine label task {task_id} completed successfully")
-        return {
-            'status': 'COMPLETED',
-            'drive_link': upload_result['link'],
-            'successful_count': len(merge_result['successful_urls']),
-            'failed_count': len(merge_result['failed_urls'])
-        }
+        result = combine_pipeline.process_claimed_task(combine_task, worker, on_progress)
+        if result['status'] != 'COMPLETED':
+            logger.error(f"Combine label task {task_id} {result['status'].lower()}: {result['error']}")
+        else:
+            logger.info(f"Combine label task {task_id} completed successfully")
+        return result
         
     except CombineLabelTask.DoesNotExist:
         logger.error(f"Combine label task {task_id} not found")
@@ -102,14 +47,87 @@ def process_combine_label_task(self, task_id):
     except Exception as e:
         logger.error(f"Error in combine label task {task_id}: {str(e)}")
         
-        # Update task với error
-        try:
-            combine_task = CombineLabelTask.objects.get(id=task_id)
-            combine_task.status = 'FAILED'
-            combine_task.completed_at = timezone.now()
-            combine_task.error_message = str(e)
-            combine_task.save()
-        except:
-            pass
+        # Update task với error, chỉ khi task đã được claim và vẫn thuộc worker này
+        if combine_task is not None:
+            try:
+                combine_queue.finish(combine_task, worker, 'FAILED', error_message=str(e))
+            except Exception:
+                logger.exception(f"Cannot mark combine label task {task_id} as failed")
             
-        return {'status': 'FAILED', 'error': str(e)} 
\ No newline at end of file
+        return {'status': 'FAILED', 'error': str(e)} 
+
+
+@shared_task
+def sync_all_shop_orders():
+    """
+    Periodic task (celery beat): đẩy task sync đơn hàng cho từng shop đang active
+    """
+    shop_ids = list(
+        Shop.objects.filter(is_active=True)
+        .exclude(access_token="")
+        .values_list("id", flat=True)
+    )
+    for shop_id in shop_ids:
+        sync_shop_orders.delay(shop_id)
+    return {'shops': len(shop_ids)}
+
+
+@shared_task
+def sync_shop_orders(shop_id):
+    """
+    Đồng bộ các đơn hàng thay đổi của một shop vào bảng Order
+    """
+    try:
+        shop = Shop.objects.get(id=shop_id)
+    except Shop.DoesNotExist:
+        logger.error(f"Shop {shop_id} not found")
+        return {'status': 'FAILED', 'error': 'Shop not found'}
+    try:
+        synced = order_sync.sync_shop_orders(shop)
+    except Exception as e:
+        return {'status': 'FAILED', 'error': str(e)}
+    if synced is None:
+        return {'status': 'SKIPPED'}
+    return {'status': 'COMPLETED', 'synced': synced}
+
+
+@shared_task
+def process_order_webhook_events():
+    """
+    Periodic task (celery beat): xử lý batch event từ TikTok order webhook
+    """
+    return order_sync.process_webhook_events()
+
+
+@shared_task
+def sync_all_shop_statements():
+    """
+    Periodic task (celery beat): đẩy task sync statement (rollup thống kê tài chính) cho từng shop đang active
+    """
+    shop_ids = list(
+        Shop.objects.filter(is_active=True)
+        .exclude(access_token="")
+        .values_list("id", flat=True)
+    )
+    for shop_id in shop_ids:
+        sync_shop_statements.delay(shop_id)
+    return {'shops': len(shop_ids)}
+
+
+@shared_task
+def sync_shop_statements(shop_id):
+    """
+    Đồng bộ statement các ngày chưa chốt của một shop vào StatementDailyRollup
+    """
+    try:
+        shop = Shop.objects.get(id=shop_id)
+    except Shop.DoesNotExist:
+        logger.error(f"Shop {shop_id} not found")
+        return {'status': 'FAILED', 'error': 'Shop not found'}
+    try:
+        synced = statement_sync.sync_shop_statements(shop)
+    except Exception as e:
+        return {'status': 'FAILED', 'error': str(e)}
+    if synced is None:
+        return {'status': 'SKIPPED'}
+    return {'status': 'COMPLETED', 'synced': synced}
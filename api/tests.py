@@ -1,3 +1,322 @@
-from django.test import TestCase  # noqa: F401
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import (
+    GroupCustom,
+    NumberSortCounter,
+    Order,
+    Package,
+    ProductPackage,
+    Shop,
+    UserGroup,
+    UserShop,
+)
+from api.utils import number_sort, order_pagination, package_bulk
+
+
+class PackageQueryBudgetTests(TestCase):
+    """
+    Số query của các endpoint danh sách package phải cố định, không tăng theo số package trả về
+    (shop và products được nạp sẵn bằng select_related / prefetch_related).
+    """
+
+    # Số query tối đa cho mỗi endpoint
+    BUDGETS = {
+        "filter": 6,
+        "filter_cursor": 6,
+        "list_by_shop": 2,
+        "number_sort_max": 2,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="package_budget")
+        group = GroupCustom.objects.create(group_name="package_budget")
+        UserGroup.objects.create(user=cls.user, group_custom=group, role=1)
+        cls.shop = Shop.objects.create(shop_name="package_budget", access_token="x", auth_code="x")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_packages(self, count):
+        Package.objects.filter(shop=self.shop).delete()
+        for index in range(count):
+            package = Package.objects.create(
+                order_id=f"budget-{index}",
+                pack_id=f"budget-pack-{index}",
+                shop=self.shop,
+                fulfillment_name="Teelover",
+                supify_create_time=timezone.now(),
+                number_sort=index,
+            )
+            ProductPackage.objects.create(package=package, product_name=f"product {index}", quantity=1)
+            ProductPackage.objects.create(package=package, product_name=f"product {index} back", quantity=1)
+
+    def count_queries(self, url, params, expected_items):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        items = data if isinstance(data, list) else data["data"]
+        if isinstance(items, dict):
+            items = items["all_number_sort"]
+        self.assertEqual(len(items), expected_items)
+        return len(context.captured_queries)
+
+    def assert_budget(self, name, url, params=None):
+        params = params or {}
+        counts = []
+        for size in (2, 20):
+            self.create_packages(size)
+            counts.append(self.count_queries(url, {**params, "limit": size}, size))
+        self.assertEqual(counts[0], counts[1], f"{name}: query count grows with page size {counts}")
+        self.assertLessEqual(counts[1], self.BUDGETS[name], f"{name}: {counts[1]} queries")
+
+    def test_package_filter(self):
+        self.assert_budget("filter", reverse("get_packages"), {"shop_id": self.shop.id})
+
+    def test_package_filter_cursor(self):
+        self.assert_budget("filter_cursor", reverse("get_packages"), {"shop_id": self.shop.id, "cursor": ""})
+
+    def test_package_list_by_shop(self):
+        self.assert_budget("list_by_shop", reverse("get_list_package", args=[self.shop.id]))
+
+    def test_number_sort_max(self):
+        self.assert_budget("number_sort_max", reverse("get max number sort"))
+
+
+class PackageBulkTransitionTests(TestCase):
+    """
+    PackageBulkTransition dùng cùng quy tắc với UpdatePackageStatusView / UpdateFulfillmentNameView
+    và chỉ đổi package thuộc shop của người dùng.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="package_bulk")
+        group = GroupCustom.objects.create(group_name="package_bulk")
+        UserGroup.objects.create(user=cls.user, group_custom=group, role=2)
+        cls.shop = Shop.objects.create(shop_name="package_bulk", access_token="x", auth_code="x")
+        cls.other_shop = Shop.objects.create(shop_name="package_bulk_other", access_token="x", auth_code="x")
+        UserShop.objects.create(user=cls.user, shop=cls.shop)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_package(self, status, shop=None, fulfillment_name="Teelover"):
+        return Package.objects.create(
+            order_id=f"bulk-{status}",
+            pack_id=f"bulk-{status}",
+            shop=shop or self.shop,
+            fulfillment_name=fulfillment_name,
+            status=status,
+        )
+
+    def test_check_transition(self):
+        printed = Package.PackageStatus.PRINTED
+        teelover = "Teelover"
+        cancelled = Package.PackageStatus.CANCELLED
+        # In lại và bỏ cancel được phép như ở UpdatePackageStatusView
+        self.assertTrue(package_bulk.check_transition(printed, "Teelover", status=Package.PackageStatus.PRINT_PENDING))
+        self.assertTrue(package_bulk.check_transition(cancelled, "Teelover", status=Package.PackageStatus.INIT))
+        self.assertTrue(package_bulk.check_transition(cancelled, "Teelover", fulfillment_name="Ckf"))
+        self.assertFalse(package_bulk.check_transition(printed, "Teelover", status=printed))
+        self.assertFalse(package_bulk.check_transition(printed, teelover, status=printed, fulfillment_name=teelover))
+        self.assertFalse(package_bulk.check_transition(printed, "Teelover"))
+
+    def test_bulk_transition(self):
+        printed = self.create_package(Package.PackageStatus.PRINTED)
+        cancelled = self.create_package(Package.PackageStatus.CANCELLED)
+        pending = self.create_package(Package.PackageStatus.PRINT_PENDING)
+        result = package_bulk.bulk_transition(
+            Package.objects.filter(shop=self.shop), status=Package.PackageStatus.PRINT_PENDING
+        )
+        self.assertEqual(result, {"matched": 3, "updated": 2, "unchanged": 1, "conflicted": 0})
+        for package in (printed, cancelled, pending):
+            package.refresh_from_db()
+            self.assertEqual(package.status, Package.PackageStatus.PRINT_PENDING)
+
+    def test_view_only_touches_own_shops(self):
+        own = self.create_package(Package.PackageStatus.PRINTED)
+        other = self.create_package(Package.PackageStatus.INIT, shop=self.other_shop)
+        response = self.client.post(
+            reverse("package-bulk-transition"),
+            {"ids": [own.id, other.id], "status": Package.PackageStatus.IN_PRODUCTION},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["updated"], 1)
+        own.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(own.status, Package.PackageStatus.IN_PRODUCTION)
+        self.assertEqual(other.status, Package.PackageStatus.INIT)
+
+    def test_view_rejects_invalid_status(self):
+        package = self.create_package(Package.PackageStatus.PRINTED)
+        response = self.client.post(
+            reverse("package-bulk-transition"), {"ids": [package.id], "status": "unknown"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderPageTotalTests(TestCase):
+    """total_items của get_order_page (đơn đọc từ order mirror) đúng ở mọi trang, kể cả khi offset vượt quá."""
+
+    ORDERS = 37
+    LIMIT = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="order_page")
+        cls.shop = Shop.objects.create(shop_name="order_page", access_token="x", auth_code="x")
+        for index in range(cls.ORDERS):
+            # Cứ 3 đơn chung một create_time
+            create_time = 1_000_000 - index // 3
+            Order.objects.create(
+                shop=cls.shop,
+                order_id=str(index),
+                status="AWAITING_SHIPMENT",
+                create_time=create_time,
+                update_time=create_time,
+                data={"id": str(index), "create_time": create_time},
+            )
+        cls.filters = {
+            "create_time_ge": 0,
+            "create_time_lt": 2_000_000,
+            "order_status": ("AWAITING_SHIPMENT",),
+            "buyer_user_id": "",
+        }
+
+    def get_page(self, offset, page_token=""):
+        return order_pagination.get_order_page(
+            [], [(self.shop, self.user)], self.filters, [], offset, self.LIMIT, page_token
+        )
+
+    def test_offset_pages(self):
+        seen = []
+        for offset in range(6):
+            page, _, total_items = self.get_page(offset)
+            seen.extend(order["id"] for order in page)
+            self.assertEqual(total_items, self.ORDERS, f"offset {offset}")
+        self.assertEqual(sorted(seen, key=int), [str(index) for index in range(self.ORDERS)])
+
+    def test_offset_past_last_page(self):
+        page, next_token, total_items = self.get_page(20)
+        self.assertEqual(page, [])
+        self.assertIsNone(next_token)
+        self.assertEqual(total_items, self.ORDERS)
+
+    def test_page_token(self):
+        seen, token = [], ""
+        while True:
+            page, token, total_items = self.get_page(0, token)
+            seen.extend(order["id"] for order in page)
+            self.assertEqual(total_items, self.ORDERS)
+            if not token:
+                break
+        self.assertEqual(len(seen), self.ORDERS)
+        self.assertEqual(len(set(seen)), self.ORDERS)
+
+
+class NumberSortAllocateTests(TransactionTestCase):
+    """number_sort.allocate cấp số liên tiếp, không trùng, kể cả khi nhiều request chạy đồng thời."""
+
+    FULFILLMENT = "Teelover"
+
+    def setUp(self):
+        self.user = User.objects.create(username="number_sort")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_package(self, number):
+        Package.objects.create(
+            order_id=f"number-sort-{number}",
+            fulfillment_name=self.FULFILLMENT,
+            supify_create_time=timezone.now(),
+            number_sort=number,
+        )
+
+    def test_consecutive_ranges(self):
+        self.assertEqual(number_sort.allocate(self.FULFILLMENT, 3), range(1, 4))
+        self.assertEqual(number_sort.allocate(self.FULFILLMENT), range(4, 5))
+        self.assertEqual(number_sort.allocate(self.FULFILLMENT, 2), range(5, 7))
+        self.assertEqual(number_sort.current(self.FULFILLMENT), 6)
+        # Fulfillment khác có counter riêng
+        self.assertEqual(number_sort.allocate("Ckf", 2), range(1, 3))
+
+    def test_seed_from_existing_max(self):
+        self.create_package(7)
+        self.assertIsNone(number_sort.current(self.FULFILLMENT))
+        self.assertEqual(number_sort.allocate(self.FULFILLMENT, 2), range(8, 10))
+
+    def test_skip_numbers_written_outside_counter(self):
+        self.assertEqual(number_sort.allocate(self.FULFILLMENT), range(1, 2))
+        # Client cũ: GET max + 1 rồi tự ghi số
+        self.create_package(5)
+        response = self.client.get(reverse("get max number sort"), {"fulfillment_name": self.FULFILLMENT, "all": "0"})
+        self.assertEqual(response.json()["data"]["max_number_sort"], 5)
+        self.assertEqual(number_sort.allocate(self.FULFILLMENT), range(6, 7))
+
+    def test_counter_created_concurrently(self):
+        day, _, _ = number_sort.local_day_bounds()
+        real_existing_max = number_sort.existing_max
+
+        def create_counter(fulfillment_name, day):
+            try:
+                NumberSortCounter.objects.create(fulfillment_name=fulfillment_name, day=day, last_value=10)
+            finally:
+                connection.close()
+
+        def existing_max(fulfillment_name, day):
+            # Request khác (connection khác) tạo và commit dòng counter của ngày ngay trước lần create
+            # của request này
+            if not NumberSortCounter.objects.filter(fulfillment_name=fulfillment_name, day=day).exists():
+                thread = threading.Thread(target=create_counter, args=(fulfillment_name, day))
+                thread.start()
+                thread.join()
+            return real_existing_max(fulfillment_name, day)
+
+        with mock.patch.object(number_sort, "existing_max", side_effect=existing_max):
+            self.assertEqual(number_sort.allocate(self.FULFILLMENT, 2), range(11, 13))
+        self.assertEqual(NumberSortCounter.objects.filter(fulfillment_name=self.FULFILLMENT, day=day).count(), 1)
+
+    def test_concurrent_allocations(self):
+        numbers, errors = [], []
+
+        def worker():
+            try:
+                for _ in range(20):
+                    numbers.extend(number_sort.allocate(self.FULFILLMENT))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(numbers), list(range(1, 161)))
+
+    def test_post_count_validation(self):
+        url = reverse("get max number sort")
+        for count in (0, -1, "x", 10**9):
+            response = self.client.post(url, {"fulfillment_name": self.FULFILLMENT, "count": count}, format="json")
+            self.assertEqual(response.status_code, 400, count)
+        response = self.client.post(url, {"fulfillment_name": "unknown", "count": 1}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {"fulfillment_name": self.FULFILLMENT, "count": 3}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["numbers"], [1, 2, 3])
@@ -439,6 +439,11 @@ fulfillment_urls = [
         tiktok.order_action.PackageCreateForTeeClub.as_view(),
         name="package_create_prin_teeclub",
     ),
+    path(
+        "shop/<int:shop_id>/packages/bulk_create/<str:fulfillment_name>",
+        tiktok.order_action.PackageBulkCreate.as_view(),
+        name="package_bulk_create",
+    ),
     path(
         "shop/<int:shop_id>/packages/list",
         tiktok.order_action.PackageListByShop.as_view(),
@@ -572,6 +577,7 @@ packages = [
     path('product-package/<int:pk>/update/', tiktok.order_action.ProductPackageUpdateView.as_view(), name='update-product-package'),
     path('package/<int:pk>/update-status/', tiktok.order_action.UpdatePackageStatusView.as_view(), name='update-package-status'),
     path('package/<int:pk>/update-fulfillment-name/', tiktok.order_action.UpdateFulfillmentNameView.as_view(), name='update-fulfillment-name'),
+    path('packages/bulk-transition/', tiktok.order_action.PackageBulkTransition.as_view(), name='package-bulk-transition'),
     path('package-max/', tiktok.order_action.GetNumbersortMax.as_view(), name='get max number sort' )
 ]
 
@@ -584,9 +590,15 @@ combine_label_urls = [
         'post': 'create',
         'get': 'list'
     }), name='combine-label'),
+    path('combine-label/progress/', combine_label.CombineLabelAPI.as_view({
+        'get': 'progress_list'
+    }), name='combine-label-progress-list'),
     path('combine-label/<int:pk>/', combine_label.CombineLabelAPI.as_view({
         'get': 'retrieve'
     }), name='combine-label-detail'),
+    path('combine-label/<int:pk>/progress/', combine_label.CombineLabelAPI.as_view({
+        'get': 'progress'
+    }), name='combine-label-progress'),
     path('combine-label/<int:pk>/cancel/', combine_label.CombineLabelAPI.as_view({
         'post': 'cancel'
     }), name='combine-label-cancel'),
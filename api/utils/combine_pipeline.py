@@ -0,0 +1,265 @@
+"""
+Pipeline combine label dùng chung cho Celery task (api.tasks.process_combine_label_task) và
+background_processor: tải song song các label ra thư mục tạm, ghép dần vào một file theo thứ tự
+URL trong lúc các label sau vẫn đang tải, rồi upload lên Google Drive và ghi kết quả vào
+CombineLabelTask.
+
+Task phải được nhận trước bằng combine_queue.claim_task; ``process_claimed_task`` giữ lease của
+worker trong suốt quá trình xử lý và dừng ngay khi mất lease (task đã được worker khác nhận lại);
+mọi lần ghi vào task đều kèm điều kiện ``locked_by=worker``. Tiến độ (số label / số byte đã tải,
+đã merge, đã upload) được ghi vào task qua ``TaskProgress`` để API progress của CombineLabelAPI
+đọc mà không cần chờ task xong.
+"""
+
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import suppress
+
+from django.utils import timezone
+
+from api import setup_logging
+from api.models import CombineLabelTask
+from api.utils import combine_queue
+from api.utils.constant import (
+    COMBINE_DOWNLOAD_WORKERS,
+    COMBINE_LABEL_SPOOL_DIR,
+    COMBINE_PROGRESS_INTERVAL_SECONDS,
+    COMBINE_REORDER_WINDOW,
+)
+from api.utils.google.googleapi import GoogleDriveService
+from api.utils.pdf.download_pdf import download_pdf_from_url
+from api.utils.pdf.merge_pdf import merge_pdf_files_to_file
+
+logger = logging.getLogger("api.utils.combine_pipeline")
+setup_logging(logger, is_root=False, level=logging.INFO)
+
+STAGE_DOWNLOAD = "download"
+STAGE_MERGE = "merge"
+STAGE_UPLOAD = "upload"
+
+
+def _download(urls: list, index: int, spool_dir: str):
+    try:
+        result = download_pdf_from_url(urls[index], path=os.path.join(spool_dir, f"{index:05d}.pdf"))
+    except Exception as e:
+        result = {'success': False, 'error': str(e), 'url': urls[index]}
+    return index, result
+
+
+def iter_downloads(
+    urls: list,
+    spool_dir: str,
+    workers: int = COMBINE_DOWNLOAD_WORKERS,
+    window: int = COMBINE_REORDER_WINDOW,
+    on_progress=None,
+):
+    """
+    Tải song song (tối đa ``workers`` luồng) từng URL ra ``spool_dir`` và yield kết quả
+    download_pdf_from_url theo đúng thứ tự URL ngay khi các URL đứng trước đã tải xong (reorder
+    buffer), để merge chạy song song với download. Chỉ tải trước tối đa ``window`` URL so với URL
+    đang chờ, file label được xoá khi consumer đã xử lý xong nên thư mục tạm không phình theo số
+    label. ``on_progress(done, total, result)`` được gọi sau mỗi file tải xong.
+    """
+    total = len(urls)
+    if not total:
+        return
+    buffered = {}
+    running = set()
+    next_submit = next_yield = downloaded = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, total))) as executor:
+        while next_yield < total:
+            while next_submit < total and next_submit - next_yield < window:
+                running.add(executor.submit(_download, urls, next_submit, spool_dir))
+                next_submit += 1
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, result = future.result()
+                buffered[index] = result
+                downloaded += 1
+                if on_progress:
+                    on_progress(downloaded, total, result)
+            while next_yield in buffered:
+                result = buffered.pop(next_yield)
+                next_yield += 1
+                yield result
+                if result.get('path'):
+                    with suppress(OSError):
+                        os.remove(result['path'])
+
+
+def upload_merged(merge_result: dict, task_id, on_progress=None) -> dict:
+    filename = f"combined_labels_{task_id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return GoogleDriveService().upload_pdf_to_drive(merge_result['output_path'], filename, on_progress=on_progress)
+
+
+class TaskProgress:
+    """
+    Gom các trường tiến độ của task và ghi vào DB bằng một câu UPDATE, nhiều nhất một lần mỗi
+    ``interval`` giây (``force=True`` ghi ngay, dùng khi chuyển giai đoạn). Giá trị cũng được gán
+    lên instance ``task``. Chỉ ghi khi task vẫn thuộc ``worker``.
+    """
+
+    def __init__(self, task, worker: str, interval: float = COMBINE_PROGRESS_INTERVAL_SECONDS):
+        self.task = task
+        self.worker = worker
+        self.interval = interval
+        self._pending = {}
+        self._written = 0.0
+
+    def update(self, force: bool = False, **fields):
+        for name, value in fields.items():
+            setattr(self.task, name, value)
+        self._pending.update(fields)
+        if force or time.monotonic() - self._written >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        self.task.progress_updated_at = timezone.now()
+        CombineLabelTask.objects.filter(pk=self.task.pk, locked_by=self.worker).update(
+            progress_updated_at=self.task.progress_updated_at, **self._pending
+        )
+        self._pending = {}
+        self._written = time.monotonic()
+
+
+def run_combine(task, spool_dir: str, lease, on_progress=None) -> dict:
+    """
+    Chạy download -> merge -> upload cho task và ghi kết quả (COMPLETED / FAILED) vào task.
+    Raise combine_queue.LeaseLost nếu ``lease`` bị mất giữa chừng.
+    """
+    total = len(task.urls)
+
+    def progress(stage, done, total):
+        if on_progress:
+            on_progress(stage, done, total)
+
+    started = time.monotonic()
+    task_progress = TaskProgress(task, lease.worker)
+    # Task được nhận lại sau khi worker trước chết thì tính lại tiến độ từ đầu
+    task_progress.update(
+        force=True,
+        stage=STAGE_DOWNLOAD,
+        downloaded_count=0,
+        downloaded_bytes=0,
+        merged_count=0,
+        merged_bytes=0,
+        output_bytes=0,
+        uploaded_bytes=0,
+        successful_count=0,
+        failed_count=0,
+    )
+    downloaded_bytes = merged = merged_bytes = succeeded = failed = 0
+
+    def on_download(done, total, result):
+        nonlocal downloaded_bytes, failed
+        if result.get('success'):
+            downloaded_bytes += result.get('size', 0)
+        else:
+            failed += 1
+        task_progress.update(downloaded_count=done, downloaded_bytes=downloaded_bytes, failed_count=failed)
+        progress(STAGE_DOWNLOAD, done, total)
+
+    def merge_order():
+        # Label thứ i được yield khi label thứ i - 1 đã merge xong
+        nonlocal merged, merged_bytes, succeeded
+        for result in iter_downloads(task.urls, spool_dir, on_progress=on_download):
+            lease.check()
+            yield result
+            merged += 1
+            if result.get('success'):
+                merged_bytes += result.get('size', 0)
+                succeeded += 1
+            task_progress.update(
+                stage=STAGE_MERGE, merged_count=merged, merged_bytes=merged_bytes, successful_count=succeeded
+            )
+            progress(STAGE_MERGE, merged, total)
+
+    merge_result = merge_pdf_files_to_file(merge_order(), os.path.join(spool_dir, "combined.pdf"))
+    # merge_pdf_files_to_file bắt mọi lỗi (kể cả LeaseLost từ merge_order), kiểm tra lại ở đây
+    lease.check()
+    task_progress.flush()
+    logger.info(f"Task {task.id}: downloaded and merged {total} labels in {time.monotonic() - started:.1f}s")
+    if not merge_result['success']:
+        combine_queue.finish(
+            task, lease.worker, 'FAILED',
+            error_message=merge_result['error'],
+            failed_count=total,
+            failed_urls=merge_result.get('failed_urls', []),
+        )
+        return {'status': 'FAILED', 'error': merge_result['error']}
+
+    task_progress.update(
+        force=True,
+        stage=STAGE_UPLOAD,
+        successful_count=len(merge_result['successful_urls']),
+        failed_count=len(merge_result['failed_urls']),
+        output_bytes=merge_result['size'],
+    )
+    progress(STAGE_UPLOAD, 0, 1)
+
+    def on_upload(uploaded, size):
+        task_progress.update(uploaded_bytes=uploaded)
+
+    lease.check()
+    upload_result = upload_merged(merge_result, task.id, on_progress=on_upload)
+    lease.check()
+    results = {
+        'successful_count': len(merge_result['successful_urls']),
+        'failed_count': len(merge_result['failed_urls']),
+        'successful_urls': merge_result['successful_urls'],
+        'failed_urls': merge_result['failed_urls'],
+    }
+    if not upload_result['success']:
+        combine_queue.finish(
+            task, lease.worker, 'FAILED',
+            error_message=f"Failed to upload to Google Drive: {upload_result['error']}",
+            **results,
+        )
+        return {'status': 'FAILED', 'error': upload_result['error']}
+    progress(STAGE_UPLOAD, 1, 1)
+
+    if not combine_queue.finish(
+        task, lease.worker, 'COMPLETED',
+        drive_link=upload_result['link'],
+        uploaded_bytes=merge_result['size'],
+        **results,
+    ):
+        raise combine_queue.LeaseLost(f"Combine task {task.id}: lease lost by {lease.worker}")
+    duration = time.monotonic() - started
+    logger.info(f"Task {task.id}: completed in {duration:.1f}s, drive {upload_result['link']}")
+    return {
+        'status': 'COMPLETED',
+        'drive_link': upload_result['link'],
+        'successful_count': results['successful_count'],
+        'failed_count': results['failed_count'],
+        'duration': round(duration, 1),
+    }
+
+
+def process_claimed_task(task, worker: str, on_progress=None) -> dict:
+    """
+    Xử lý task đã claim bởi ``worker``: giữ lease, spool label ra thư mục tạm (xoá khi xong) và
+    chạy run_combine. Lỗi bất ngờ được ghi vào task (FAILED) thay vì raise; mất lease thì dừng và
+    không ghi gì (status ABORTED), worker đang giữ lease sẽ ghi kết quả.
+    ``on_progress(stage, done, total)`` được gọi theo tiến độ từng giai đoạn.
+    """
+    try:
+        with combine_queue.Lease(task, worker) as lease, tempfile.TemporaryDirectory(
+            prefix=f"combine_{task.id}_", dir=COMBINE_LABEL_SPOOL_DIR
+        ) as spool_dir:
+            return run_combine(task, spool_dir, lease, on_progress)
+    except combine_queue.LeaseLost as e:
+        logger.warning(f"{e}, abort")
+        return {'status': 'ABORTED', 'error': str(e)}
+    except Exception as e:
+        logger.error(f"Error processing combine task {task.id}: {e}", exc_info=True)
+        try:
+            combine_queue.finish(task, worker, 'FAILED', error_message=str(e))
+        except Exception:
+            pass
+        return {'status': 'FAILED', 'error': str(e)}
@@ -0,0 +1,178 @@
+"""
+Hàng đợi CombineLabelTask dùng chung cho background_processor và Celery task.
+
+Worker nhận task bằng ``SELECT ... FOR UPDATE SKIP LOCKED`` rồi ghi lease (locked_by,
+locked_until) nên nhiều processor chạy song song không bao giờ xử lý trùng một task. Trong lúc
+xử lý, ``Lease`` gia hạn locked_until định kỳ (heartbeat); task PROCESSING có lease hết hạn là
+worker đã chết và được nhận lại, tối đa COMBINE_TASK_MAX_ATTEMPTS lần. Worker mất lease phải dừng
+(``Lease.check``) và mọi lần ghi của nó đều kèm điều kiện ``locked_by=worker`` (``finish``).
+
+Trigger combine_label_tasks_notify (migration 0037) gửi NOTIFY combine_label_tasks khi có task
+PENDING, ``wait_for_tasks`` dùng LISTEN để processor nhận task ngay thay vì poll.
+"""
+
+import logging
+import os
+import select
+import socket
+import threading
+from datetime import timedelta
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api import setup_logging
+from api.models import CombineLabelTask
+from api.utils.constant import COMBINE_TASK_LEASE_SECONDS, COMBINE_TASK_MAX_ATTEMPTS
+
+logger = logging.getLogger("api.utils.combine_queue")
+setup_logging(logger, is_root=False, level=logging.INFO)
+
+CHANNEL = "combine_label_tasks"
+
+
+def worker_name(suffix: str = "") -> str:
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{name}:{suffix}" if suffix else name
+
+
+def claimable_tasks():
+    now = timezone.now()
+    return CombineLabelTask.objects.filter(
+        Q(status="PENDING") | Q(status="PROCESSING", locked_until__lt=now),
+        attempts__lt=COMBINE_TASK_MAX_ATTEMPTS,
+    )
+
+
+def claim_task(worker: str, task_id: int = None):
+    """
+    Nhận task PENDING cũ nhất (hoặc task ``task_id``) và chuyển sang PROCESSING với lease của
+    ``worker``. Trả về None nếu không còn task / task đã được worker khác nhận.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = claimable_tasks().select_for_update(skip_locked=True)
+        if task_id is not None:
+            tasks = tasks.filter(pk=task_id)
+        task = tasks.order_by("created_at").first()
+        if task is None:
+            return None
+        if task.status == "PROCESSING":
+            logger.warning(f"Combine task {task.id} lease of {task.locked_by} expired, reclaimed by {worker}")
+        task.status = "PROCESSING"
+        task.started_at = now
+        task.locked_by = worker
+        task.locked_until = now + timedelta(seconds=COMBINE_TASK_LEASE_SECONDS)
+        task.attempts += 1
+        task.save(update_fields=["status", "started_at", "locked_by", "locked_until", "attempts", "updated_at"])
+    return task
+
+
+def fail_exhausted_tasks() -> int:
+    """Đánh dấu FAILED các task PROCESSING đã hết lease sau COMBINE_TASK_MAX_ATTEMPTS lần nhận."""
+    return CombineLabelTask.objects.filter(
+        status="PROCESSING",
+        locked_until__lt=timezone.now(),
+        attempts__gte=COMBINE_TASK_MAX_ATTEMPTS,
+    ).update(
+        status="FAILED",
+        completed_at=timezone.now(),
+        locked_until=None,
+        error_message="Worker stopped while processing the task",
+    )
+
+
+def heartbeat(task_id: int, worker: str) -> bool:
+    """Gia hạn lease, trả về False nếu task không còn thuộc ``worker`` (đã bị nhận lại / huỷ)."""
+    return bool(
+        CombineLabelTask.objects.filter(pk=task_id, locked_by=worker, status="PROCESSING").update(
+            locked_until=timezone.now() + timedelta(seconds=COMBINE_TASK_LEASE_SECONDS)
+        )
+    )
+
+
+class LeaseLost(Exception):
+    """Task đã được worker khác nhận lại (lease hết hạn) hoặc không còn PROCESSING."""
+
+
+class Lease:
+    """
+    Context manager gia hạn lease của task trong một thread riêng mỗi
+    COMBINE_TASK_LEASE_SECONDS / 3 giây cho tới khi thoát. Lỗi DB của heartbeat được log rồi thử
+    lại ở lần sau; ``check`` raise LeaseLost khi heartbeat thấy task không còn thuộc worker.
+    """
+
+    def __init__(self, task, worker: str):
+        self.task_id = task.id
+        self.worker = worker
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(COMBINE_TASK_LEASE_SECONDS / 3):
+                try:
+                    renewed = heartbeat(self.task_id, self.worker)
+                except DatabaseError as e:
+                    logger.warning(f"Combine task {self.task_id}: heartbeat failed, retrying: {e}")
+                    # Mở connection mới ở lần sau
+                    connection.close()
+                    continue
+                if not renewed:
+                    self.lost = True
+                    logger.warning(f"Combine task {self.task_id}: lease lost by {self.worker}")
+                    return
+        finally:
+            connection.close()
+
+    def check(self):
+        if self.lost:
+            raise LeaseLost(f"Combine task {self.task_id}: lease lost by {self.worker}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+
+def finish(task, worker: str, status: str, **fields) -> bool:
+    """
+    Ghi kết quả cuối (``status`` và ``fields``) và trả lease, chỉ khi task vẫn thuộc ``worker``.
+    Trả về False nếu task đã được worker khác nhận lại (kết quả bị bỏ).
+    """
+    now = timezone.now()
+    fields.update(status=status, completed_at=now, locked_by=None, locked_until=None)
+    updated = CombineLabelTask.objects.filter(pk=task.pk, locked_by=worker).update(updated_at=now, **fields)
+    if not updated:
+        logger.warning(f"Combine task {task.pk}: {worker} no longer holds the lease, {status} result dropped")
+        return False
+    for name, value in fields.items():
+        setattr(task, name, value)
+    task.updated_at = now
+    return True
+
+
+def listen():
+    """LISTEN trên connection của thread hiện tại (autocommit)."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {CHANNEL}")
+
+
+def wait_for_tasks(timeout: float, *wake_fds) -> list:
+    """
+    Chờ NOTIFY (sau ``listen``) hoặc một trong ``wake_fds`` sẵn sàng đọc, tối đa ``timeout`` giây.
+    Trả về danh sách id task được báo.
+    """
+    raw = connection.connection
+    readable, _, _ = select.select([raw, *wake_fds], [], [], timeout)
+    task_ids = []
+    if raw in readable:
+        raw.poll()
+        while raw.notifies:
+            task_ids.append(raw.notifies.pop(0).payload)
+    return task_ids
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -240,3 +241,123 @@ DOWNLOAD_IMAGES_DIR_UNIX = "~/workspace/anhtiktok"
 PDF_DIRECTORY_WINDOW = "C:/workspace/pdf"
 PDF_DIRECTORY_UNIX = "~/workspace/pdf"
 webhook_url = "https://117a-42-114-151-247.ngrok-free.app"
+
+# HTTP pool dùng chung cho các call tới TikTok API (api/utils/tiktok_base_api/client.py)
+# Pool size phải >= số thread tối đa gọi đồng thời (OrderDetail dùng 40 thread, mỗi shop 10)
+TIKTOK_HTTP_POOL_CONNECTIONS = int(os.getenv("TIKTOK_HTTP_POOL_CONNECTIONS", 10))
+TIKTOK_HTTP_POOL_MAXSIZE = int(os.getenv("TIKTOK_HTTP_POOL_MAXSIZE", 40))
+TIKTOK_HTTP_POOL_BLOCK = os.getenv("TIKTOK_HTTP_POOL_BLOCK", "true").lower() == "true"
+TIKTOK_HTTP_CONNECT_TIMEOUT = float(os.getenv("TIKTOK_HTTP_CONNECT_TIMEOUT", 5))
+TIKTOK_HTTP_READ_TIMEOUT = float(os.getenv("TIKTOK_HTTP_READ_TIMEOUT", 60))
+# Số request đồng thời tối đa của client async (api/utils/tiktok_base_api/aio.py) trong một event loop
+TIKTOK_ASYNC_MAX_CONCURRENCY = int(os.getenv("TIKTOK_ASYNC_MAX_CONCURRENCY", 100))
+
+# Rate limit cho TikTok API (api/utils/tiktok_base_api/ratelimit.py), dùng chung giữa các worker qua Redis
+# Mỗi nhóm endpoint có 2 bucket: theo shop (app_key + shop_cipher) và theo app_key
+# Giá trị dạng (request/giây, burst), override bằng env TIKTOK_RATE_LIMIT_<NHÓM>_<SHOP|APP>="rate/burst"
+TIKTOK_RATE_LIMIT_ENABLED = os.getenv("TIKTOK_RATE_LIMIT_ENABLED", "true").lower() == "true"
+TIKTOK_RATE_LIMIT_REDIS_URL = os.getenv("TIKTOK_RATE_LIMIT_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+TIKTOK_RATE_LIMIT_MAX_WAIT = float(os.getenv("TIKTOK_RATE_LIMIT_MAX_WAIT", 30))
+TIKTOK_RATE_LIMIT_DEFAULTS = {
+    "orders": {"shop": (20, 20), "app": (50, 50)},
+    "products": {"shop": (10, 10), "app": (50, 50)},
+    "promotions": {"shop": (2, 2), "app": (20, 20)},
+    "finance": {"shop": (10, 10), "app": (50, 50)},
+    "default": {"shop": (10, 10), "app": (50, 50)},
+}
+TIKTOK_RATE_LIMITS = {
+    family: {
+        scope: tuple(
+            float(v)
+            for v in os.getenv(
+                f"TIKTOK_RATE_LIMIT_{family.upper()}_{scope.upper()}", f"{rate}/{burst}"
+            ).split("/")
+        )
+        for scope, (rate, burst) in limits.items()
+    }
+    for family, limits in TIKTOK_RATE_LIMIT_DEFAULTS.items()
+}
+# Khoảng nghỉ (giây) của promotion.create_promotion trước khi tạo và giữa các promotion. Bucket
+# promotions (2 request/giây/shop) không thay thế khoảng nghỉ này: đặt 0 sẽ tạo promotion nhanh
+# hơn tới ~12 lần, chỉ nên làm khi đã xác nhận TikTok chấp nhận tốc độ đó.
+PROMOTION_CREATE_START_DELAY = float(os.getenv("PROMOTION_CREATE_START_DELAY", 4))
+PROMOTION_CREATE_PACK_DELAY = float(os.getenv("PROMOTION_CREATE_PACK_DELAY", 6))
+
+# Đồng bộ đơn hàng TikTok vào bảng Order (api/utils/order_sync.py)
+ORDER_SYNC_INTERVAL_SECONDS = int(os.getenv("ORDER_SYNC_INTERVAL_SECONDS", 60))
+ORDER_SYNC_INITIAL_DAYS = int(os.getenv("ORDER_SYNC_INITIAL_DAYS", 90))
+# Quét lùi lại một khoảng để không sót đơn do độ trễ index của TikTok
+ORDER_SYNC_OVERLAP_SECONDS = int(os.getenv("ORDER_SYNC_OVERLAP_SECONDS", 300))
+# Mirror của shop được coi là mới nếu lần sync thành công gần nhất trong khoảng này
+ORDER_SYNC_STALE_SECONDS = int(os.getenv("ORDER_SYNC_STALE_SECONDS", 600))
+ORDER_SYNC_LOCK_SECONDS = int(os.getenv("ORDER_SYNC_LOCK_SECONDS", 900))
+
+# Consumer xử lý webhook order (api/utils/order_sync.py)
+ORDER_WEBHOOK_INTERVAL_SECONDS = int(os.getenv("ORDER_WEBHOOK_INTERVAL_SECONDS", 5))
+ORDER_WEBHOOK_BATCH_SIZE = int(os.getenv("ORDER_WEBHOOK_BATCH_SIZE", 500))
+ORDER_WEBHOOK_MAX_ATTEMPTS = int(os.getenv("ORDER_WEBHOOK_MAX_ATTEMPTS", 5))
+ORDER_WEBHOOK_LEASE_SECONDS = int(os.getenv("ORDER_WEBHOOK_LEASE_SECONDS", 300))
+ORDER_WEBHOOK_RETENTION_DAYS = int(os.getenv("ORDER_WEBHOOK_RETENTION_DAYS", 7))
+
+# Shop registry: thời gian cache Shop (credentials) trong process, tính bằng giây
+SHOP_REGISTRY_TTL_SECONDS = int(os.getenv("SHOP_REGISTRY_TTL_SECONDS", 300))
+
+# Rollup thống kê theo ngày (api/utils/rollup.py)
+# Số ngày trước hôm nay được tổng hợp lại toàn bộ sau mỗi lần sync (close_order_days); ngày cũ hơn chỉ
+# được tổng hợp lại khi có đơn của ngày đó thay đổi (update_order_rollups)
+ROLLUP_ORDER_OPEN_DAYS = int(os.getenv("ROLLUP_ORDER_OPEN_DAYS", 0))
+
+# Đồng bộ statement TikTok (api/utils/statement_sync.py)
+STATEMENT_SYNC_INTERVAL_SECONDS = int(os.getenv("STATEMENT_SYNC_INTERVAL_SECONDS", 900))
+STATEMENT_SYNC_INITIAL_DAYS = int(os.getenv("STATEMENT_SYNC_INITIAL_DAYS", 90))
+# Rollup statement của shop được coi là mới nếu lần sync thành công gần nhất trong khoảng này
+STATEMENT_SYNC_STALE_SECONDS = int(os.getenv("STATEMENT_SYNC_STALE_SECONDS", 3600))
+STATEMENT_SYNC_LOCK_SECONDS = int(os.getenv("STATEMENT_SYNC_LOCK_SECONDS", 900))
+
+# Số SKU tối đa mỗi lần gọi CsvFulfillmentSkuValidationAPI
+CSV_SKU_VALIDATION_MAX = int(os.getenv("CSV_SKU_VALIDATION_MAX", 10000))
+
+# Tạo package hàng loạt (api/utils/package_bulk.py)
+PACKAGE_BULK_MAX_ROWS = int(os.getenv("PACKAGE_BULK_MAX_ROWS", 20000))
+PACKAGE_BULK_BATCH_SIZE = int(os.getenv("PACKAGE_BULK_BATCH_SIZE", 500))
+
+# Combine label: thư mục tạm để spool label tải về và file ghép (mặc định là thư mục tạm của hệ thống)
+COMBINE_LABEL_SPOOL_DIR = os.getenv("COMBINE_LABEL_SPOOL_DIR") or None
+# Kích thước mỗi chunk khi upload resumable lên Google Drive (bội số của 256KB)
+GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE = int(os.getenv("GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+
+# Cache label PDF trên đĩa (api/utils/label_cache.py)
+LABEL_CACHE_ENABLED = os.getenv("LABEL_CACHE_ENABLED", "true").lower() == "true"
+LABEL_CACHE_DIR = os.getenv("LABEL_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "label_cache")
+LABEL_CACHE_MAX_BYTES = int(os.getenv("LABEL_CACHE_MAX_BYTES", 5 * 1024 * 1024 * 1024))
+# Khi vượt LABEL_CACHE_MAX_BYTES thì xoá các label lâu không dùng cho tới còn tỉ lệ này
+LABEL_CACHE_TARGET_RATIO = float(os.getenv("LABEL_CACHE_TARGET_RATIO", 0.9))
+# Mỗi process quét thư mục cache để evict tối đa một lần trong khoảng này
+LABEL_CACHE_EVICT_INTERVAL_SECONDS = int(os.getenv("LABEL_CACHE_EVICT_INTERVAL_SECONDS", 60))
+# Label của một package/URL được tải lại sau khoảng này (TikTok có thể tạo lại label)
+LABEL_CACHE_KEY_MAX_AGE_SECONDS = int(os.getenv("LABEL_CACHE_KEY_MAX_AGE_SECONDS", 7 * 24 * 3600))
+
+# Hàng đợi combine label (api/utils/combine_queue.py)
+# Lease của worker trên task, được gia hạn mỗi 1/3 khoảng này; hết hạn thì task được nhận lại
+COMBINE_TASK_LEASE_SECONDS = int(os.getenv("COMBINE_TASK_LEASE_SECONDS", 120))
+COMBINE_TASK_MAX_ATTEMPTS = int(os.getenv("COMBINE_TASK_MAX_ATTEMPTS", 3))
+# Processor vẫn kiểm tra hàng đợi sau khoảng này nếu không nhận được NOTIFY (lease hết hạn...)
+COMBINE_TASK_IDLE_CHECK_SECONDS = int(os.getenv("COMBINE_TASK_IDLE_CHECK_SECONDS", 30))
+# Số luồng tải label song song cho mỗi task combine (api/utils/combine_pipeline.py)
+COMBINE_DOWNLOAD_WORKERS = int(os.getenv("COMBINE_DOWNLOAD_WORKERS", 10))
+# Số label được tải trước label đang chờ merge (reorder buffer của combine_pipeline.iter_downloads),
+# đủ lớn để một label tải chậm không chặn các download khác
+COMBINE_REORDER_WINDOW = int(os.getenv("COMBINE_REORDER_WINDOW", 200))
+# Tiến độ của task combine được ghi vào DB nhiều nhất một lần mỗi khoảng này (giây)
+COMBINE_PROGRESS_INTERVAL_SECONDS = float(os.getenv("COMBINE_PROGRESS_INTERVAL_SECONDS", 1))
+# Cho phép ?stream=1 (SSE) ở API progress. Mỗi kết nối SSE giữ một worker / thread WSGI suốt thời
+# gian stream, chỉ bật khi server chạy worker async (ASGI, gevent...); tắt thì ?stream=1 trả về
+# tiến độ hiện tại như khi poll
+COMBINE_PROGRESS_STREAM_ENABLED = os.getenv("COMBINE_PROGRESS_STREAM_ENABLED", "false").lower() == "true"
+# Thời gian tối đa của một kết nối SSE theo dõi tiến độ, client tự kết nối lại sau đó
+COMBINE_PROGRESS_STREAM_MAX_SECONDS = int(os.getenv("COMBINE_PROGRESS_STREAM_MAX_SECONDS", 30))
+# Backend ghép label của combine label: "pypdf2" (StreamingPdfMerger, ghi dần ra file, dùng chung
+# font / ảnh lặp lại giữa các label) hoặc "pikepdf" (cần cài pikepdf). pikepdf giữ mọi label trong bộ
+# nhớ tới khi ghi file (RAM tăng theo tổng dung lượng label của task), không dùng cho task lớn: chỉ
+# để so sánh (benchmarks/pdf_backends.py) hoặc khi mọi task đều nhỏ
+PDF_MERGE_BACKEND = os.getenv("PDF_MERGE_BACKEND", "pypdf2")
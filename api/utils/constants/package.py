@@ -0,0 +1,17 @@
+fulfillment_name = {
+    "FLASHSHIP": "FlashShip",
+    "PRINTCARE": "PrintCare",
+    "CKF": "Ckf",
+    "DROPSHIP": "DropShip",
+    "TEECLUB": "TeeClub",
+    "TEELOVER": "Teelover",
+}
+
+# Các fulfillment được tạo package qua PackageCreateFor* / PackageBulkCreate
+bulk_create_fulfillment_list = [
+    fulfillment_name["FLASHSHIP"],
+    fulfillment_name["PRINTCARE"],
+    fulfillment_name["CKF"],
+    fulfillment_name["DROPSHIP"],
+    fulfillment_name["TEECLUB"],
+]
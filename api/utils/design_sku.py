@@ -0,0 +1,55 @@
+"""
+Tìm kiếm và kiểm tra DesignSku.
+
+Search lọc ``icontains`` trên sku_id / product_name / variation (dùng index trigram GIN trên
+UPPER(...) nếu server có pg_trgm) và sort theo độ giống trigram cao nhất của 3 trường.
+"""
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from api.models import DesignSku
+
+SEARCH_FIELDS = ("sku_id", "product_name", "variation")
+
+_trigram_installed = None
+
+
+def trigram_installed() -> bool:
+    """pg_trgm đã được cài trong database chưa (kiểm tra một lần mỗi process)."""
+    global _trigram_installed
+    if _trigram_installed is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_installed = cursor.fetchone() is not None
+    return _trigram_installed
+
+
+def search_design_skus(designskus, search_query):
+    """Lọc theo search_query, kết quả giống nhất đứng trước (hoặc mới nhất nếu không có pg_trgm)."""
+    if not search_query:
+        return designskus.order_by("-id")
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f"{field}__icontains": search_query})
+    designskus = designskus.filter(condition)
+    if not trigram_installed():
+        return designskus.order_by("-id")
+    return designskus.annotate(
+        rank=Greatest(*(TrigramSimilarity(field, search_query) for field in SEARCH_FIELDS))
+    ).order_by("-rank", "-id")
+
+
+def find_design_skus(department, sku_ids) -> dict:
+    """{sku_id: DesignSku} của department trong một query, mỗi sku_id lấy bản ghi có id nhỏ nhất."""
+    sku_ids = list(dict.fromkeys(str(sku_id) for sku_id in sku_ids))
+    if not sku_ids:
+        return {}
+    designskus = (
+        DesignSku.objects.filter(department=department, sku_id__any=sku_ids)
+        .order_by("sku_id", "id")
+        .distinct("sku_id")
+    )
+    return {design_sku.sku_id: design_sku for design_sku in designskus}
@@ -194,14 +194,16 @@ class GoogleDriveService:
                 print("🔄 Attempting to re-initialize service...")
                 self._initialize_service(force_reauth=True)
 
-    def upload_pdf_to_drive(self, pdf_buffer, filename, max_retries=3):
+    def upload_pdf_to_drive(self, pdf_buffer, filename, max_retries=3, on_progress=None):
         """
         Upload PDF buffer to Google Drive with retry mechanism and OAuth2 support
 
         Args:
-            pdf_buffer (BytesIO): PDF buffer to upload
+            pdf_buffer (BytesIO | str): PDF buffer to upload, or path of a PDF file
+                (uploaded in chunks, without reading the whole file into memory)
             filename (str): Name for the file in Google Drive
             max_retries (int): Maximum number of retry attempts
+            on_progress (callable): Called as on_progress(uploaded_bytes, total_bytes) after each chunk
 
         Returns:
             dict: Result dictionary containing:
@@ -213,7 +215,9 @@ class GoogleDriveService:
         import time
 
         from googleapiclient.errors import HttpError
-        from googleapiclient.http import MediaInMemoryUpload
+        from googleapiclient.http import MediaFileUpload, MediaInMemoryUpload
+
+        from api.utils.constant import GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE
 
         logger = logging.getLogger(__name__)
 
@@ -236,22 +240,36 @@ class GoogleDriveService:
                     'mimeType': 'application/pdf'
                 }
 
-                # Create media upload from buffer
-                pdf_buffer.seek(0)
-                media = MediaInMemoryUpload(
-                    pdf_buffer.read(),
-                    mimetype='application/pdf',
-                    resumable=True
-                )
+                if isinstance(pdf_buffer, (str, os.PathLike)):
+                    # Upload từ file theo từng chunk
+                    media = MediaFileUpload(
+                        pdf_buffer,
+                        mimetype='application/pdf',
+                        chunksize=GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE,
+                        resumable=True
+                    )
+                else:
+                    # Create media upload from buffer
+                    pdf_buffer.seek(0)
+                    media = MediaInMemoryUpload(
+                        pdf_buffer.read(),
+                        mimetype='application/pdf',
+                        resumable=True
+                    )
 
                 print(f"📤 Uploading {filename} to Google Drive...")
 
-                # Upload file
-                file = self.service.files().create(
+                # Upload file theo từng chunk để báo tiến độ
+                upload_request = self.service.files().create(
                     body=file_metadata,
                     media_body=media,
                     fields='id,webViewLink,webContentLink'
-                ).execute()
+                )
+                file = None
+                while file is None:
+                    upload_status, file = upload_request.next_chunk()
+                    if upload_status and on_progress:
+                        on_progress(upload_status.resumable_progress, upload_status.total_size)
 
                 print("✅ File uploaded successfully, setting permissions...")
 
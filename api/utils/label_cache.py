@@ -0,0 +1,199 @@
+"""
+Cache shipping label (PDF) trên đĩa local, dùng chung cho download_pdf_from_url, UploadDriver,
+ToShipOrderAPI và các task combine label.
+
+Nội dung được lưu theo hash (content-addressed) trong ``blobs/``; ``keys/`` ánh xạ khoá
+(package_id, hoặc URL khi không có package_id) sang hash của nội dung, nên nhiều khoá trùng nội
+dung chỉ chiếm một file. mtime của blob là thời điểm dùng gần nhất: khi tổng dung lượng vượt
+LABEL_CACHE_MAX_BYTES, blob lâu không dùng nhất bị xoá trước (LRU) cho tới khi còn
+LABEL_CACHE_TARGET_RATIO * LABEL_CACHE_MAX_BYTES. Mọi file được ghi ra file tạm rồi os.replace
+nên nhiều process (gunicorn, celery, background_processor) có thể dùng chung một thư mục.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from api import setup_logging
+from api.utils.constant import (
+    LABEL_CACHE_DIR,
+    LABEL_CACHE_ENABLED,
+    LABEL_CACHE_EVICT_INTERVAL_SECONDS,
+    LABEL_CACHE_KEY_MAX_AGE_SECONDS,
+    LABEL_CACHE_MAX_BYTES,
+    LABEL_CACHE_TARGET_RATIO,
+)
+
+logger = logging.getLogger("api.utils.label_cache")
+setup_logging(logger, is_root=False, level=logging.INFO)
+
+_evict_lock = threading.Lock()
+_last_evict = 0.0
+
+
+def _key_path(key: str) -> str:
+    digest = hashlib.sha1(str(key).encode()).hexdigest()
+    return os.path.join(LABEL_CACHE_DIR, "keys", digest[:2], digest)
+
+
+def _blob_path(content_hash: str) -> str:
+    return os.path.join(LABEL_CACHE_DIR, "blobs", content_hash[:2], f"{content_hash}.pdf")
+
+
+def _atomic_write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_path, path)
+
+
+def _atomic_copy(src: str, dst: str):
+    """
+    Copy (không hard link): blob và file của caller phải là hai inode khác nhau, nếu không caller
+    ghi đè file của mình (open(path, "wb")) sẽ làm hỏng blob và ngược lại.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def file_hash(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def get(key) -> str | None:
+    """Đường dẫn blob của khoá, None nếu chưa có trong cache (hoặc đã bị xoá / quá hạn)."""
+    if not LABEL_CACHE_ENABLED or not key:
+        return None
+    key_path = _key_path(key)
+    try:
+        if time.time() - os.path.getmtime(key_path) > LABEL_CACHE_KEY_MAX_AGE_SECONDS:
+            return None
+        with open(key_path) as key_file:
+            blob_path = _blob_path(key_file.read().strip())
+        # Đánh dấu vừa dùng cho LRU
+        os.utime(blob_path)
+    except OSError:
+        return None
+    return blob_path
+
+
+def copy_to(key, path: str) -> bool:
+    """Đặt label đã cache của khoá vào ``path``, trả về False nếu không có trong cache."""
+    blob_path = get(key)
+    if blob_path is None:
+        return False
+    try:
+        _atomic_copy(blob_path, path)
+    except OSError:
+        # Blob vừa bị evict
+        return False
+    return True
+
+
+def put_file(key, path: str) -> str | None:
+    """Lưu file ``path`` vào cache dưới khoá ``key``, trả về đường dẫn blob."""
+    if not LABEL_CACHE_ENABLED or not key:
+        return None
+    try:
+        content_hash = file_hash(path)
+        blob_path = _blob_path(content_hash)
+        if os.path.exists(blob_path):
+            os.utime(blob_path)
+        else:
+            _atomic_copy(path, blob_path)
+        _atomic_write(_key_path(key), content_hash.encode())
+    except OSError as e:
+        logger.warning(f"Cannot cache label {key}: {e}")
+        return None
+    _maybe_evict()
+    return blob_path
+
+
+def put_bytes(key, data: bytes) -> str | None:
+    """Lưu nội dung ``data`` vào cache dưới khoá ``key``, trả về đường dẫn blob."""
+    if not LABEL_CACHE_ENABLED or not key:
+        return None
+    try:
+        content_hash = hashlib.sha256(data).hexdigest()
+        blob_path = _blob_path(content_hash)
+        if os.path.exists(blob_path):
+            os.utime(blob_path)
+        else:
+            _atomic_write(blob_path, data)
+        _atomic_write(_key_path(key), content_hash.encode())
+    except OSError as e:
+        logger.warning(f"Cannot cache label {key}: {e}")
+        return None
+    _maybe_evict()
+    return blob_path
+
+
+def _maybe_evict():
+    global _last_evict
+    if time.monotonic() - _last_evict < LABEL_CACHE_EVICT_INTERVAL_SECONDS:
+        return
+    if not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        _last_evict = time.monotonic()
+        evict()
+    finally:
+        _evict_lock.release()
+
+
+def evict(max_bytes: int = LABEL_CACHE_MAX_BYTES) -> int:
+    """Xoá các blob dùng lâu nhất cho tới khi tổng dung lượng dưới ngưỡng, trả về số blob đã xoá."""
+    expired_before = time.time() - LABEL_CACHE_KEY_MAX_AGE_SECONDS
+    for root, _, files in os.walk(os.path.join(LABEL_CACHE_DIR, "keys")):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < expired_before:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    blobs = []
+    total = 0
+    for root, _, files in os.walk(os.path.join(LABEL_CACHE_DIR, "blobs")):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0
+
+    target = max_bytes * LABEL_CACHE_TARGET_RATIO
+    removed = 0
+    for _, size, path in sorted(blobs):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    # Khoá trỏ tới blob đã xoá được coi là miss ở lần get sau
+    logger.info(f"Evicted {removed} labels, cache size {total} bytes")
+    return removed
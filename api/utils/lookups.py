@@ -0,0 +1,25 @@
+"""
+Lookup dùng chung cho queryset.
+
+``field__any=[...]`` sinh ra ``field = ANY(%s)`` với cả danh sách là một tham số mảng, thay cho
+``__in`` (mỗi giá trị một placeholder) khi lọc theo hàng nghìn giá trị.
+"""
+
+from django.db.models import Field, Lookup
+
+
+@Field.register_lookup
+class AnyLookup(Lookup):
+    lookup_name = "any"
+    prepare_rhs = False
+
+    def get_prep_lookup(self):
+        return [self.lhs.output_field.get_prep_value(value) for value in self.rhs]
+
+    def process_rhs(self, compiler, connection):
+        return "%s", [list(self.rhs)]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} = ANY({rhs})", [*lhs_params, *rhs_params]
@@ -0,0 +1,80 @@
+"""
+Cấp number_sort cho package theo fulfillment và ngày (giờ Asia/Ho_Chi_Minh).
+
+Mỗi (fulfillment, ngày) có một dòng NumberSortCounter; ``allocate`` khoá dòng đó bằng
+SELECT ... FOR UPDATE rồi tăng last_value, nên hai request đồng thời không bao giờ nhận trùng số
+và chi phí không phụ thuộc số package. Dòng của ngày được tạo ở lần cấp đầu tiên, bắt đầu từ
+number_sort lớn nhất đã có trong ngày (package tạo trước khi có counter); mỗi lần cấp cũng nâng
+last_value lên number_sort lớn nhất của package trong ngày (số do client tự lấy max + 1).
+"""
+
+from datetime import datetime
+
+import pytz
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from api.models import NumberSortCounter, Package
+
+LOCAL_TZ = pytz.timezone("Asia/Ho_Chi_Minh")
+
+
+def local_day_bounds(day=None):
+    """(ngày, đầu ngày, cuối ngày) theo giờ Việt Nam, mặc định là hôm nay."""
+    day = day or datetime.now(LOCAL_TZ).date()
+    start = LOCAL_TZ.localize(datetime(day.year, day.month, day.day))
+    end = LOCAL_TZ.localize(datetime(day.year, day.month, day.day, 23, 59, 59, 999999))
+    return day, start, end
+
+
+def existing_max(fulfillment_name, day):
+    _, start, end = local_day_bounds(day)
+    return (
+        Package.objects.filter(
+            fulfillment_name=fulfillment_name,
+            supify_create_time__gte=start,
+            supify_create_time__lte=end,
+        ).aggregate(Max("number_sort"))["number_sort__max"]
+        or 0
+    )
+
+
+def _locked_counter(fulfillment_name, day):
+    counters = NumberSortCounter.objects.select_for_update()
+    try:
+        return counters.get(fulfillment_name=fulfillment_name, day=day)
+    except NumberSortCounter.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return NumberSortCounter.objects.create(
+                fulfillment_name=fulfillment_name, day=day, last_value=existing_max(fulfillment_name, day)
+            )
+    except IntegrityError:
+        # Request khác vừa tạo dòng của ngày này
+        return counters.get(fulfillment_name=fulfillment_name, day=day)
+
+
+def allocate(fulfillment_name: str, count: int = 1, day=None) -> range:
+    """Giữ ``count`` số liên tiếp cho fulfillment trong ngày, trả về range các số đã cấp."""
+    if count < 1:
+        raise ValueError("count must be positive")
+    day, _, _ = local_day_bounds(day)
+    with transaction.atomic():
+        counter = _locked_counter(fulfillment_name, day)
+        # Client cũ còn tự lấy max + 1 và ghi số ngoài counter: không cấp lại các số đó
+        counter.last_value = max(counter.last_value, existing_max(fulfillment_name, day))
+        start = counter.last_value + 1
+        counter.last_value += count
+        counter.save(update_fields=["last_value", "updated_at"])
+    return range(start, start + count)
+
+
+def current(fulfillment_name: str, day=None):
+    """Số lớn nhất đã cấp trong ngày, None nếu chưa cấp số nào."""
+    day, _, _ = local_day_bounds(day)
+    return (
+        NumberSortCounter.objects.filter(fulfillment_name=fulfillment_name, day=day)
+        .values_list("last_value", flat=True)
+        .first()
+    )
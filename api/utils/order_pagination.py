@@ -0,0 +1,185 @@
+"""
+Phân trang đơn hàng nhiều shop theo create_time giảm dần.
+
+Kết quả search của TikTok cho mỗi (shop, status) đã sort theo create_time desc, nên mỗi cặp là
+một stream đã sắp xếp; trang cần lấy là k-way merge của các stream đó. Chỉ lấy thêm trang API
+khi stream cạn, và dừng ngay khi đủ skip + limit + 1 đơn (1 đơn để biết còn trang sau hay không).
+
+Continuation token ghi lại mốc create_time của đơn cuối trang và id các đơn cùng mốc đã trả về,
+trang tiếp theo chỉ cần lọc create_time_lt = mốc + 1 và bỏ qua các id đó. Token cũng ghi số đơn
+đã trả về ở các trang trước để ước lượng tổng số đơn (total_count của trang đầu mỗi stream).
+"""
+
+import asyncio
+import base64
+import heapq
+import json
+from collections import deque
+
+from api.utils import order_sync
+from api.utils.tiktok_base_api import TIKTOK_API_URL, aio, logger
+from api.utils.tiktok_base_api.order import (
+    attach_order_owner,
+    build_order_list_request,
+    check_order_list_response,
+)
+
+
+class InvalidPageToken(ValueError):
+    pass
+
+
+def encode_page_token(create_time_lt: int, skip_ids, returned: int = 0) -> str:
+    raw = json.dumps({"lt": create_time_lt, "skip": sorted(skip_ids), "n": returned}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_page_token(token: str):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        return int(data["lt"]), set(str(order_id) for order_id in data.get("skip", [])), int(data.get("n", 0))
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidPageToken("Invalid page token") from e
+
+
+class OrderStream:
+    """Một chuỗi trang của url_get_order_list_new cho (shop, status)."""
+
+    def __init__(self, shop, user, status, filters, errors):
+        self.shop = shop
+        self.user = user
+        self.status = status
+        self.filters = filters
+        self.errors = errors
+        self.buffer = deque()
+        self.page_token = ""
+        self.exhausted = False
+        # Tổng số đơn của stream theo total_count ở trang đầu
+        self.total_count = 0
+
+    async def fetch(self):
+        query_params, headers, body = build_order_list_request(
+            self.shop,
+            self.status,
+            self.page_token,
+            self.filters["create_time_ge"],
+            self.filters["create_time_lt"],
+            self.filters["order_status"],
+            self.filters["buyer_user_id"],
+            self.shop.app_key,
+            self.shop.app_secret,
+        )
+        try:
+            response = await aio.post(
+                TIKTOK_API_URL["url_get_order_list_new"], body=json.dumps(body), params=query_params, headers=headers
+            )
+        except Exception as e:
+            logger.error(f"Error fetching orders for shop {self.shop.id} status {self.status}: {e}")
+            self.exhausted = True
+            return
+        if check_order_list_response(response, self.shop, self.status, self.errors):
+            self.exhausted = True
+            return
+        data = response.json().get("data", {})
+        if not self.page_token:
+            self.total_count = int(data.get("total_count") or 0)
+        self.buffer.extend(attach_order_owner(data.get("orders", []), self.shop, self.user))
+        self.page_token = data.get("next_page_token", "")
+        self.exhausted = not self.page_token
+
+    async def next(self):
+        while not self.buffer and not self.exhausted:
+            await self.fetch()
+        return self.buffer.popleft() if self.buffer else None
+
+
+class ListStream:
+    """Stream từ danh sách đã sort sẵn (vd: đơn đọc từ order mirror)."""
+
+    def __init__(self, orders, total_count: int = None):
+        self.buffer = deque(orders)
+        self.exhausted = True
+        self.total_count = len(orders) if total_count is None else total_count
+
+    async def fetch(self):
+        return None
+
+    async def next(self):
+        return self.buffer.popleft() if self.buffer else None
+
+
+async def merge_streams(streams, count: int, skip_ids=()):
+    """Lấy tối đa ``count`` đơn mới nhất từ các stream (bỏ qua skip_ids)."""
+    # Trang đầu của mọi stream được lấy song song
+    await asyncio.gather(*[stream.fetch() for stream in streams if not stream.buffer and not stream.exhausted])
+
+    heap = []
+
+    async def push(index):
+        while True:
+            order = await streams[index].next()
+            if order is None:
+                return
+            if str(order["id"]) not in skip_ids:
+                heapq.heappush(heap, (-int(order["create_time"]), index, order))
+                return
+
+    await asyncio.gather(*[push(index) for index in range(len(streams))])
+    merged = []
+    while heap and len(merged) < count:
+        _, index, order = heapq.heappop(heap)
+        merged.append(order)
+        await push(index)
+    return merged
+
+
+async def _get_order_page(live_shop_users, mirrored_orders, mirrored_total, filters, errors, count, skip_ids):
+    """Trả về (đơn đã merge, tổng số đơn ước lượng của các stream)."""
+    streams = [ListStream(mirrored_orders, mirrored_total)]
+    for shop, user in live_shop_users:
+        for status in dict.fromkeys(filters["order_status"]):
+            streams.append(OrderStream(shop, user, status, filters, errors))
+    merged = await merge_streams(streams, count, skip_ids)
+    return merged, sum(stream.total_count for stream in streams)
+
+
+def get_order_page(live_shop_users, mirrored_shop_users, filters, errors, offset: int, limit: int, page_token: str = ""):
+    """
+    Trả về (orders, next_page_token, total_items) của một trang.
+    Không có page_token thì offset là số thứ tự trang (như get_pagination), có page_token thì bỏ qua offset.
+    Shop trong mirrored_shop_users đọc từ order mirror, shop trong live_shop_users gọi TikTok API.
+    total_items là số chính xác ở trang cuối, các trang khác là ước lượng từ total_count của các stream.
+    """
+    skip = offset * limit
+    skip_ids = set()
+    returned = skip
+    if page_token:
+        token_lt, skip_ids, returned = decode_page_token(page_token)
+        filters = dict(filters, create_time_lt=min(filters["create_time_lt"], token_lt))
+        skip = 0
+
+    count = skip + limit + 1
+    mirrored_orders = order_sync.get_mirrored_orders(mirrored_shop_users, filters, limit=count + len(skip_ids))
+    mirrored_total = (
+        len(mirrored_orders)
+        if len(mirrored_orders) < count + len(skip_ids)
+        else order_sync.count_mirrored_orders(mirrored_shop_users, filters)
+    )
+    merged, window_total = aio.run(
+        _get_order_page, live_shop_users, mirrored_orders, mirrored_total, filters, errors, count, skip_ids
+    )
+    page = merged[skip : skip + limit]
+    if len(merged) <= skip + limit or not page:
+        # Trang cuối (hoặc offset vượt quá số đơn): merged chứa mọi đơn còn lại sau các token trước
+        return page, None, returned - skip + len(merged)
+
+    # Số đơn của các token trước + số đơn trong khoảng create_time của trang này (trừ các đơn đã trả
+    # về ở mốc của token); ít nhất phải có thêm 1 đơn sau trang này
+    total_items = max(returned - skip + window_total - len(skip_ids), returned + len(page) + 1)
+    boundary = int(page[-1]["create_time"])
+    # Các đơn cùng mốc create_time đã trả về (kể cả từ token trước) sẽ bị bỏ qua ở trang sau
+    next_skip_ids = {str(order["id"]) for order in page if int(order["create_time"]) == boundary}
+    if page_token and boundary + 1 == filters["create_time_lt"]:
+        next_skip_ids |= skip_ids
+    return page, encode_page_token(boundary + 1, next_skip_ids, returned + len(page)), total_items
@@ -0,0 +1,396 @@
+"""
+Đồng bộ đơn hàng TikTok vào bảng Order/OrderLineItem.
+
+Mỗi shop có một OrderSyncCursor: worker lấy các đơn có update_time >= cursor (sort tăng dần),
+upsert vào Postgres rồi đẩy cursor lên. Các view đọc đơn từ mirror cho những shop đã sync xong
+và còn mới, các shop còn lại vẫn gọi TikTok API trực tiếp.
+
+Ngoài ra webhook order chỉ ghi vào OrderWebhookEvent, process_webhook_events gom các order id
+theo shop, lấy chi tiết theo chunk 50 đơn và upsert vào mirror.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api import setup_logging
+from api.models import (
+    Notification,
+    NotiMessage,
+    Order,
+    OrderLineItem,
+    OrderSyncCursor,
+    OrderWebhookEvent,
+    Shop,
+    UserShop,
+)
+from api.utils import rollup
+from api.utils.constant import (
+    ORDER_SYNC_INITIAL_DAYS,
+    ORDER_SYNC_LOCK_SECONDS,
+    ORDER_SYNC_OVERLAP_SECONDS,
+    ORDER_SYNC_STALE_SECONDS,
+    ORDER_WEBHOOK_BATCH_SIZE,
+    ORDER_WEBHOOK_LEASE_SECONDS,
+    ORDER_WEBHOOK_MAX_ATTEMPTS,
+    ORDER_WEBHOOK_RETENTION_DAYS,
+)
+from api.utils.shop_registry import registry, shop_ref
+from api.utils.tiktok_base_api import aio
+from api.utils.tiktok_base_api import order as order_api
+
+logger = logging.getLogger("api.utils.order_sync")
+setup_logging(logger, is_root=False, level=logging.INFO)
+
+# Các key do code của mình gắn thêm vào order dict, không lưu vào data
+ATTACHED_KEYS = ("shop", "shop_owner")
+ORDER_DETAIL_CHUNK_SIZE = 50
+
+
+class OrderSyncError(Exception):
+    pass
+
+
+def _decimal(value):
+    if value in (None, ""):
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def _build_order(shop, data: dict) -> Order:
+    payment = data.get("payment") or {}
+    return Order(
+        shop=shop,
+        order_id=str(data["id"]),
+        status=data.get("status", ""),
+        buyer_user_id=data.get("user_id") or data.get("buyer_user_id"),
+        create_time=int(data.get("create_time") or 0),
+        update_time=int(data.get("update_time") or data.get("create_time") or 0),
+        paid_time=data.get("paid_time"),
+        total_amount=_decimal(payment.get("total_amount")),
+        currency=payment.get("currency"),
+        data={key: value for key, value in data.items() if key not in ATTACHED_KEYS},
+    )
+
+
+def _build_line_items(order: Order, data: dict):
+    return [
+        OrderLineItem(
+            order=order,
+            line_item_id=str(item.get("id", "")),
+            product_id=item.get("product_id"),
+            product_name=item.get("product_name"),
+            sku_id=item.get("sku_id"),
+            sku_name=item.get("sku_name"),
+            seller_sku=item.get("seller_sku"),
+            sku_image=item.get("sku_image"),
+            sale_price=_decimal(item.get("sale_price")),
+            original_price=_decimal(item.get("original_price")),
+            currency=item.get("currency"),
+            display_status=item.get("display_status"),
+            package_id=item.get("package_id"),
+        )
+        for item in data.get("line_items") or []
+    ]
+
+
+def upsert_orders(shop, orders: list) -> int:
+    """
+    Upsert danh sách order dict (format của TikTok 202309) của một shop.
+    Bỏ qua các đơn đã có bản mới hơn (update_time lớn hơn) trong DB.
+    Trả về số đơn đã ghi.
+    """
+    latest = {}
+    for data in orders:
+        if not data.get("id"):
+            continue
+        order_id = str(data["id"])
+        if order_id not in latest or int(data.get("update_time") or 0) >= int(latest[order_id].get("update_time") or 0):
+            latest[order_id] = data
+    if not latest:
+        return 0
+
+    existing = dict(
+        Order.objects.filter(shop=shop, order_id__in=list(latest.keys())).values_list("order_id", "update_time")
+    )
+    rows = [
+        (_build_order(shop, data), data)
+        for order_id, data in latest.items()
+        if order_id not in existing or int(data.get("update_time") or 0) >= existing[order_id]
+    ]
+    if not rows:
+        return 0
+
+    with transaction.atomic():
+        saved = Order.objects.bulk_create(
+            [order for order, _ in rows],
+            update_conflicts=True,
+            unique_fields=["shop", "order_id"],
+            update_fields=[
+                "status",
+                "buyer_user_id",
+                "create_time",
+                "update_time",
+                "paid_time",
+                "total_amount",
+                "currency",
+                "data",
+                "synced_at",
+            ],
+        )
+        OrderLineItem.objects.filter(order__in=[order.pk for order in saved]).delete()
+        line_items = []
+        for order, (_, data) in zip(saved, rows):
+            line_items.extend(_build_line_items(order, data))
+        OrderLineItem.objects.bulk_create(line_items, batch_size=1000)
+    rollup.update_order_rollups(shop, [order.create_time for order, _ in rows])
+    return len(saved)
+
+
+def _claim_cursor(shop):
+    cursor, _ = OrderSyncCursor.objects.get_or_create(shop=shop)
+    now = timezone.now()
+    claimed = (
+        OrderSyncCursor.objects.filter(pk=cursor.pk)
+        .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+        .update(locked_until=now + timedelta(seconds=ORDER_SYNC_LOCK_SECONDS))
+    )
+    if not claimed:
+        return None
+    cursor.refresh_from_db()
+    return cursor
+
+
+def sync_shop_orders(shop) -> int | None:
+    """
+    Đồng bộ các đơn thay đổi kể từ cursor của shop.
+    Trả về số đơn đã ghi, None nếu shop đang được worker khác sync.
+    """
+    cursor = _claim_cursor(shop)
+    if cursor is None:
+        logger.info(f"Order sync for shop {shop.id} is already running")
+        return None
+
+    now_ts = int(time.time())
+    update_time_ge = cursor.update_time_ge
+    if not update_time_ge:
+        update_time_ge = now_ts - ORDER_SYNC_INITIAL_DAYS * 24 * 60 * 60
+        OrderSyncCursor.objects.filter(pk=cursor.pk).update(backfilled_from=update_time_ge)
+    update_time_lt = now_ts
+
+    total = 0
+    page_token = ""
+    try:
+        while True:
+            response = order_api.callOrderListByUpdateTime(shop, update_time_ge, update_time_lt, page_token)
+            if response.status_code != 200:
+                raise OrderSyncError(response.text)
+            payload = response.json()
+            if payload.get("code") != 0:
+                raise OrderSyncError(payload.get("message") or response.text)
+
+            data = payload.get("data", {})
+            orders = data.get("orders", [])
+            total += upsert_orders(shop, orders)
+            page_token = data.get("next_page_token", "")
+            if not page_token:
+                break
+            if orders:
+                # Kết quả sort tăng dần theo update_time: các đơn cũ hơn đã được lưu,
+                # nếu worker chết giữa chừng thì lần sau tiếp tục từ đây
+                progress = max(int(o.get("update_time") or 0) for o in orders)
+                OrderSyncCursor.objects.filter(pk=cursor.pk, update_time_ge__lt=progress).update(
+                    update_time_ge=progress,
+                    locked_until=timezone.now() + timedelta(seconds=ORDER_SYNC_LOCK_SECONDS),
+                )
+    except Exception as e:
+        logger.error(f"Order sync failed for shop {shop.id}:{shop.shop_name}: {e}")
+        OrderSyncCursor.objects.filter(pk=cursor.pk).update(last_error=str(e)[:2000], locked_until=None)
+        raise
+
+    OrderSyncCursor.objects.filter(pk=cursor.pk).update(
+        update_time_ge=max(update_time_ge, update_time_lt - ORDER_SYNC_OVERLAP_SECONDS),
+        last_synced_at=timezone.now(),
+        last_error=None,
+        locked_until=None,
+    )
+    rollup.close_order_days(shop)
+    logger.info(f"Synced {total} orders for shop {shop.id}:{shop.shop_name}")
+    return total
+
+
+def mirrored_shop_ids(shop_ids, create_time_ge: int) -> set:
+    """Các shop có mirror đầy đủ từ create_time_ge và vừa sync gần đây."""
+    fresh_after = timezone.now() - timedelta(seconds=ORDER_SYNC_STALE_SECONDS)
+    return set(
+        OrderSyncCursor.objects.filter(
+            shop_id__in=shop_ids,
+            last_synced_at__gte=fresh_after,
+            backfilled_from__lte=create_time_ge,
+        ).values_list("shop_id", flat=True)
+    )
+
+
+def _mirrored_queryset(shop_ids, filters: dict):
+    queryset = Order.objects.filter(
+        shop_id__in=list(shop_ids),
+        create_time__gte=filters["create_time_ge"],
+        create_time__lt=filters["create_time_lt"],
+    )
+    if filters.get("order_status"):
+        queryset = queryset.filter(status__in=list(filters["order_status"]))
+    if filters.get("buyer_user_id"):
+        queryset = queryset.filter(buyer_user_id=filters["buyer_user_id"])
+    return queryset
+
+
+def count_mirrored_orders(shop_users, filters: dict) -> int:
+    """Số đơn trong mirror khớp filters (cùng điều kiện với get_mirrored_orders)."""
+    if not shop_users:
+        return 0
+    return _mirrored_queryset({shop.id for shop, _ in shop_users}, filters).count()
+
+
+def get_mirrored_orders(shop_users, filters: dict, limit: int = None) -> list:
+    """
+    Đọc đơn từ mirror, cùng format với order.req_get_order_list_new
+    (order dict của TikTok + "shop_owner" + "shop").
+    """
+    if not shop_users:
+        return []
+    owners = {shop.id: (shop, user) for shop, user in shop_users}
+    queryset = _mirrored_queryset(owners.keys(), filters)
+
+    refs = {}
+    for shop, user in owners.values():
+        registry.register(shop)
+        refs[shop.id] = ({"id": user.id, "username": user.username}, shop_ref(shop))
+
+    all_orders = []
+    queryset = queryset.order_by("-create_time", "-id").values_list("shop_id", "data")
+    if limit is not None:
+        queryset = queryset[:limit]
+    for shop_id, data in queryset.iterator(chunk_size=2000):
+        data["shop_owner"], data["shop"] = refs[shop_id]
+        all_orders.append(data)
+    return all_orders
+
+
+def claim_webhook_events(limit: int = ORDER_WEBHOOK_BATCH_SIZE) -> list:
+    """Lấy một batch event chưa xử lý, khoá bằng lease để nhiều consumer chạy song song được."""
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OrderWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, attempts__lt=ORDER_WEBHOOK_MAX_ATTEMPTS)
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+            .order_by("received_at")[:limit]
+        )
+        if events:
+            OrderWebhookEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                locked_until=now + timedelta(seconds=ORDER_WEBHOOK_LEASE_SECONDS)
+            )
+    return events
+
+
+def notify_order_events(shop, events):
+    """Tạo thông báo đơn mới cho chủ shop như WebhookDataView làm trước đây."""
+    user_shop = UserShop.objects.filter(shop=shop).select_related("user").first()
+    if not user_shop:
+        return
+    for event in events:
+        order_status = event.order_status if event.order_status == "AWAITING_SHIPMENT" else ""
+        new_message = NotiMessage.objects.create(
+            type="Order",
+            message=f"New order {order_status} from shop: {shop.shop_name} and orderId {event.order_id}",
+        )
+        Notification.objects.create(user=user_shop.user, shop=shop, message=new_message, is_read=False)
+
+
+async def _fetch_order_details(jobs):
+    """jobs: list (shop, order_ids <= 50). Trả về list kết quả (orders hoặc Exception) theo thứ tự jobs."""
+
+    async def fetch(shop, order_ids):
+        response = await aio.callOrderDetail(shop, order_ids)
+        if response.status_code != 200:
+            raise OrderSyncError(response.text)
+        payload = response.json()
+        if payload.get("code") != 0:
+            raise OrderSyncError(payload.get("message") or response.text)
+        return payload.get("data", {}).get("orders", [])
+
+    return await asyncio.gather(*[fetch(shop, order_ids) for shop, order_ids in jobs], return_exceptions=True)
+
+
+def process_webhook_events(limit: int = ORDER_WEBHOOK_BATCH_SIZE) -> dict:
+    events = claim_webhook_events(limit)
+    if not events:
+        return {"events": 0, "orders": 0, "failed": 0}
+
+    events_by_shop = {}
+    for event in events:
+        events_by_shop.setdefault(event.shop_id_author, []).append(event)
+    shops = {shop.shop_id_author: shop for shop in Shop.objects.filter(shop_id_author__in=list(events_by_shop.keys()))}
+
+    done, failed = [], {}
+    jobs, job_events = [], []
+    for shop_id_author, shop_events in events_by_shop.items():
+        shop = shops.get(shop_id_author)
+        if shop is None:
+            for event in shop_events:
+                failed[event.pk] = f"Shop {shop_id_author} not found"
+            continue
+        order_ids = list(dict.fromkeys(event.order_id for event in shop_events))
+        for i in range(0, len(order_ids), ORDER_DETAIL_CHUNK_SIZE):
+            chunk = order_ids[i : i + ORDER_DETAIL_CHUNK_SIZE]
+            jobs.append((shop, chunk))
+            job_events.append([event for event in shop_events if event.order_id in chunk])
+
+    results = aio.run(_fetch_order_details, jobs) if jobs else []
+    total = 0
+    for (shop, _), chunk_events, result in zip(jobs, job_events, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error fetching order detail for shop {shop.id}: {result}")
+            for event in chunk_events:
+                failed[event.pk] = str(result)[:2000]
+            continue
+        try:
+            total += upsert_orders(shop, result)
+        except Exception as e:
+            # Payload lỗi chỉ làm hỏng chunk của nó, các event được thử lại với attempts tăng dần
+            logger.error(f"Error saving orders for shop {shop.id}: {e}", exc_info=True)
+            for event in chunk_events:
+                failed[event.pk] = str(e)[:2000]
+            continue
+        done.extend(event.pk for event in chunk_events)
+        # Chỉ thông báo khi event đã xử lý xong, event thử lại không tạo thông báo trùng
+        try:
+            notify_order_events(shop, chunk_events)
+        except Exception as e:
+            logger.error(f"Error creating notifications for shop {shop.id}: {e}")
+
+    now = timezone.now()
+    if done:
+        OrderWebhookEvent.objects.filter(pk__in=done).update(processed_at=now, locked_until=None, last_error=None)
+    for pk, error in failed.items():
+        # Thử lại sau một khoảng tăng dần theo số lần lỗi
+        event = next(event for event in events if event.pk == pk)
+        OrderWebhookEvent.objects.filter(pk=pk).update(
+            attempts=event.attempts + 1,
+            last_error=error,
+            locked_until=now + timedelta(seconds=30 * 2**event.attempts),
+        )
+    OrderWebhookEvent.objects.filter(
+        processed_at__lt=now - timedelta(days=ORDER_WEBHOOK_RETENTION_DAYS)
+    ).delete()
+    logger.info(f"Processed {len(done)} order webhook events, upserted {total} orders, {len(failed)} failed")
+    return {"events": len(events), "orders": total, "failed": len(failed)}
@@ -0,0 +1,142 @@
+"""
+Tạo package hàng loạt cho import fulfillment (PackageBulkCreate) và chuyển trạng thái /
+fulfillment hàng loạt (PackageBulkTransition).
+
+Mỗi dòng được validate bằng PackageBulkSerializer (không query DB cho shop), các dòng hợp lệ được
+ghi bằng bulk_create theo batch trong một transaction rồi tính lại is_primary cho các pack_id.
+``iter_bulk_create`` là generator trả về các event tiến độ và event kết quả cuối cùng để view có
+thể stream (NDJSON) hoặc chỉ lấy kết quả.
+"""
+
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from api import setup_logging
+from api.models import Package, ProductPackage
+from api.serializers import PackageBulkSerializer
+from api.utils import package_query
+from api.utils.constant import PACKAGE_BULK_BATCH_SIZE
+
+logger = logging.getLogger("api.utils.package_bulk")
+setup_logging(logger, is_root=False, level=logging.INFO)
+
+ROW_CREATED = "created"
+ROW_INVALID = "invalid"
+
+
+def _progress(stage, done, total):
+    return {"event": "progress", "stage": stage, "done": done, "total": total}
+
+
+def iter_bulk_create(rows: list, shop, fulfillment_name: str, seller: str, batch_size: int = PACKAGE_BULK_BATCH_SIZE):
+    """
+    Yield {"event": "progress", ...} sau mỗi batch validate / ghi và cuối cùng
+    {"event": "result", "created", "invalid", "results"} với kết quả theo thứ tự dòng.
+    """
+    total = len(rows)
+    results = [None] * total
+    valid = []
+    # Dùng lại một serializer cho mọi dòng (như ListSerializer) để không phải dựng lại fields mỗi dòng
+    validator = PackageBulkSerializer()
+    for start in range(0, total, batch_size):
+        for index in range(start, min(start + batch_size, total)):
+            try:
+                valid.append((index, validator.run_validation(rows[index])))
+            except ValidationError as exc:
+                results[index] = {"index": index, "status": ROW_INVALID, "errors": as_serializer_error(exc)}
+        yield _progress("validate", min(start + batch_size, total), total)
+
+    with transaction.atomic():
+        for start in range(0, len(valid), batch_size):
+            batch = valid[start : start + batch_size]
+            packages = []
+            products = []
+            for _, validated_data in batch:
+                data = dict(validated_data)
+                products_data = data.pop("products")
+                package = Package(**data, shop=shop, fulfillment_name=fulfillment_name, seller=seller)
+                packages.append(package)
+                products.append(products_data)
+            Package.objects.bulk_create(packages)
+            ProductPackage.objects.bulk_create(
+                [
+                    ProductPackage(package=package, **product_data)
+                    for package, products_data in zip(packages, products)
+                    for product_data in products_data
+                ]
+            )
+            for (index, _), package in zip(batch, packages):
+                results[index] = {"index": index, "status": ROW_CREATED, "id": package.id, "pack_id": package.pack_id}
+            yield _progress("write", start + len(batch), len(valid))
+        package_query.refresh_primary(validated_data.get("pack_id") for _, validated_data in valid)
+
+    logger.info(f"Bulk created {len(valid)}/{total} {fulfillment_name} packages for shop {getattr(shop, 'id', None)}")
+    yield {
+        "event": "result",
+        "created": len(valid),
+        "invalid": total - len(valid),
+        "results": results,
+    }
+
+
+def bulk_create_packages(rows: list, shop, fulfillment_name: str, seller: str) -> dict:
+    """Chạy iter_bulk_create và chỉ trả về event kết quả."""
+    result = None
+    for event in iter_bulk_create(rows, shop, fulfillment_name, seller):
+        result = event
+    return result
+
+
+def check_transition(current_status, current_fulfillment, status=None, fulfillment_name=None):
+    """
+    True nếu package cần đổi status / fulfillment_name, False nếu đã ở đúng giá trị mới.
+
+    Không có ràng buộc thứ tự trạng thái: giống UpdatePackageStatusView / UpdateFulfillmentNameView,
+    mọi status hợp lệ (Package.PackageStatus) đều đặt được từ bất kỳ status nào (in lại, bỏ cancel...).
+    Giá trị mới được validate ở view bằng chính serializer của hai view đó.
+    """
+    change_status = status is not None and current_status != status
+    change_fulfillment = fulfillment_name is not None and current_fulfillment != fulfillment_name
+    return change_status or change_fulfillment
+
+
+def bulk_transition(packages, status=None, fulfillment_name=None, update_by_id=None) -> dict:
+    """
+    Chuyển status và/hoặc fulfillment_name cho các package của queryset, tương đương gọi
+    UpdatePackageStatusView / UpdateFulfillmentNameView cho từng package. Đọc (id, status,
+    fulfillment_name) rồi ghi bằng một câu ``UPDATE ... WHERE id = ANY(...)``; chỉ những package
+    vẫn còn ở status đã đọc mới được cập nhật (tránh ghi đè thay đổi đồng thời).
+    """
+    rows = list(packages.order_by().values_list("id", "status", "fulfillment_name"))
+    ids = []
+    source_statuses = set()
+    for package_id, current_status, current_fulfillment in rows:
+        if check_transition(current_status, current_fulfillment, status, fulfillment_name):
+            ids.append(package_id)
+            source_statuses.add(current_status)
+
+    values = {}
+    if status is not None:
+        values["status"] = status
+    if fulfillment_name is not None:
+        # Giống UpdateFulfillmentNameView: đổi fulfillment thì ghi lại supify_create_time
+        values["fulfillment_name"] = fulfillment_name
+        values["supify_create_time"] = timezone.now()
+    if update_by_id is not None:
+        values["update_by_id"] = update_by_id
+
+    updated = 0
+    if ids:
+        updated = Package.objects.filter(id__any=ids, status__any=sorted(source_statuses)).update(**values)
+    logger.info(f"Bulk transition status={status} fulfillment={fulfillment_name}: {updated}/{len(rows)} updated")
+    return {
+        "matched": len(rows),
+        "updated": updated,
+        "unchanged": len(rows) - len(ids),
+        # Package đổi trạng thái giữa lúc đọc và lúc ghi
+        "conflicted": len(ids) - updated,
+    }
@@ -0,0 +1,100 @@
+"""
+Truy vấn danh sách Package cho PackageFilter.
+
+Mỗi pack_id chỉ hiển thị package đầu tiên (created_at, id nhỏ nhất). Thay vì subquery tương quan
+theo pack_id cho từng dòng, package đó được đánh dấu ``is_primary`` và được duy trì khi Package
+được tạo / đổi pack_id / xoá (signal trong api/signals.py, hoặc gọi ``refresh_primary`` sau
+bulk_create/update).
+
+Phân trang keyset theo (created_at, id): cursor ghi lại giá trị của dòng cuối trang, trang sau chỉ
+cần lọc các dòng đứng sau nó trên partial index package_primary_ctime_idx, không phải OFFSET.
+"""
+
+import base64
+import json
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from api.models import Package
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def refresh_primary(pack_ids) -> dict:
+    """Tính lại is_primary cho các pack_id, chỉ ghi những dòng bị đổi. Trả về {id: is_primary} các dòng đã đổi."""
+    pack_ids = sorted({pack_id for pack_id in pack_ids if pack_id is not None})
+    if not pack_ids:
+        return {}
+    table = Package._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} p SET is_primary = (p.id = first.id)
+            FROM (
+                SELECT DISTINCT ON (pack_id) pack_id, id FROM {table}
+                WHERE pack_id = ANY(%s)
+                ORDER BY pack_id, created_at, id
+            ) first
+            WHERE p.pack_id = first.pack_id AND p.is_primary IS DISTINCT FROM (p.id = first.id)
+            RETURNING p.id, p.is_primary
+            """,
+            [pack_ids],
+        )
+        return dict(cursor.fetchall())
+
+
+def with_related(packages):
+    """Nạp sẵn shop và products cho PackageSerializer, số query không phụ thuộc số package."""
+    return packages.select_related("shop").prefetch_related("products")
+
+
+def primary_packages():
+    return with_related(Package.objects.filter(is_primary=True))
+
+
+def encode_cursor(package) -> str:
+    created_at = package.created_at.isoformat() if package.created_at else None
+    raw = json.dumps({"t": created_at, "id": package.id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        created_at = parse_datetime(data["t"]) if data["t"] is not None else None
+        if data["t"] is not None and created_at is None:
+            raise ValueError(data["t"])
+        return created_at, int(data["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def after_cursor(packages, token: str, descending: bool = True):
+    """
+    Lọc các package đứng sau cursor theo thứ tự (created_at, id). Postgres để NULL đứng đầu khi
+    sort giảm dần và đứng cuối khi sort tăng dần, điều kiện dưới đây giữ đúng thứ tự đó.
+    """
+    created_at, package_id = decode_cursor(token)
+    if descending:
+        if created_at is None:
+            condition = Q(created_at__isnull=True, id__lt=package_id) | Q(created_at__isnull=False)
+        else:
+            condition = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=package_id)
+    else:
+        if created_at is None:
+            condition = Q(created_at__isnull=True, id__gt=package_id)
+        else:
+            condition = (
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=package_id) | Q(created_at__isnull=True)
+            )
+    return packages.filter(condition)
+
+
+def estimate_count(packages) -> int:
+    """Số dòng ước lượng từ planner (EXPLAIN), không phải quét toàn bộ như count()."""
+    plan = json.loads(packages.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -1,9 +1,12 @@
+import os
 import requests
 import logging
 import time
 from io import BytesIO
 import PyPDF2
 
+from api.utils import label_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,22 +38,102 @@ def convert_google_drive_url(url):
     return url  # Return original URL if not a Google Drive URL
 
 
-def download_pdf_from_url(url, max_retries=3):
+def check_pdf(source):
+    """
+    Cheap sanity check of a downloaded PDF (path or BytesIO) without parsing it: %PDF- header,
+    startxref / %%EOF trailer at the end of the file and an xref table or stream at the startxref
+    offset. Files failing the xref check (e.g. wrong offsets, which PyPDF2 can repair) are fully
+    parsed with PyPDF2 before being rejected.
+
+    Raises:
+        ValueError: If the file is not a valid PDF
+    """
+    import re
+
+    if isinstance(source, (str, os.PathLike)):
+        pdf_file = open(source, 'rb')
+    else:
+        pdf_file = source
+    try:
+        size = pdf_file.seek(0, os.SEEK_END)
+        pdf_file.seek(0)
+        head = pdf_file.read(1024)
+        pdf_file.seek(max(0, size - 2048))
+        tail = pdf_file.read()
+        if b'%PDF-' not in head:
+            raise ValueError("Invalid PDF format: missing %PDF- header")
+        startxref = tail.rfind(b'startxref')
+        if startxref == -1 or b'%%EOF' not in tail[startxref:]:
+            raise ValueError("Invalid PDF format: missing startxref / %%EOF, file may be truncated")
+        try:
+            offset = int(tail[startxref + len(b'startxref'):].split()[0])
+            pdf_file.seek(offset)
+            xref = pdf_file.read(32).lstrip()
+            valid_xref = offset < size and (xref.startswith(b'xref') or re.match(rb'\d+\s+\d+\s+obj', xref))
+        except (IndexError, ValueError, OSError):
+            valid_xref = False
+        if not valid_xref:
+            try:
+                pdf_file.seek(0)
+                # Đọc cả cây trang, PdfReader chỉ parse trailer khi khởi tạo
+                if not len(PyPDF2.PdfReader(pdf_file).pages):
+                    raise ValueError("no pages")
+            except Exception as e:
+                raise ValueError(f"Invalid PDF format: {str(e)}")
+    finally:
+        if pdf_file is not source:
+            pdf_file.close()
+        else:
+            pdf_file.seek(0)
+
+
+def download_pdf_from_url(url, max_retries=3, path=None, package_id=None):
     """
     Download PDF from URL with retry mechanism
     
     Args:
         url (str): URL of the PDF to download
         max_retries (int): Maximum number of retry attempts
+        path (str): If given, the PDF is streamed to this file instead of memory
+        package_id (str): Cache key of the label (label_cache), the URL is used if not given
         
     Returns:
         dict: Result dictionary containing:
             - success (bool): Whether download was successful
-            - data (BytesIO): PDF buffer if successful
+            - data (BytesIO): PDF buffer if successful (without path)
+            - path (str), size (int): Downloaded file if successful (with path)
             - url (str): Original URL
+            - cached (bool): Whether the PDF came from label_cache
             - error (str): Error message if failed
     """
     
+    cache_key = f"package:{package_id}" if package_id else url
+    if path:
+        if label_cache.copy_to(cache_key, path):
+            logger.info(f"Label cache hit for {cache_key}")
+            return {
+                'success': True,
+                'path': path,
+                'size': os.path.getsize(path),
+                'url': url,
+                'cached': True
+            }
+    else:
+        cached_path = label_cache.get(cache_key)
+        if cached_path:
+            try:
+                with open(cached_path, 'rb') as cached_file:
+                    pdf_buffer = BytesIO(cached_file.read())
+                logger.info(f"Label cache hit for {cache_key}")
+                return {
+                    'success': True,
+                    'data': pdf_buffer,
+                    'url': url,
+                    'cached': True
+                }
+            except OSError:
+                pass
+    
     # Convert Google Drive URLs to direct download URLs
     download_url = convert_google_drive_url(url)
     if download_url != url:
@@ -84,6 +167,34 @@ def download_pdf_from_url(url, max_retries=3):
             if 'pdf' not in content_type.lower() and not url.lower().endswith('.pdf'):
                 logger.warning(f"URL {url} may not be a PDF. Content-Type: {content_type}")
             
+            if path:
+                # Ghi thẳng ra file tạm rồi os.replace, không giữ label trong bộ nhớ và không
+                # ghi đè nội dung (inode) cũ của path
+                size = 0
+                tmp_path = f"{path}.part"
+                try:
+                    with open(tmp_path, 'wb') as pdf_file:
+                        for chunk in response.iter_content(chunk_size=65536):
+                            if chunk:
+                                pdf_file.write(chunk)
+                                size += len(chunk)
+                    
+                    check_pdf(tmp_path)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                
+                label_cache.put_file(cache_key, path)
+                logger.info(f"Successfully downloaded PDF from {url} to {path}")
+                return {
+                    'success': True,
+                    'path': path,
+                    'size': size,
+                    'url': url,
+                    'cached': False
+                }
+            
             # Read content into BytesIO
             pdf_buffer = BytesIO()
             for chunk in response.iter_content(chunk_size=8192):
@@ -93,17 +204,15 @@ def download_pdf_from_url(url, max_retries=3):
             pdf_buffer.seek(0)
             
             # Validate PDF format
-            try:
-                PyPDF2.PdfReader(pdf_buffer)
-                pdf_buffer.seek(0)  # Reset position after validation
-            except Exception as e:
-                raise ValueError(f"Invalid PDF format: {str(e)}")
+            check_pdf(pdf_buffer)
             
+            label_cache.put_bytes(cache_key, pdf_buffer.getvalue())
             logger.info(f"Successfully downloaded PDF from {url}")
             return {
                 'success': True,
                 'data': pdf_buffer,
-                'url': url
+                'url': url,
+                'cached': False
             }
             
         except requests.exceptions.Timeout:
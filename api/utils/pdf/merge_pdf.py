@@ -1,10 +1,335 @@
 import PyPDF2
+import hashlib
 import logging
+import os
+from collections import deque
 from io import BytesIO
 
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+)
+
 logger = logging.getLogger(__name__)
 
 
+class StreamingPdfMerger:
+    """
+    Merge PDF files directly into an output file.
+
+    Unlike PyPDF2.PdfMerger (which keeps every page of every source in memory until write),
+    each appended file is copied object by object into the output as soon as it is read, so
+    only one source PDF is held in memory at a time. Stream data is copied as-is (still
+    encoded), content streams are never decoded or re-compressed. Only the object offsets and
+    the page references are kept until close(), which writes the page tree, the xref table and
+    the trailer.
+
+    With ``dedupe``, objects that are identical to an object already written by an earlier
+    source (embedded fonts, logos, ICC profiles... that every shipping label repeats) are not
+    written again: they are compared by a digest of their content and of the objects they
+    reference, and the copy refers to the object already in the output.
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    HEADER = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+
+    def __init__(self, output_path, dedupe=True):
+        self.output_path = output_path
+        self.dedupe = dedupe
+        self._output = open(output_path, "wb")
+        self._output.write(self.HEADER)
+        # offsets[i] là vị trí của object số i + 1
+        self._offsets = [0, 0]
+        self._page_ids = []
+        # digest -> số object đã ghi trong output
+        self._shared = {}
+        self._unique = 0
+        self.shared_objects = 0
+
+    @property
+    def page_count(self):
+        return len(self._page_ids)
+
+    @staticmethod
+    def _is_page(obj):
+        return isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Page"
+
+    @classmethod
+    def _items(cls, obj):
+        """Entries of a dictionary to copy (the source page tree links of a page are dropped)."""
+        if cls._is_page(obj):
+            return [(key, value) for key, value in obj.items() if key not in ("/Parent", "/StructParents")]
+        return list(obj.items())
+
+    @classmethod
+    def _references(cls, obj):
+        """Indirect references contained in ``obj`` (including inside direct dictionaries / arrays)."""
+        if isinstance(obj, IndirectObject):
+            yield obj
+        elif isinstance(obj, DictionaryObject):
+            for _, value in cls._items(obj):
+                yield from cls._references(value)
+        elif isinstance(obj, ArrayObject):
+            for item in obj:
+                yield from cls._references(item)
+
+    def append(self, source):
+        """
+        Copy every page of ``source`` (path or file object) to the output.
+
+        Returns:
+            int: Number of pages appended
+        """
+        reader = PyPDF2.PdfReader(source, strict=False)
+        if reader.is_encrypted:
+            reader.decrypt("")
+
+        # Các object cần chép, theo thứ tự duyệt từ các trang; không kéo theo cây trang /
+        # catalog của file nguồn (qua /Parent, /Dest...)
+        page_keys = [(page.indirect_reference.idnum, page.indirect_reference.generation) for page in reader.pages]
+        objects = {}
+        excluded = set()
+        queue = deque(page.indirect_reference for page in reader.pages)
+        while queue:
+            indirect = queue.popleft()
+            key = (indirect.idnum, indirect.generation)
+            if key in objects or key in excluded:
+                continue
+            target = indirect.get_object()
+            if isinstance(target, DictionaryObject) and target.get("/Type") in ("/Pages", "/Catalog"):
+                excluded.add(key)
+                continue
+            objects[key] = target
+            queue.extend(self._references(target))
+
+        try:
+            digests = self._digests(objects, excluded) if self.dedupe else {}
+        except RecursionError:
+            # Chuỗi tham chiếu quá sâu: chép file này mà không dùng chung object
+            digests = {}
+
+        first_id = len(self._offsets) + 1
+        numbers = {}
+        shared = {}
+        written = []
+        for key in objects:
+            digest = digests.get(key)
+            if digest is not None:
+                number = self._shared.get(digest) or shared.get(digest)
+                if number is not None:
+                    numbers[key] = number
+                    self.shared_objects += 1
+                    continue
+            numbers[key] = first_id + len(written)
+            written.append(key)
+            if digest is not None:
+                shared[digest] = numbers[key]
+
+        def copy(obj):
+            if isinstance(obj, IndirectObject):
+                number = numbers.get((obj.idnum, obj.generation))
+                return NullObject() if number is None else IndirectObject(number, 0, None)
+            if isinstance(obj, StreamObject):
+                copied = obj.__class__()
+                copied._data = obj._data
+            elif isinstance(obj, DictionaryObject):
+                copied = DictionaryObject()
+            elif isinstance(obj, ArrayObject):
+                return ArrayObject(copy(item) for item in obj)
+            else:
+                return obj
+            for key, value in self._items(obj):
+                copied[NameObject(key)] = copy(value)
+            if self._is_page(obj):
+                copied[NameObject("/Parent")] = IndirectObject(self.PAGES_ID, 0, None)
+            return copied
+
+        # Ghi ra buffer trước để một file lỗi giữa chừng không để lại object dở dang trong output
+        buffer = BytesIO()
+        offsets = []
+        for key in written:
+            obj = objects[key]
+            offsets.append(buffer.tell())
+            buffer.write(f"{numbers[key]} 0 obj\n".encode())
+            if obj is None:
+                NullObject().write_to_stream(buffer, None)
+            else:
+                copy(obj).write_to_stream(buffer, None)
+            buffer.write(b"\nendobj\n")
+
+        base = self._output.tell()
+        self._output.write(buffer.getbuffer())
+        self._offsets.extend(base + offset for offset in offsets)
+        self._page_ids.extend(numbers[key] for key in page_keys)
+        self._shared.update(shared)
+        return len(page_keys)
+
+    def _digests(self, objects, excluded):
+        """
+        Content digest of each object, computed from its value and the digests of the objects it
+        references. Pages and objects on a reference cycle get no digest (never shared), and
+        neither does anything that references them.
+        """
+        digests = {}
+        visiting = set()
+
+        def token(obj):
+            # None: object (hoặc object nó tham chiếu) không được dùng chung
+            if isinstance(obj, IndirectObject):
+                key = (obj.idnum, obj.generation)
+                if key in excluded:
+                    return b"R-"
+                if key not in objects or key in visiting:
+                    return None
+                digest = digest_of(key)
+                return None if digest is None else b"R" + digest
+            if isinstance(obj, DictionaryObject):
+                parts = [b"<<"]
+                for key, value in sorted(obj.items()):
+                    value_token = token(value)
+                    if value_token is None:
+                        return None
+                    parts += [key.encode(), value_token]
+                if isinstance(obj, StreamObject):
+                    parts += [b"stream", hashlib.sha1(obj._data).digest()]
+                return b" ".join(parts)
+            if isinstance(obj, ArrayObject):
+                parts = [b"["]
+                for item in obj:
+                    item_token = token(item)
+                    if item_token is None:
+                        return None
+                    parts.append(item_token)
+                return b" ".join(parts)
+            return f"{type(obj).__name__}:{obj!r}".encode()
+
+        def digest_of(key):
+            if key in digests:
+                return digests[key]
+            obj = objects[key]
+            digest = None
+            if not self._is_page(obj):
+                visiting.add(key)
+                value_token = token(obj)
+                visiting.discard(key)
+                if value_token is not None:
+                    digest = hashlib.sha1(value_token).digest()
+            digests[key] = digest
+            return digest
+
+        for key in objects:
+            digest_of(key)
+        return digests
+
+    def _write_object(self, number, obj):
+        self._offsets[number - 1] = self._output.tell()
+        self._output.write(f"{number} 0 obj\n".encode())
+        obj.write_to_stream(self._output, None)
+        self._output.write(b"\nendobj\n")
+
+    def close(self):
+        """Write page tree, catalog, xref and trailer, then close the output file."""
+        if self._output.closed:
+            return
+        try:
+            pages = DictionaryObject()
+            pages[NameObject("/Type")] = NameObject("/Pages")
+            pages[NameObject("/Kids")] = ArrayObject(IndirectObject(number, 0, None) for number in self._page_ids)
+            pages[NameObject("/Count")] = NumberObject(len(self._page_ids))
+            self._write_object(self.PAGES_ID, pages)
+
+            catalog = DictionaryObject()
+            catalog[NameObject("/Type")] = NameObject("/Catalog")
+            catalog[NameObject("/Pages")] = IndirectObject(self.PAGES_ID, 0, None)
+            self._write_object(self.CATALOG_ID, catalog)
+
+            xref_offset = self._output.tell()
+            self._output.write(f"xref\n0 {len(self._offsets) + 1}\n0000000000 65535 f \n".encode())
+            for offset in self._offsets:
+                self._output.write(f"{offset:010d} 00000 n \n".encode())
+            self._output.write(
+                f"trailer\n<< /Size {len(self._offsets) + 1} /Root {self.CATALOG_ID} 0 R >>\n"
+                f"startxref\n{xref_offset}\n%%EOF\n".encode()
+            )
+        finally:
+            self._output.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PikePdfMerger:
+    """
+    Same interface as StreamingPdfMerger, backed by pikepdf (qpdf) when it is installed.
+
+    qpdf copies the stream data of the sources only when the output is saved, so every source
+    is kept open (read into memory, to not hold one file descriptor per label) until close():
+    memory grows with the total size of the labels. Repeated objects are not shared.
+    """
+
+    def __init__(self, output_path):
+        import pikepdf
+
+        self._pikepdf = pikepdf
+        self.output_path = output_path
+        self._pdf = pikepdf.new()
+        self._sources = []
+        self._closed = False
+        self.page_count = 0
+
+    def append(self, source):
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as source_file:
+                source = BytesIO(source_file.read())
+        pdf = self._pikepdf.open(source)
+        self._sources.append(pdf)
+        self._pdf.pages.extend(pdf.pages)
+        self.page_count += len(pdf.pages)
+        return len(pdf.pages)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._pdf.save(self.output_path)
+        finally:
+            self._pdf.close()
+            for pdf in self._sources:
+                pdf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+MERGE_BACKENDS = {
+    "pypdf2": StreamingPdfMerger,
+    "pikepdf": PikePdfMerger,
+}
+
+
+def open_merger(output_path, backend=None):
+    """Merger writing to ``output_path`` with the backend named by PDF_MERGE_BACKEND (or ``backend``)."""
+    from api.utils.constant import PDF_MERGE_BACKEND
+
+    name = backend or PDF_MERGE_BACKEND
+    if name not in MERGE_BACKENDS:
+        raise ValueError(f"Unknown PDF merge backend: {name}")
+    return MERGE_BACKENDS[name](output_path)
+
+
 def merge_pdf_files(pdf_results):
     """
     Merge multiple PDF files into one
@@ -101,4 +426,85 @@ def merge_pdf_files(pdf_results):
                 'url': url,
                 'error': 'Failed during merge process'
             } for url in successful_urls]
-        }
\ No newline at end of file
+        }
+
+
+def merge_pdf_files_to_file(pdf_results, output_path, backend=None):
+    """
+    Merge downloaded PDF files into ``output_path`` without loading them all in memory
+
+    Args:
+        pdf_results (iterable): Download results from download_pdf_from_url(url, path=...), in
+            output order. May be a generator: each file is appended as soon as it is yielded,
+            so downloads and merge can overlap.
+        output_path (str): Path of the merged PDF
+        backend (str): Merge backend (MERGE_BACKENDS), PDF_MERGE_BACKEND if not given
+
+    Returns:
+        dict: Same as merge_pdf_files, with output_path (str) and size (int)
+            instead of pdf_buffer
+    """
+
+    successful_urls = []
+    failed_urls = []
+    downloaded = 0
+
+    try:
+        with open_merger(output_path, backend) as merger:
+            for result in pdf_results:
+                if not result['success']:
+                    failed_urls.append({
+                        'url': result['url'],
+                        'error': result['error']
+                    })
+                    continue
+                downloaded += 1
+                try:
+                    merger.append(result['path'])
+                    successful_urls.append(result['url'])
+                except Exception as e:
+                    logger.error(f"Error adding PDF from {result['url']} to merger: {str(e)}")
+                    failed_urls.append({
+                        'url': result['url'],
+                        'error': f'Error during merge: {str(e)}'
+                    })
+
+        if not downloaded:
+            logger.error("No PDFs were successfully downloaded")
+            return {
+                'success': False,
+                'error': 'No PDFs were successfully downloaded',
+                'successful_urls': [],
+                'failed_urls': failed_urls
+            }
+
+        if not successful_urls:
+            logger.error("All PDFs failed during merge process")
+            return {
+                'success': False,
+                'error': 'All PDFs failed during merge process',
+                'successful_urls': [],
+                'failed_urls': failed_urls
+            }
+
+        logger.info(f"Successfully merged {len(successful_urls)} PDFs ({merger.page_count} pages) into {output_path}")
+
+        return {
+            'success': True,
+            'output_path': output_path,
+            'size': os.path.getsize(output_path),
+            'successful_urls': successful_urls,
+            'failed_urls': failed_urls
+        }
+
+    except Exception as e:
+        logger.error(f"Error during PDF merge: {str(e)}")
+        return {
+            'success': False,
+            'error': f'Error during PDF merge: {str(e)}',
+            'successful_urls': [],
+            'failed_urls': failed_urls + [{
+                'url': url,
+                'error': 'Failed during merge process'
+            } for url in successful_urls]
+        }
@@ -0,0 +1,365 @@
+"""
+Rollup thống kê theo ngày (UTC) cho StatisticsApi và StatisticsFinanceApi.
+
+- OrderDailyRollup (ngày × shop × status) và OrderProductDailyRollup (ngày × shop × product × status)
+  được tổng hợp lại từ order mirror cho mọi ngày (theo create_time) có đơn trong batch upsert_orders,
+  kể cả ngày cũ: đơn đổi status sau ngày tạo vẫn được cập nhật vào rollup.
+- StatementDailyRollup (ngày × shop × payment_status) được tổng hợp từ bảng Statement bởi statement_sync.
+  Các ngày trước ``RollupCursor.statement_frozen_before`` (không còn statement PROCESSING) đã chốt.
+
+Hai endpoint thống kê đọc rollup bằng một query theo (shop, day) cho mỗi bảng, chỉ khi khoảng thời
+gian gồm trọn các ngày UTC (``covers_whole_days``); nếu không vẫn tổng hợp từ đơn / statement như cũ.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, DateTimeField, F, Func, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api import setup_logging
+from api.models import (
+    Order,
+    OrderDailyRollup,
+    OrderLineItem,
+    OrderProductDailyRollup,
+    RollupCursor,
+    Statement,
+    StatementDailyRollup,
+)
+from api.utils.constant import ROLLUP_ORDER_OPEN_DAYS, STATEMENT_SYNC_STALE_SECONDS
+from api.utils.statistics import STATEMENT_AMOUNT_FIELDS
+
+logger = logging.getLogger("api.utils.rollup")
+setup_logging(logger, is_root=False, level=logging.INFO)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def day_of(timestamp) -> date:
+    return datetime.fromtimestamp(int(timestamp), dt_timezone.utc).date()
+
+
+def day_start(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc).timestamp())
+
+
+def today() -> date:
+    return timezone.now().astimezone(dt_timezone.utc).date()
+
+
+def _utc_day(field: str):
+    return TruncDate(Func(F(field), function="to_timestamp", output_field=DateTimeField()), tzinfo=dt_timezone.utc)
+
+
+def _lock_cursor(shop) -> RollupCursor:
+    """Khoá RollupCursor của shop (trong transaction) để các lần tổng hợp của một shop chạy tuần tự."""
+    RollupCursor.objects.get_or_create(shop=shop)
+    return RollupCursor.objects.select_for_update().get(shop=shop)
+
+
+def _refresh_order_days(shop, days=None):
+    """Tổng hợp lại rollup order của các ngày ``days`` (None: toàn bộ mirror của shop). Gọi trong transaction."""
+    orders = Order.objects.filter(shop=shop)
+    line_items = OrderLineItem.objects.filter(order__shop=shop)
+    status_rollups = OrderDailyRollup.objects.filter(shop=shop)
+    product_rollups = OrderProductDailyRollup.objects.filter(shop=shop)
+    if days is not None:
+        if not days:
+            return
+        # Các ngày có thể rời rạc (đơn cũ đổi status): lọc theo từng khoảng ngày
+        order_ranges = Q()
+        line_item_ranges = Q()
+        for day in days:
+            ge, lt = day_start(day), day_start(day) + SECONDS_PER_DAY
+            order_ranges |= Q(create_time__gte=ge, create_time__lt=lt)
+            line_item_ranges |= Q(order__create_time__gte=ge, order__create_time__lt=lt)
+        orders = orders.filter(order_ranges)
+        line_items = line_items.filter(line_item_ranges)
+        status_rollups = status_rollups.filter(day__in=days)
+        product_rollups = product_rollups.filter(day__in=days)
+
+    status_rows = (
+        orders.annotate(day=_utc_day("create_time"))
+        .values("day", "status")
+        .annotate(order_count=Count("id"), amount=Sum("total_amount"))
+    )
+    product_rows = (
+        line_items.annotate(day=_utc_day("order__create_time"))
+        .values("day", "order__status", "product_id")
+        .annotate(item_count=Count("id"), amount=Sum("sale_price"), name=Max("product_name"), image=Max("sku_image"))
+    )
+    if days is not None:
+        status_rows = status_rows.filter(day__in=days)
+        product_rows = product_rows.filter(day__in=days)
+
+    status_rollups.delete()
+    product_rollups.delete()
+    OrderDailyRollup.objects.bulk_create(
+        [
+            OrderDailyRollup(
+                shop=shop,
+                day=row["day"],
+                status=row["status"],
+                order_count=row["order_count"],
+                total_amount=row["amount"] or 0,
+            )
+            for row in status_rows
+        ],
+        batch_size=1000,
+    )
+    OrderProductDailyRollup.objects.bulk_create(
+        [
+            OrderProductDailyRollup(
+                shop=shop,
+                day=row["day"],
+                product_id=row["product_id"] or "",
+                status=row["order__status"],
+                product_name=row["name"],
+                sku_image=row["image"],
+                item_count=row["item_count"],
+                sale_amount=row["amount"] or 0,
+            )
+            for row in product_rows
+        ],
+        batch_size=1000,
+    )
+
+
+def update_order_rollups(shop, create_times):
+    """
+    Gọi sau khi upsert đơn: tổng hợp lại mọi ngày có đơn vừa thay đổi, kể cả ngày đã qua
+    (status của đơn đổi sau ngày tạo).
+    """
+    days = {day_of(create_time) for create_time in create_times if create_time}
+    if not days:
+        return
+    with transaction.atomic():
+        cursor = _lock_cursor(shop)
+        # Chưa build lần đầu (đang backfill): close_order_days sẽ tổng hợp toàn bộ khi sync xong
+        if cursor.order_frozen_before is None:
+            return
+        _refresh_order_days(shop, sorted(days))
+
+
+def close_order_days(shop):
+    """
+    Gọi sau mỗi lần sync thành công: build rollup lần đầu hoặc tổng hợp lại các ngày vừa ra khỏi
+    ROLLUP_ORDER_OPEN_DAYS (các ngày này vẫn được update_order_rollups cập nhật khi đơn thay đổi).
+    """
+    freeze_before = today() - timedelta(days=ROLLUP_ORDER_OPEN_DAYS)
+    with transaction.atomic():
+        cursor = _lock_cursor(shop)
+        if cursor.order_frozen_before is None:
+            _refresh_order_days(shop)
+        elif cursor.order_frozen_before < freeze_before:
+            days = []
+            day = cursor.order_frozen_before
+            while day < freeze_before:
+                days.append(day)
+                day += timedelta(days=1)
+            _refresh_order_days(shop, days)
+        else:
+            return
+        cursor.order_frozen_before = freeze_before
+        cursor.save(update_fields=["order_frozen_before"])
+
+
+def refresh_statement_days(shop, days):
+    """
+    Tổng hợp lại rollup statement của các ngày ``days`` từ bảng Statement. Ngày đã chốt được bỏ qua.
+    Gọi trong transaction của statement_sync (đã khoá RollupCursor).
+    """
+    cursor = RollupCursor.objects.get(shop=shop)
+    if cursor.statement_frozen_before is not None:
+        days = {day for day in days if day >= cursor.statement_frozen_before}
+    if not days:
+        return
+
+    rows = (
+        Statement.objects.filter(
+            shop=shop,
+            statement_time__gte=day_start(min(days)),
+            statement_time__lt=day_start(max(days)) + SECONDS_PER_DAY,
+        )
+        .annotate(day=_utc_day("statement_time"))
+        .filter(day__in=days)
+        .values("day", "payment_status")
+        .annotate(statement_count=Count("id"), **{f"total_{field}": Sum(field) for field in STATEMENT_AMOUNT_FIELDS})
+    )
+    StatementDailyRollup.objects.filter(shop=shop, day__in=days).delete()
+    StatementDailyRollup.objects.bulk_create(
+        [
+            StatementDailyRollup(
+                shop=shop,
+                day=row["day"],
+                payment_status=row["payment_status"],
+                statement_count=row["statement_count"],
+                **{field: row[f"total_{field}"] or 0 for field in STATEMENT_AMOUNT_FIELDS},
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+def order_rollup_shop_ids(shop_ids, create_time_ge: int) -> set:
+    """Các shop có rollup order đầy đủ từ create_time_ge (mirror đã backfill, còn mới và rollup đã build)."""
+    from api.utils import order_sync
+
+    mirrored = order_sync.mirrored_shop_ids(shop_ids, create_time_ge)
+    return set(
+        RollupCursor.objects.filter(shop_id__in=mirrored, order_frozen_before__isnull=False).values_list(
+            "shop_id", flat=True
+        )
+    )
+
+
+def statement_rollup_shop_ids(shop_ids, statement_time_ge: int) -> set:
+    fresh_after = timezone.now() - timedelta(seconds=STATEMENT_SYNC_STALE_SECONDS)
+    return set(
+        RollupCursor.objects.filter(
+            shop_id__in=shop_ids,
+            statement_synced_at__gte=fresh_after,
+            statement_backfilled_from__lte=day_of(statement_time_ge),
+        ).values_list("shop_id", flat=True)
+    )
+
+
+def covers_whole_days(time_ge: int, time_lt: int) -> bool:
+    """
+    [time_ge, time_lt) gồm trọn các ngày UTC (rollup chỉ có độ chi tiết theo ngày). time_lt từ
+    hiện tại trở đi tương đương cuối hôm nay vì chưa có đơn / statement sau thời điểm này.
+    """
+    return time_ge % SECONDS_PER_DAY == 0 and (
+        time_lt % SECONDS_PER_DAY == 0 or time_lt >= int(timezone.now().timestamp())
+    )
+
+
+def _day_range(time_ge: int, time_lt: int):
+    """Các ngày UTC giao với [time_ge, time_lt); chỉ dùng khi covers_whole_days."""
+    return day_of(time_ge), day_of(max(time_ge, time_lt - 1))
+
+
+def _amount(value) -> float:
+    return round(float(value or 0), 2)
+
+
+def _shop_info(shop, user) -> dict:
+    return {
+        "shop_id": str(shop.id),
+        "shop_name": str(shop.shop_name),
+        "shop_owner_id": str(user.id),
+        "shop_owner_name": str(user.username),
+    }
+
+
+def get_order_stats(shop_users, filters: dict) -> list:
+    """
+    Thống kê order từ rollup, cùng format với statistics.aggregate_order_stats.
+    ``filters``: create_time_ge, create_time_lt, order_status (như build_order_filters).
+    """
+    owners = {shop.id: (shop, user) for shop, user in shop_users}
+    first_day, last_day = _day_range(filters["create_time_ge"], filters["create_time_lt"])
+    statuses = list(filters["order_status"])
+
+    stats = {}
+    status_rows = OrderDailyRollup.objects.filter(
+        shop_id__in=list(owners), day__gte=first_day, day__lte=last_day, status__in=statuses
+    ).order_by("day", "shop_id", "status")
+    for row in status_rows.values_list("day", "shop_id", "status", "order_count", "total_amount"):
+        day, shop_id, status, order_count, total_amount = row
+        data = stats.setdefault(
+            day,
+            {
+                "orders": {"status": {"TOTAL": 0}, "payments": {"total_amount": {"TOTAL": 0}}, "shops": {}, "shop_owner": {}},
+                "products": {},
+            },
+        )
+        orders = data["orders"]
+        orders["status"]["TOTAL"] += order_count
+        orders["status"][status] = orders["status"].get(status, 0) + order_count
+        amounts = orders["payments"]["total_amount"]
+        amounts["TOTAL"] = _amount(amounts["TOTAL"] + float(total_amount))
+        amounts[status] = _amount(amounts.get(status, 0) + float(total_amount))
+        shop_entry = orders["shops"].get(shop_id)
+        if shop_entry is None:
+            shop_entry = orders["shops"][shop_id] = {**_shop_info(*owners[shop_id]), "status": {"TOTAL": 0}}
+        shop_entry["status"]["TOTAL"] += order_count
+        shop_entry["status"][status] = shop_entry["status"].get(status, 0) + order_count
+
+    product_rows = OrderProductDailyRollup.objects.filter(
+        shop_id__in=list(owners), day__gte=first_day, day__lte=last_day, status__in=statuses
+    ).order_by("day", "product_id", "shop_id", "status")
+    for row in product_rows.values_list(
+        "day", "product_id", "status", "product_name", "sku_image", "item_count", "sale_amount"
+    ):
+        day, product_id, status, product_name, sku_image, item_count, sale_amount = row
+        data = stats.get(day)
+        if data is None:
+            continue
+        product_entry = data["products"].get(product_id)
+        if product_entry is None:
+            product_entry = data["products"][product_id] = {
+                "product_id": product_id,
+                "product_name": product_name,
+                "sku_image": sku_image,
+                "status": {"TOTAL": 0},
+                "sale_price": {"TOTAL": 0},
+            }
+        product_entry["status"]["TOTAL"] += item_count
+        product_entry["status"][status] = product_entry["status"].get(status, 0) + item_count
+        sale_price = product_entry["sale_price"]
+        sale_price["TOTAL"] = _amount(sale_price["TOTAL"] + float(sale_amount))
+        sale_price[status] = _amount(sale_price.get(status, 0) + float(sale_amount))
+
+    formatted_stats = []
+    for day, data in stats.items():
+        data["orders"]["shops"] = sorted(
+            data["orders"]["shops"].values(), key=lambda x: x["status"]["TOTAL"], reverse=True
+        )
+        formatted_stats.append(
+            {
+                "date": day.strftime("%Y-%m-%d"),
+                "orders": data["orders"],
+                "products": sorted(data["products"].values(), key=lambda x: x["status"]["TOTAL"], reverse=True),
+            }
+        )
+    return sorted(formatted_stats, key=lambda x: x["date"], reverse=True)
+
+
+def get_statement_stats(shop_users, filters: dict, payment_statuses) -> list:
+    """
+    Thống kê statement từ rollup, cùng format với statistics.aggregate_statement_stats.
+    ``filters``: statement_time_ge, statement_time_lt.
+    """
+    owners = {shop.id: (shop, user) for shop, user in shop_users}
+    first_day, last_day = _day_range(filters["statement_time_ge"], filters["statement_time_lt"])
+
+    stats = {}
+    rows = StatementDailyRollup.objects.filter(
+        shop_id__in=list(owners), day__gte=first_day, day__lte=last_day, payment_status__in=list(payment_statuses)
+    ).order_by("day", "shop_id", "payment_status")
+    for row in rows.values_list("day", "shop_id", "payment_status", *STATEMENT_AMOUNT_FIELDS):
+        day, shop_id, payment_status = row[:3]
+        amounts = [float(value) for value in row[3:]]
+        data = stats.setdefault(day, {"status": {}, "shops": {}})
+        shop_entry = data["shops"].get(shop_id)
+        if shop_entry is None:
+            shop_entry = data["shops"][shop_id] = {**_shop_info(*owners[shop_id]), "status": {}}
+        for status_amounts in (data["status"], shop_entry["status"]):
+            for key in ("TOTAL", payment_status):
+                totals = status_amounts.setdefault(key, {field: 0 for field in STATEMENT_AMOUNT_FIELDS})
+                for field, amount in zip(STATEMENT_AMOUNT_FIELDS, amounts):
+                    totals[field] = _amount(totals[field] + amount)
+
+    formatted_stats = []
+    for day, data in stats.items():
+        data["shops"] = sorted(
+            data["shops"].values(), key=lambda x: x["status"]["TOTAL"]["revenue_amount"], reverse=True
+        )
+        formatted_stats.append({"date": day.strftime("%Y-%m-%d"), "statements": data})
+    return sorted(formatted_stats, key=lambda x: x["date"], reverse=True)
@@ -0,0 +1,85 @@
+"""
+Registry các Shop trong process.
+
+Order / statement chỉ mang tham chiếu gọn ``{"id", "name"}`` của shop; khi cần gọi tiếp TikTok API
+(vd: process_orders_chunk_by_shop_id, get_statement_transactions) thì lấy credentials từ registry.
+Shop được cache có TTL để token mới sau khi refresh ở process khác vẫn được cập nhật.
+"""
+
+import threading
+import time
+
+from django.db.models.signals import post_delete, post_save
+
+from api.models import Shop
+from api.utils.constant import SHOP_REGISTRY_TTL_SECONDS
+
+
+def shop_ref(shop) -> dict:
+    """Tham chiếu gọn tới shop, dùng để gắn vào order / statement trả về client."""
+    return {"id": shop.id, "name": shop.shop_name}
+
+
+class ShopRegistry:
+    def __init__(self, ttl: int = SHOP_REGISTRY_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._shops = {}
+
+    def register(self, shop: Shop) -> Shop:
+        with self._lock:
+            self._shops[shop.id] = (time.monotonic() + self.ttl, shop)
+        return shop
+
+    def _cached(self, shop_id):
+        entry = self._shops.get(shop_id)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def get(self, shop_id) -> Shop:
+        shop_id = int(shop_id)
+        shop = self._cached(shop_id)
+        if shop is None:
+            shop = self.register(Shop.objects.get(id=shop_id))
+        return shop
+
+    def get_many(self, shop_ids) -> dict:
+        shop_ids = {int(shop_id) for shop_id in shop_ids}
+        shops = {}
+        missing = []
+        for shop_id in shop_ids:
+            shop = self._cached(shop_id)
+            if shop is None:
+                missing.append(shop_id)
+            else:
+                shops[shop_id] = shop
+        for shop in Shop.objects.filter(id__in=missing):
+            shops[shop.id] = self.register(shop)
+        return shops
+
+    def resolve(self, shop) -> Shop:
+        """Nhận Shop, shop ref dict ({"id": ...}) hoặc id và trả về Shop có credentials."""
+        if isinstance(shop, Shop):
+            return shop
+        if isinstance(shop, dict):
+            return self.get(shop["id"])
+        return self.get(shop)
+
+    def invalidate(self, shop_id=None):
+        with self._lock:
+            if shop_id is None:
+                self._shops.clear()
+            else:
+                self._shops.pop(int(shop_id), None)
+
+
+registry = ShopRegistry()
+
+
+def _invalidate_shop(sender, instance, **kwargs):
+    registry.invalidate(instance.id)
+
+
+post_save.connect(_invalidate_shop, sender=Shop, dispatch_uid="shop_registry_invalidate_save")
+post_delete.connect(_invalidate_shop, sender=Shop, dispatch_uid="shop_registry_invalidate_delete")
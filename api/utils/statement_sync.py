@@ -0,0 +1,276 @@
+"""
+Đồng bộ statement TikTok của từng shop vào bảng Statement / StatementTransaction và rollup
+thống kê theo ngày (StatementDailyRollup).
+
+Statement PAID không thay đổi nữa nên chỉ cần tải một lần: mỗi lần sync lấy statement từ ngày
+chưa chốt đầu tiên tới hiện tại (lần đầu: STATEMENT_SYNC_INITIAL_DAYS ngày), upsert vào Postgres,
+ghi lại rollup các ngày đó rồi chốt các ngày đã qua không còn statement PROCESSING.
+Các view đọc statement của những ngày đã chốt từ Postgres, chỉ gọi TikTok API cho phần còn mở.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api import setup_logging
+from api.models import RollupCursor, Statement, StatementTransaction, UserShop
+from api.utils import rollup
+from api.utils.constant import STATEMENT_SYNC_INITIAL_DAYS, STATEMENT_SYNC_LOCK_SECONDS
+from api.utils.constants.statement import payment_status, payment_status_list
+from api.utils.shop_registry import registry, shop_ref
+from api.utils.statistics import STATEMENT_AMOUNT_FIELDS
+from api.utils.tiktok_base_api.finance import get_statement_transactions, get_statements
+
+logger = logging.getLogger("api.utils.statement_sync")
+setup_logging(logger, is_root=False, level=logging.INFO)
+
+# Các key do code của mình gắn thêm vào statement dict, không lưu vào data
+ATTACHED_KEYS = ("shop", "shop_owner")
+TRANSACTIONS_KEY = "statement_transactions"
+
+
+class StatementSyncError(Exception):
+    pass
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value)) if value not in (None, "") else Decimal(0)
+    except InvalidOperation:
+        return Decimal(0)
+
+
+def attach_statement_owner(statements, shop, user):
+    registry.register(shop)
+    owner = {
+        "id": user.id,
+        "username": user.username,
+    }
+    ref = shop_ref(shop)
+    for statement in statements:
+        statement["shop_owner"] = owner
+        statement["shop"] = ref
+    return statements
+
+
+def upsert_statements(shop, statements: list) -> int:
+    """Upsert statement dict (format của TikTok) của một shop. Statement đã PAID trong DB không bị ghi đè."""
+    latest = {str(data["id"]): data for data in statements if data.get("id")}
+    if not latest:
+        return 0
+    paid = set(
+        Statement.objects.filter(
+            shop=shop, statement_id__in=list(latest), payment_status=payment_status["PAID"]
+        ).values_list("statement_id", flat=True)
+    )
+    rows = [
+        Statement(
+            shop=shop,
+            statement_id=statement_id,
+            statement_time=int(data.get("statement_time") or 0),
+            payment_status=data.get("payment_status", ""),
+            currency=data.get("currency"),
+            data={key: value for key, value in data.items() if key not in ATTACHED_KEYS},
+            **{field: _decimal(data.get(field)) for field in STATEMENT_AMOUNT_FIELDS},
+        )
+        for statement_id, data in latest.items()
+        if statement_id not in paid
+    ]
+    if not rows:
+        return 0
+    Statement.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["shop", "statement_id"],
+        update_fields=["statement_time", "payment_status", "currency", "data", "synced_at", *STATEMENT_AMOUNT_FIELDS],
+    )
+    return len(rows)
+
+
+def _claim_cursor(shop):
+    cursor, _ = RollupCursor.objects.get_or_create(shop=shop)
+    now = timezone.now()
+    claimed = (
+        RollupCursor.objects.filter(pk=cursor.pk)
+        .filter(Q(statement_locked_until__isnull=True) | Q(statement_locked_until__lt=now))
+        .update(statement_locked_until=now + timedelta(seconds=STATEMENT_SYNC_LOCK_SECONDS))
+    )
+    if not claimed:
+        return None
+    cursor.refresh_from_db()
+    return cursor
+
+
+def fetch_statements(shop, user, statement_time_ge: int, statement_time_lt: int, statuses=payment_status_list) -> list:
+    """Lấy mọi statement trong khoảng thời gian, raise StatementSyncError nếu có trang lỗi."""
+    statements = []
+    for status in statuses:
+        query = {
+            "shop_cipher": shop.shop_cipher,
+            "statement_time_ge": statement_time_ge,
+            "statement_time_lt": statement_time_lt,
+            "sort_field": "statement_time",
+            "page_size": 100,
+            "payment_status": status,
+        }
+        while True:
+            response = get_statements(shop, user, query)
+            if response.status_code != 200:
+                raise StatementSyncError(response.text)
+            payload = response.json()
+            if payload.get("code") != 0:
+                raise StatementSyncError(payload.get("message") or response.text)
+            data = payload.get("data", {})
+            statements.extend(data.get("statements", []))
+            page_token = data.get("next_page_token", "")
+            if not page_token:
+                break
+            query["page_token"] = page_token
+    return statements
+
+
+def sync_shop_statements(shop) -> int | None:
+    """
+    Đồng bộ statement của các ngày chưa chốt và cập nhật rollup.
+    Trả về số statement đã lấy, None nếu shop đang được worker khác sync.
+    """
+    user_shop = UserShop.objects.filter(shop_id=shop.id).select_related("user").order_by("id").first()
+    if user_shop is None:
+        logger.info(f"Shop {shop.id} has no owner, skip statement sync")
+        return 0
+    cursor = _claim_cursor(shop)
+    if cursor is None:
+        logger.info(f"Statement sync for shop {shop.id} is already running")
+        return None
+
+    today = rollup.today()
+    first_day = cursor.statement_frozen_before or (today - timedelta(days=STATEMENT_SYNC_INITIAL_DAYS))
+    try:
+        statements = fetch_statements(
+            shop, user_shop.user, rollup.day_start(first_day), int(timezone.now().timestamp())
+        )
+    except Exception as e:
+        logger.error(f"Statement sync failed for shop {shop.id}:{shop.shop_name}: {e}")
+        RollupCursor.objects.filter(pk=cursor.pk).update(statement_last_error=str(e)[:2000], statement_locked_until=None)
+        raise
+
+    days = set()
+    day = first_day
+    while day <= today:
+        days.add(day)
+        day += timedelta(days=1)
+
+    # Chốt tới ngày đầu tiên còn statement PROCESSING (không quá hôm nay)
+    frozen_before = today
+    for statement in statements:
+        if statement.get("payment_status") == payment_status["PROCESSING"]:
+            frozen_before = min(frozen_before, rollup.day_of(statement["statement_time"]))
+
+    with transaction.atomic():
+        RollupCursor.objects.select_for_update().get(pk=cursor.pk)
+        upsert_statements(shop, statements)
+        rollup.refresh_statement_days(shop, days)
+        RollupCursor.objects.filter(pk=cursor.pk).update(
+            statement_frozen_before=max(frozen_before, first_day),
+            statement_backfilled_from=cursor.statement_backfilled_from or first_day,
+            statement_synced_at=timezone.now(),
+            statement_last_error=None,
+            statement_locked_until=None,
+        )
+    logger.info(f"Synced {len(statements)} statements for shop {shop.id}:{shop.shop_name}")
+    return len(statements)
+
+
+def get_shop_statements(shop, user, filters: dict, statuses, errors: list = None) -> list:
+    """
+    Statement của shop trong [statement_time_ge, statement_time_lt), cùng format với
+    finance.get_statements_all. Các ngày đã chốt đọc từ Postgres, phần còn mở gọi TikTok API
+    (và lưu lại kết quả). Gọi API lỗi thì chỉ trả về phần đã chốt và thêm lỗi vào ``errors``.
+    """
+    statuses = [status for status in statuses if status in payment_status_list]
+    time_ge, time_lt = filters["statement_time_ge"], filters["statement_time_lt"]
+    cursor = RollupCursor.objects.filter(shop=shop).first()
+    stored_before = time_ge
+    if (
+        cursor is not None
+        and cursor.statement_backfilled_from is not None
+        and cursor.statement_frozen_before is not None
+        and cursor.statement_backfilled_from <= rollup.day_of(time_ge)
+    ):
+        stored_before = max(time_ge, min(time_lt, rollup.day_start(cursor.statement_frozen_before)))
+
+    statements = []
+    if stored_before > time_ge:
+        stored = Statement.objects.filter(
+            shop=shop,
+            statement_time__gte=time_ge,
+            statement_time__lt=stored_before,
+            payment_status__in=list(statuses),
+        ).order_by("statement_time", "id")
+        statements.extend(stored.values_list("data", flat=True))
+
+    if stored_before < time_lt:
+        try:
+            fetched = fetch_statements(shop, user, stored_before, time_lt, statuses)
+        except Exception as e:
+            logger.error(f"Error fetching statements for shop {shop.id}:{shop.shop_name}: {e}")
+            if errors is not None:
+                errors.append(f"{shop.id} | {shop.shop_name} | cannot fetch unsettled statements: {e}")
+        else:
+            upsert_statements(shop, fetched)
+            statements.extend(fetched)
+    return attach_statement_owner(statements, shop, user)
+
+
+def fetch_statement_transactions(statement_id: str, shop):
+    """
+    Gọi statement_transactions qua mọi trang. Trả về (data của trang đầu kèm danh sách transaction
+    đầy đủ, complete); complete=False nếu có trang lỗi.
+    """
+    result = get_statement_transactions(statement_id, shop, {})
+    page_token = result.pop("next_page_token", "")
+    while page_token:
+        data = get_statement_transactions(statement_id, shop, {"page_token": page_token})
+        if not data:
+            return result, False
+        result.setdefault(TRANSACTIONS_KEY, []).extend(data.get(TRANSACTIONS_KEY, []))
+        page_token = data.get("next_page_token", "")
+    return result, bool(result)
+
+
+def get_statement_with_transactions(statement: dict) -> dict:
+    """
+    Transaction của một statement (statement dict có shop ref). Transaction của statement PAID
+    được lưu vào StatementTransaction ở lần tải đầu tiên, các lần sau đọc từ Postgres.
+    """
+    statement_id = str(statement.get("id"))
+    stored = Statement.objects.filter(shop_id=statement["shop"]["id"], statement_id=statement_id).first()
+    if stored is not None and stored.transactions_synced_at is not None:
+        transactions = list(stored.transactions.order_by("id").values_list("data", flat=True))
+        return {**stored.transactions_summary, TRANSACTIONS_KEY: transactions}
+
+    data, complete = fetch_statement_transactions(statement_id, statement["shop"])
+    if stored is not None and stored.payment_status == payment_status["PAID"] and complete:
+        with transaction.atomic():
+            StatementTransaction.objects.filter(statement=stored).delete()
+            StatementTransaction.objects.bulk_create(
+                [
+                    StatementTransaction(
+                        statement=stored,
+                        transaction_id=str(item.get("id", index)),
+                        order_id=item.get("order_id"),
+                        data=item,
+                    )
+                    for index, item in enumerate(data.get(TRANSACTIONS_KEY, []))
+                ],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+            stored.transactions_summary = {key: value for key, value in data.items() if key != TRANSACTIONS_KEY}
+            stored.transactions_synced_at = timezone.now()
+            stored.save(update_fields=["transactions_summary", "transactions_synced_at"])
+    return data
@@ -0,0 +1,257 @@
+"""
+Tổng hợp thống kê theo ngày cho StatisticsApi (order) và StatisticsFinanceApi (statement).
+
+Duyệt dữ liệu một lần, mỗi ngày giữ dict theo product_id / shop_id và chỉ sort một lần ở cuối.
+Output giống hệt cách cũ (tìm entry bằng ``next(...)`` rồi sort lại list sau mỗi order):
+số tiền vẫn được làm tròn sau mỗi lần cộng, và thứ tự các entry bằng nhau được giữ như
+khi sort ổn định (stable) sau mỗi bản ghi, xem ``RankedEntries``.
+"""
+
+import functools
+from datetime import datetime
+
+import pytz
+
+STATEMENT_AMOUNT_FIELDS = ("revenue_amount", "settlement_amount", "fee_amount", "adjustment_amount")
+
+
+class RankedEntries:
+    """
+    List entry sort giảm dần theo ``key`` mà không cần sort lại sau mỗi bản ghi.
+
+    Sort ổn định sau mỗi bản ghi tương đương: entry có key tăng (hoặc entry mới) đứng cuối
+    nhóm cùng key, entry có key giảm đứng đầu nhóm, entry không đổi giữ nguyên vị trí. Mỗi entry
+    giữ một stamp theo quy tắc đó, cuối cùng chỉ cần sort một lần theo (-key, stamp).
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.entries = {}
+        self._keys = {}
+        self._stamps = {}
+        self._touched = {}
+        self._tail = 0
+        self._head = 0
+
+    def get(self, entry_id):
+        return self.entries.get(entry_id)
+
+    def add(self, entry_id, entry):
+        self.entries[entry_id] = entry
+        self._touched[entry_id] = None
+
+    def touch(self, entry_id):
+        self._touched[entry_id] = None
+
+    def commit(self):
+        """Tương đương lần ``sorted(...)`` sau mỗi bản ghi của cách cũ."""
+        if not self._touched:
+            return
+        increased, decreased, created = [], [], []
+        for entry_id in self._touched:
+            new_key = self.key(self.entries[entry_id])
+            old_key = self._keys.get(entry_id)
+            self._keys[entry_id] = new_key
+            if old_key is None:
+                created.append(entry_id)
+            elif new_key > old_key:
+                increased.append((-old_key, self._stamps[entry_id], entry_id))
+            elif new_key < old_key:
+                decreased.append((-old_key, self._stamps[entry_id], entry_id))
+        self._touched = {}
+
+        # Thứ tự giữa các entry cùng đổi trong một bản ghi là vị trí cũ của chúng trong list
+        for _, _, entry_id in sorted(increased):
+            self._tail += 1
+            self._stamps[entry_id] = self._tail
+        for entry_id in created:
+            self._tail += 1
+            self._stamps[entry_id] = self._tail
+        self._head -= len(decreased)
+        for index, (_, _, entry_id) in enumerate(sorted(decreased)):
+            self._stamps[entry_id] = self._head + index
+
+    def sorted(self) -> list:
+        self.commit()
+        order = sorted(self.entries, key=lambda entry_id: (-self._keys[entry_id], self._stamps[entry_id]))
+        return [self.entries[entry_id] for entry_id in order]
+
+
+@functools.lru_cache(maxsize=4096)
+def _day_str(day: int) -> str:
+    return datetime.fromtimestamp(day * 86400, pytz.utc).strftime("%Y-%m-%d")
+
+
+def _date_str(timestamp) -> str:
+    # Ngày UTC chỉ phụ thuộc timestamp // 86400, format một lần cho mỗi ngày
+    return _day_str(int(timestamp // 86400))
+
+
+def _count_total(entry):
+    return entry["status"]["TOTAL"]
+
+
+def _revenue_total(entry):
+    return entry["status"]["TOTAL"]["revenue_amount"]
+
+
+def aggregate_order_stats(orders) -> list:
+    """Thống kê order theo ngày (create_time, UTC): status, payment, shop, product."""
+    stats = {}
+    for order in orders:
+        date_str = _date_str(order["create_time"])
+        day = stats.get(date_str)
+        if day is None:
+            day = stats[date_str] = {
+                "orders": {
+                    "status": {},
+                    "payments": {},
+                    "shops": RankedEntries(_count_total),
+                    "shop_owner": {},
+                },
+                "products": RankedEntries(_count_total),
+            }
+
+        order_status = order["status"]
+
+        status_counts = day["orders"]["status"]
+        status_counts.setdefault("TOTAL", 0)
+        status_counts.setdefault(order_status, 0)
+        status_counts["TOTAL"] += 1
+        status_counts[order_status] += 1
+
+        products = day["products"]
+        for item in order["line_items"]:
+            product_id = str(item["product_id"])
+            product_name = item["product_name"]
+            sku_image = item["sku_image"]
+            product_entry = products.get(product_id)
+            if not product_entry:
+                products.add(
+                    product_id,
+                    {
+                        "product_id": product_id,
+                        "product_name": product_name,
+                        "sku_image": sku_image,
+                        "status": {"TOTAL": 1, order_status: 1},
+                        "sale_price": {
+                            "TOTAL": round(float(item["sale_price"]), 2),
+                            order_status: round(float(item["sale_price"]), 2),
+                        },
+                    },
+                )
+            else:
+                product_entry["status"].setdefault(order_status, 0)
+                product_entry["status"]["TOTAL"] += 1
+                product_entry["status"][order_status] += 1
+                product_entry["sale_price"].setdefault(order_status, 0)
+                sale_price = product_entry["sale_price"]
+                sale_price["TOTAL"] = round(sale_price["TOTAL"] + float(item["sale_price"]), 2)
+                sale_price[order_status] = round(sale_price[order_status] + float(item["sale_price"]), 2)
+                products.touch(product_id)
+        products.commit()
+
+        shops = day["orders"]["shops"]
+        shop_id = str(order["shop"]["id"])
+        shop_entry = shops.get(shop_id)
+        if not shop_entry:
+            shops.add(
+                shop_id,
+                {
+                    "shop_id": shop_id,
+                    "shop_name": str(order["shop"]["name"]),
+                    "shop_owner_id": str(order["shop_owner"]["id"]),
+                    "shop_owner_name": str(order["shop_owner"]["username"]),
+                    "status": {"TOTAL": 1, order_status: 1},
+                },
+            )
+        else:
+            shop_entry["status"].setdefault(order_status, 0)
+            shop_entry["status"]["TOTAL"] += 1
+            shop_entry["status"][order_status] += 1
+            shops.touch(shop_id)
+        shops.commit()
+
+        total_amount = day["orders"]["payments"].setdefault("total_amount", {})
+        total_amount.setdefault("TOTAL", 0)
+        total_amount.setdefault(order_status, 0)
+        total_amount["TOTAL"] = round(total_amount["TOTAL"] + float(order["payment"]["total_amount"]), 2)
+        total_amount[order_status] = round(total_amount[order_status] + float(order["payment"]["total_amount"]), 2)
+
+    formatted_stats = []
+    for date, data in stats.items():
+        data["orders"]["shops"] = data["orders"]["shops"].sorted()
+        formatted_stats.append(
+            {
+                "date": date,
+                "orders": data["orders"],
+                "products": data["products"].sorted(),
+            }
+        )
+    return sorted(formatted_stats, key=lambda x: x["date"], reverse=True)
+
+
+def _empty_amounts():
+    return {field: 0 for field in STATEMENT_AMOUNT_FIELDS}
+
+
+def aggregate_statement_stats(statements) -> list:
+    """Thống kê statement theo ngày (statement_time, UTC): tổng tiền theo payment_status và theo shop."""
+    stats = {}
+    for statement in statements:
+        date_str = _date_str(statement["statement_time"])
+        day = stats.get(date_str)
+        if day is None:
+            day = stats[date_str] = {
+                "statements": {
+                    "status": {},
+                    "shops": RankedEntries(_revenue_total),
+                },
+            }
+        payment_status = statement["payment_status"]
+        amounts = [float(statement[field]) for field in STATEMENT_AMOUNT_FIELDS]
+
+        status_amounts = day["statements"]["status"]
+        status_amounts.setdefault("TOTAL", _empty_amounts())
+        status_amounts.setdefault(payment_status, _empty_amounts())
+        for field, amount in zip(STATEMENT_AMOUNT_FIELDS, amounts):
+            status_amounts["TOTAL"][field] = round(status_amounts["TOTAL"][field] + amount, 2)
+            status_amounts[payment_status][field] = round(status_amounts[payment_status][field] + amount, 2)
+
+        shops = day["statements"]["shops"]
+        shop_id = str(statement["shop"]["id"])
+        shop_entry = shops.get(shop_id)
+        if not shop_entry:
+            shops.add(
+                shop_id,
+                {
+                    "shop_id": shop_id,
+                    "shop_name": str(statement["shop"]["name"]),
+                    "shop_owner_id": str(statement["shop_owner"]["id"]),
+                    "shop_owner_name": str(statement["shop_owner"]["username"]),
+                    "status": {
+                        "TOTAL": dict(zip(STATEMENT_AMOUNT_FIELDS, amounts)),
+                        payment_status: dict(zip(STATEMENT_AMOUNT_FIELDS, amounts)),
+                    },
+                },
+            )
+        else:
+            shop_status = shop_entry["status"]
+            shop_status.setdefault(payment_status, _empty_amounts())
+            for field, amount in zip(STATEMENT_AMOUNT_FIELDS, amounts):
+                shop_status["TOTAL"][field] = round(shop_status["TOTAL"][field] + amount, 2)
+            for field, amount in zip(STATEMENT_AMOUNT_FIELDS, amounts):
+                shop_status[payment_status][field] = round(shop_status[payment_status][field] + amount, 2)
+            shops.touch(shop_id)
+        shops.commit()
+
+    formatted_stats = []
+    for date, data in stats.items():
+        data["statements"]["shops"] = data["statements"]["shops"].sorted()
+        formatted_stats.append(
+            {
+                "date": date,
+                "statements": data["statements"],
+            }
+        )
+    return sorted(formatted_stats, key=lambda x: x["date"], reverse=True)
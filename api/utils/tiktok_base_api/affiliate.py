@@ -1,8 +1,8 @@
 
-import requests
 import urllib.parse
 import json
 
+from api.utils.tiktok_base_api import client
 from api.utils.tiktok_base_api import (
     SIGN,
     TIKTOK_API_URL,
@@ -33,7 +33,7 @@ def search_seller_creators(access_token: str, app_key: str, app_secret: str, sho
     sign = SIGN.cal_sign(app_secret, urllib.parse.urlparse(url), query_params, body=body,)
     query_params["sign"] = sign
 
-    response = requests.post(url, params=query_params, headers=headers, json=json.loads(body))
+    response = client.post(url, params=query_params, headers=headers, json=json.loads(body))
     print("response.json(): ", response.json())
     logger.info(f"Search seller creators response: {response.json()}")
     return HttpResponse(response)
@@ -0,0 +1,306 @@
+"""
+Async twin (httpx) của các call TikTok API dùng trong các view fan-out nhiều shop.
+
+Mỗi event loop có một ``httpx.AsyncClient`` (connection pool keep-alive) và một semaphore
+giới hạn số request đồng thời, nên một request có thể gọi tới hàng trăm shop mà không cần
+mở hàng trăm thread. Mọi request vẫn đi qua rate limiter dùng chung (ratelimit.py).
+
+Gọi từ code sync bằng ``aio.run(func, *args)``: chạy coroutine và đóng client khi xong.
+
+Lưu ý: body POST được gửi nguyên chuỗi đã dùng để ký (``content=body``) vì httpx serialize
+``json=`` ở dạng compact, khác với chuỗi ``json.dumps`` dùng khi tính sign.
+"""
+
+import asyncio
+import json
+import urllib.parse
+import weakref
+
+import httpx
+from asgiref.sync import async_to_sync
+
+from api.utils.constant import (
+    TIKTOK_ASYNC_MAX_CONCURRENCY,
+    TIKTOK_HTTP_CONNECT_TIMEOUT,
+    TIKTOK_HTTP_POOL_MAXSIZE,
+    TIKTOK_HTTP_READ_TIMEOUT,
+)
+from api.utils.constants.order import order_status_list
+from api.utils.tiktok_base_api import SIGN, TIKTOK_API_URL, logger, ratelimit
+from api.utils.tiktok_base_api.order import (
+    attach_order_owner,
+    build_order_list_request,
+    check_order_list_response,
+)
+
+_clients = weakref.WeakKeyDictionary()
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=TIKTOK_ASYNC_MAX_CONCURRENCY,
+                max_keepalive_connections=TIKTOK_HTTP_POOL_MAXSIZE,
+            ),
+            timeout=httpx.Timeout(TIKTOK_HTTP_READ_TIMEOUT, connect=TIKTOK_HTTP_CONNECT_TIMEOUT),
+        )
+        _clients[loop] = client
+    return client
+
+
+def get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(TIKTOK_ASYNC_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def close_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def run(func, *args, **kwargs):
+    """Chạy coroutine ``func`` từ code sync (view, celery task)."""
+
+    async def runner():
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            await close_client()
+
+    return async_to_sync(runner)()
+
+
+async def request(method: str, url: str, rate_limit: bool = True, **kwargs) -> httpx.Response:
+    # Lấy token rate limit trước để request đang chờ không giữ chỗ của semaphore
+    if rate_limit:
+        await ratelimit.acquire_for_request_async(url, kwargs.get("params"), kwargs.get("headers"))
+    async with get_semaphore():
+        return await get_client().request(method, url, **kwargs)
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, body: str = None, **kwargs) -> httpx.Response:
+    if body is not None:
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers.setdefault("Content-Type", "application/json")
+        kwargs["headers"] = headers
+        kwargs["content"] = body
+    return await request("POST", url, **kwargs)
+
+
+async def callOrderList(shop, cursor):
+    url = TIKTOK_API_URL["url_get_orders"]
+
+    query_params = {
+        "app_key": shop.app_key,
+        "access_token": shop.access_token,
+        "timestamp": SIGN.get_timestamp(),
+        "sort_order": "DESC",
+        "shop_cipher": shop.shop_cipher,
+        "page_size": 100,
+        "page_token": cursor or "",
+    }
+
+    sign = SIGN.cal_sign(
+        secret=shop.app_secret,
+        url=urllib.parse.urlparse(url),
+        query_params=query_params,
+    )
+    query_params["sign"] = sign
+    headers = {
+        "Content-Type": "application/json",
+        "x-tts-access-token": shop.access_token,
+    }
+    return await post(url, params=query_params, headers=headers)
+
+
+async def callOrderDetail(shop, orderIds):
+    url = TIKTOK_API_URL["url_get_order_detail"]
+
+    query_params = {
+        "app_key": shop.app_key,
+        "access_token": shop.access_token,
+        "timestamp": SIGN.get_timestamp(),
+        "shop_cipher": shop.shop_cipher,
+        "ids": ",".join(orderIds),
+    }
+
+    sign = SIGN.cal_sign(
+        secret=shop.app_secret,
+        url=urllib.parse.urlparse(url),
+        query_params=query_params,
+    )
+    query_params["sign"] = sign
+
+    headers = {
+        "Content-Type": "application/json",
+        "x-tts-access-token": shop.access_token,
+    }
+    return await get(url, params=query_params, headers=headers)
+
+
+async def iter_order_list_pages(
+    shop,
+    user,
+    create_time_ge: int,
+    create_time_lt: int,
+    order_status: tuple,
+    buyer_user_id: str,
+    errors: list,
+    app_key: str,
+    app_secret: str,
+):
+    """Async twin của order.iter_order_list_pages: các status chạy song song, yield (status, orders)."""
+    url = TIKTOK_API_URL["url_get_order_list_new"]
+    statuses = []
+    for status in order_status:
+        if status not in order_status_list:
+            logger.error(f"Invalid order status: {status}")
+        elif status not in statuses:
+            statuses.append(status)
+    if not statuses:
+        return
+
+    pages = asyncio.Queue()
+    stop = asyncio.Event()
+    done = object()
+
+    async def fetch_status(status: str):
+        page_token = ""
+        try:
+            while not stop.is_set():
+                query_params, headers, body = build_order_list_request(
+                    shop, status, page_token, create_time_ge, create_time_lt,
+                    order_status, buyer_user_id, app_key, app_secret,
+                )
+                response = await post(url, body=json.dumps(body), params=query_params, headers=headers)
+                result = check_order_list_response(response, shop, status, errors)
+                if result == "error":
+                    stop.set()
+                if result:
+                    break
+
+                data = response.json()
+                orders = data.get("data", {}).get("orders", [])
+                await pages.put((status, attach_order_owner(orders, shop, user)))
+                page_token = data.get("data", {}).get("next_page_token", "")
+                if not page_token:
+                    break
+        except Exception as e:
+            logger.error(f"Error fetching orders for status {status}: {e}")
+            stop.set()
+        finally:
+            await pages.put(done)
+
+    tasks = [asyncio.create_task(fetch_status(status)) for status in statuses]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            item = await pages.get()
+            if item is done:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        stop.set()
+        for task in tasks:
+            task.cancel()
+
+
+async def req_get_order_list_new(
+    shop,
+    user,
+    create_time_ge: int,
+    create_time_lt: int,
+    order_status: tuple,
+    buyer_user_id: str,
+    errors: list,
+    app_key: str,
+    app_secret: str,
+):
+    """Async twin của order.req_get_order_list_new, cùng input/output."""
+    orders_by_status = {}
+    async for status, orders in iter_order_list_pages(
+        shop, user, create_time_ge, create_time_lt, order_status,
+        buyer_user_id, errors, app_key, app_secret,
+    ):
+        orders_by_status.setdefault(status, []).extend(orders)
+    all_orders = []
+    for status in dict.fromkeys(order_status):
+        all_orders.extend(orders_by_status.get(status, []))
+    return all_orders
+
+
+async def get_order_lists(shop_users, filters: dict, errors: list):
+    """
+    Fan-out req_get_order_list_new cho nhiều shop cùng lúc.
+    ``shop_users``: list (shop, user) đã resolve sẵn ở code sync (không query DB trong loop).
+    """
+    results = await asyncio.gather(
+        *[
+            req_get_order_list_new(
+                shop=shop,
+                user=user,
+                create_time_ge=filters["create_time_ge"],
+                create_time_lt=filters["create_time_lt"],
+                order_status=filters["order_status"],
+                buyer_user_id=filters["buyer_user_id"],
+                errors=errors,
+                app_key=shop.app_key,
+                app_secret=shop.app_secret,
+            )
+            for shop, user in shop_users
+        ],
+        return_exceptions=True,
+    )
+    all_orders = []
+    for (shop, _), result in zip(shop_users, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error fetching orders for shop {shop.id}: {result}")
+            continue
+        all_orders.extend(result)
+    return all_orders
+
+
+async def callUploadImage(access_token: str, img_data: str, app_key: str, app_secret: str, return_id: bool = True):
+    url = TIKTOK_API_URL["url_upload_image"]
+
+    body = json.dumps({"img_data": img_data, "img_scene": 1})
+
+    response = None
+    # Lần đầu + tối đa 3 lần thử lại nếu response không có img_id
+    for attempt in range(4):
+        query_params = {
+            "app_key": app_key,
+            "access_token": access_token,
+            "timestamp": SIGN.get_timestamp(),
+        }
+        sign = SIGN.cal_sign(
+            secret=app_secret,
+            url=urllib.parse.urlparse(url),
+            query_params=query_params,
+            body=body,
+        )
+        query_params["sign"] = sign
+
+        response = await post(url, body=body, params=query_params)
+        if not return_id:
+            return response
+        response_data = response.json()
+        if response_data and response_data.get("data") and "img_id" in response_data["data"]:
+            return response_data["data"]["img_id"]
+        logger.warning(f"Upload image attempt {attempt + 1}/4 returned no img_id: {response.text}")
+
+    return response
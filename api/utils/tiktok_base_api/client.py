@@ -0,0 +1,104 @@
+"""
+HTTP client dùng chung cho toàn bộ các call tới TikTok API.
+
+Mỗi process (gunicorn worker / celery worker) giữ một ``requests.Session`` với
+connection pool keep-alive, nên các thread trong OrderDetail / process_orders_chunk_by_shop_id
+tái sử dụng kết nối TLS thay vì bắt tay lại cho mỗi request.
+Mọi request đều đi qua rate limiter (ratelimit.py) trước khi gửi.
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.utils.constant import (
+    TIKTOK_HTTP_CONNECT_TIMEOUT,
+    TIKTOK_HTTP_POOL_BLOCK,
+    TIKTOK_HTTP_POOL_CONNECTIONS,
+    TIKTOK_HTTP_POOL_MAXSIZE,
+    TIKTOK_HTTP_READ_TIMEOUT,
+)
+from api.utils.tiktok_base_api import ratelimit
+
+DEFAULT_TIMEOUT = (TIKTOK_HTTP_CONNECT_TIMEOUT, TIKTOK_HTTP_READ_TIMEOUT)
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    # pool_block=True: giới hạn số kết nối tới mỗi host đúng bằng pool_maxsize,
+    # thread thừa sẽ chờ kết nối rảnh thay vì mở thêm socket rồi bỏ đi
+    adapter = HTTPAdapter(
+        pool_connections=TIKTOK_HTTP_POOL_CONNECTIONS,
+        pool_maxsize=TIKTOK_HTTP_POOL_MAXSIZE,
+        pool_block=TIKTOK_HTTP_POOL_BLOCK,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Trả về session của process hiện tại, tạo lại sau khi fork."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                # Không dùng lại socket kế thừa từ process cha
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def request(method: str, url: str, rate_limit: bool = True, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    if rate_limit:
+        ratelimit.acquire_for_request(url, kwargs.get("params"), kwargs.get("headers"))
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def put(url: str, **kwargs) -> requests.Response:
+    return request("PUT", url, **kwargs)
+
+
+def delete(url: str, **kwargs) -> requests.Response:
+    return request("DELETE", url, **kwargs)
+
+
+def pool_stats() -> dict:
+    """
+    Thống kê tái sử dụng kết nối theo host của process hiện tại.
+
+    ``requests`` là tổng số request đã gửi qua pool, ``connections`` là số kết nối
+    TCP/TLS đã mở; ``reused`` = requests - connections.
+    """
+    stats = {}
+    session = _session
+    if session is None or _session_pid != os.getpid():
+        return stats
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{key.key_scheme}://{key.key_host}:{key.key_port}"
+            entry = stats.setdefault(host, {"connections": 0, "requests": 0, "reused": 0})
+            entry["connections"] += pool.num_connections
+            entry["requests"] += pool.num_requests
+            entry["reused"] = entry["requests"] - entry["connections"]
+    return stats
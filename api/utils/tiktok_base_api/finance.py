@@ -1,7 +1,8 @@
 import urllib.parse
-import requests
 
 from api.utils.constants.statement import payment_status_list
+from api.utils.shop_registry import registry, shop_ref
+from api.utils.tiktok_base_api import client
 from api.utils.tiktok_base_api import (
     SIGN,
     TIKTOK_API_URL,
@@ -44,17 +45,15 @@ def get_statements_by_status(shop, user, query: dict, payment_status: str):
 
         data = response.json().get("data", {})
         statements = data.get("statements", [])
+        registry.register(shop)
+        owner = {
+            "id": user.id,
+            "username": user.username,
+        }
+        ref = shop_ref(shop)
         for statement in statements:
-            statement["shop_owner"] = {
-                "id": user.id,
-                "username": user.username,
-            }
-            statement["shop"] = {
-                "id": shop.id,
-                "name": shop.shop_name,
-                "shop_cipher": shop.shop_cipher,
-                "access_token": shop.access_token,
-            }
+            statement["shop_owner"] = owner
+            statement["shop"] = ref
             all_statements.extend([statement])
         page_token = data.get("next_page_token", "")
         is_within_range = bool(page_token)
@@ -76,18 +75,20 @@ def get_statements(shop, user, query: dict):
     )
     query_params["sign"] = sign
     headers = {"x-tts-access-token": shop.access_token}
-    response = requests.get(url, params=query_params, headers=headers)
+    response = client.get(url, params=query_params, headers=headers)
     return response
 
 
-def get_statement_transactions(statement_id: str, shop: dict, query: dict):
+def get_statement_transactions(statement_id: str, shop, query: dict):
+    """``shop``: Shop hoặc shop ref ({"id", "name"}) gắn trên statement."""
+    shop = registry.resolve(shop)
     url = TIKTOK_API_URL["url_get_statement_transactions"].replace(
         "{statement_id}", statement_id
     )
     query_params = {
         "app_key": app_key,
         "timestamp": SIGN.get_timestamp(),
-        "shop_cipher": shop["shop_cipher"],
+        "shop_cipher": shop.shop_cipher,
         "sort_field": "order_create_time",
         "page_size": 100,
     }
@@ -98,7 +99,7 @@ def get_statement_transactions(statement_id: str, shop: dict, query: dict):
         query_params=query_params,
     )
     query_params["sign"] = sign
-    headers = {"x-tts-access-token": shop["access_token"]}
-    response = requests.get(url, params=query_params, headers=headers)
+    headers = {"x-tts-access-token": shop.access_token}
+    response = client.get(url, params=query_params, headers=headers)
     data = response.json().get("data", {})
     return data
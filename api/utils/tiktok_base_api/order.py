@@ -1,11 +1,14 @@
 import json
+import queue
+import threading
 import urllib.parse
 
-import requests
 from django.contrib.auth.models import User
 
 from api.models import Shop
 from api.utils.constants.order import order_status_list
+from api.utils.shop_registry import registry, shop_ref
+from api.utils.tiktok_base_api import client
 from api.utils.tiktok_base_api import (
     SIGN,
     TIKTOK_API_URL,
@@ -39,13 +42,40 @@ def callOrderList(shop, cursor):
         'Content-Type': 'application/json',
         'x-tts-access-token': shop.access_token,
     }
-    response = requests.post(url, params=query_params, headers=headers)
+    response = client.post(url, params=query_params, headers=headers)
 
     print("response order list", response.text)
 
     return response
 
 
+def callOrderListByUpdateTime(shop, update_time_ge: int, update_time_lt: int, page_token: str = ""):
+    """Tìm đơn theo khoảng update_time, sắp xếp tăng dần (dùng cho sync order mirror)."""
+    url = TIKTOK_API_URL["url_get_order_list_new"]
+
+    query_params = {
+        "app_key": shop.app_key,
+        "access_token": shop.access_token,
+        "timestamp": SIGN.get_timestamp(),
+        "page_size": 100,
+        "sort_field": "update_time",
+        "sort_order": "ASC",
+        "page_token": page_token or "",
+        "shop_cipher": shop.shop_cipher,
+    }
+    body = {"update_time_ge": update_time_ge, "update_time_lt": update_time_lt}
+
+    sign = SIGN.cal_sign(
+        secret=shop.app_secret,
+        url=urllib.parse.urlparse(url),
+        query_params=query_params,
+        body=json.dumps(body),
+    )
+    query_params["sign"] = sign
+    headers = {"x-tts-access-token": shop.access_token}
+    return client.post(url, params=query_params, headers=headers, json=body)
+
+
 def callOrderDetail(shop, orderIds):
     url = TIKTOK_API_URL["url_get_order_detail"]
 
@@ -69,7 +99,7 @@ def callOrderDetail(shop, orderIds):
         'Content-Type': 'application/json',
         'x-tts-access-token': shop.access_token,
     }
-    response = requests.get(url, params=query_params, headers=headers)
+    response = client.get(url, params=query_params, headers=headers)
 
     return response
 
@@ -103,7 +133,7 @@ def callGetShippingDocument(shop, order_id):
         'Content-Type': 'application/json',
         'x-tts-access-token': shop.access_token,
     }
-    response = requests.get(url, params=query_params, headers=headers)
+    response = client.get(url, params=query_params, headers=headers)
 
     try:
         response_data = response.json()
@@ -136,7 +166,7 @@ def callPreCombinePackage(access_token, app_key, app_secret):
     )
     query_params["sign"] = sign
 
-    response = requests.get(url, params=query_params)
+    response = client.get(url, params=query_params)
 
     logger.info(f"PreCombinePackage response: {response.text}")
 
@@ -157,7 +187,7 @@ def callConFirmCombinePackage(access_token, body_raw_json, app_key:str, app_secr
     sign = SIGN.cal_sign(app_secret, urllib.parse.urlparse(url), query_params, body)
     query_params["sign"] = sign
 
-    response = requests.post(url, params=query_params, json=json.loads(body))
+    response = client.post(url, params=query_params, json=json.loads(body))
 
     logger.info(f"ConfirmCombinePackage response: {response.text}")
 
@@ -183,7 +213,7 @@ def callGetShippingService(shop, body_raw_json):
         'Content-Type': 'application/json',
         'x-tts-access-token': shop.access_token,
     }
-    response = requests.post(url, params=query_params, json=json.loads(body), headers=headers)
+    response = client.post(url, params=query_params, json=json.loads(body), headers=headers)
 
     logger.info(f"GetShippingService response: {response.text}")
 
@@ -210,7 +240,7 @@ def callSearchPackage(shop):
         'Content-Type': 'application/json',
         'x-tts-access-token': shop.access_token,
     }
-    response = requests.post(url, params=query_params, json=json.loads(body), headers=headers)
+    response = client.post(url, params=query_params, json=json.loads(body), headers=headers)
 
     logger.info(f"SearchPackage response: {response.text}")
 
@@ -238,7 +268,7 @@ def callCreatePackages(shop, package_id):
         'Content-Type': 'application/json',
         'x-tts-access-token': shop.access_token,
     }
-    response = requests.get(url, params=query_params, headers=headers)
+    response = client.get(url, params=query_params, headers=headers)
 
     # logger.info(f'GetPackageDetail response: {response.text}')
     print("res package detail", response.text)
@@ -264,7 +294,7 @@ def callCreateLabel(shop, body_raw_json):
         'Content-Type': 'application/json',
         'x-tts-access-token': shop.access_token,
     }
-    response = requests.post(url, params=query_params, json=json.loads(body), headers=headers)
+    response = client.post(url, params=query_params, json=json.loads(body), headers=headers)
     print("response create label", response.text)
     return HttpResponse(response)
 
@@ -290,7 +320,7 @@ def callGetShippingDoc(shop, package_id):
             'Content-Type': 'application/json',
             'x-tts-access-token': shop.access_token,
         }
-        response = requests.get(url, params=query_params, headers=headers)
+        response = client.get(url, params=query_params, headers=headers)
 
         try:
             response_data = response.json()
@@ -331,7 +361,7 @@ def cancel_order(shop, cancel_reason_key, order_id):
         'Content-Type': 'application/json',
         'x-tts-access-token': shop.access_token,
     }
-    response = requests.post(url, params=query_params, json=json.loads(body), headers=headers)
+    response = client.post(url, params=query_params, json=json.loads(body), headers=headers)
 
     logger.info(f"SearchPackage response: {response.text}")
     return response
@@ -341,7 +371,80 @@ def check_and_append_errors(errors, shop_id, shop_name):
     return not any(f"{shop_id} |" in error for error in errors)
 
 
-def req_get_order_list_new(
+def attach_order_owner(orders, shop, user):
+    # Order chỉ giữ tham chiếu gọn tới shop, credentials lấy lại từ shop_registry khi cần
+    registry.register(shop)
+    owner = {
+        "id": user.id,
+        "username": user.username,
+    }
+    ref = shop_ref(shop)
+    for order in orders:
+        order["shop_owner"] = owner
+        order["shop"] = ref
+    return orders
+
+
+def build_order_list_request(
+    shop, status, page_token, create_time_ge, create_time_lt, order_status, buyer_user_id, app_key, app_secret
+):
+    """Tạo (query_params, headers, body) đã ký cho một trang của url_get_order_list_new."""
+    url = TIKTOK_API_URL["url_get_order_list_new"]
+    query_params = {
+        "app_key": app_key,
+        "access_token": shop.access_token,
+        "timestamp": SIGN.get_timestamp(),
+        "page_size": 100,
+        "sort_order": "DESC",
+        "page_token": page_token or "",
+        "shop_cipher": shop.shop_cipher,
+    }
+
+    headers = {"x-tts-access-token": shop.access_token}
+    body = {}
+    if create_time_ge:
+        body["create_time_ge"] = create_time_ge
+    if create_time_lt:
+        body["create_time_lt"] = create_time_lt
+    if order_status:
+        body["order_status"] = status
+    if buyer_user_id:
+        body["buyer_user_id"] = buyer_user_id
+
+    sign = SIGN.cal_sign(
+        secret=app_secret,
+        url=urllib.parse.urlparse(url),
+        query_params=query_params,
+        body=json.dumps(body),
+    )
+    query_params["sign"] = sign
+    return query_params, headers, body
+
+
+def check_order_list_response(response, shop, status, errors):
+    """
+    Kiểm tra response của url_get_order_list_new.
+    Trả về "expired" (dừng status hiện tại), "error" (dừng tất cả status) hoặc None nếu OK.
+    """
+    if "access token is expired" in response.text:
+        if check_and_append_errors(errors, shop.id, shop.shop_name):
+            errors.append(f"{shop.id} | {shop.shop_name} | token expired.")
+        logger.error(
+            f"Access token for shop {shop.id}:{shop.shop_name} is expired."
+        )
+        return "expired"
+
+    if response.status_code != 200:
+        if check_and_append_errors(errors, shop.id, shop.shop_name):
+            errors.append(f"{shop.id} | {shop.shop_name} | wrong token.")
+        logger.error(
+            f"Error fetching data for status {status}: {response.text}"
+        )
+        return "error"
+    return None
+
+
+def iter_order_list_pages(
     shop: Shop,
     user: User,
     create_time_ge: int,
@@ -349,95 +452,94 @@ def req_get_order_list_new(
     order_status: tuple,
     buyer_user_id: str,
     errors: list,
-    app_key:str, 
-    app_secret:str
+    app_key: str,
+    app_secret: str,
 ):
+    """
+    Lấy đơn của các status song song (mỗi status một chuỗi page_token riêng, cùng đi qua
+    rate limiter) và yield (status, orders) ngay khi từng trang về.
+    Một status bị lỗi (không phải token hết hạn) sẽ dừng tất cả các status còn lại.
+    """
     url = TIKTOK_API_URL["url_get_order_list_new"]
-    all_orders = []
-    page_token = ""
-    is_within_range = True
-    error_occurred = False
-
-    def fetch_orders_for_status(status: str):
+    statuses = []
+    for status in order_status:
         if status not in order_status_list:
             logger.error(f"Invalid order status: {status}")
-            return []
-        nonlocal page_token, is_within_range, error_occurred
-        orders_for_status = []
-        while is_within_range and not error_occurred:
-            query_params = {
-                "app_key": app_key,
-                "access_token": shop.access_token,
-                "timestamp": SIGN.get_timestamp(),
-                "page_size": 100,
-                "sort_order": "DESC",
-                "page_token": page_token or "",
-                "shop_cipher": shop.shop_cipher,
-            }
+        elif status not in statuses:
+            statuses.append(status)
+    if not statuses:
+        return
 
-            headers = {"x-tts-access-token": shop.access_token}
-            body = {}
-            if create_time_ge:
-                body["create_time_ge"] = create_time_ge
-            if create_time_lt:
-                body["create_time_lt"] = create_time_lt
-            if order_status:
-                body["order_status"] = status
-            if buyer_user_id:
-                body["buyer_user_id"] = buyer_user_id
-
-            sign = SIGN.cal_sign(
-                secret=app_secret,
-                url=urllib.parse.urlparse(url),
-                query_params=query_params,
-                body=json.dumps(body),
-            )
-            query_params["sign"] = sign
+    pages = queue.Queue()
+    stop = threading.Event()
+    done = object()
 
-            response = requests.post(
-                url, params=query_params, headers=headers, json=body or {}
-            )
-            if "access token is expired" in response.text:
-                if check_and_append_errors(errors, shop.id, shop.shop_name):
-                    errors.append(f"{shop.id} | {shop.shop_name} | token expired.")
-                logger.error(
-                    f"Access token for shop {shop.id}:{shop.shop_name} is expired."
+    def fetch_status(status: str):
+        page_token = ""
+        try:
+            while not stop.is_set():
+                query_params, headers, body = build_order_list_request(
+                    shop, status, page_token, create_time_ge, create_time_lt,
+                    order_status, buyer_user_id, app_key, app_secret,
                 )
-                break
-
-            if response.status_code != 200:
-                if check_and_append_errors(errors, shop.id, shop.shop_name):
-                    errors.append(f"{shop.id} | {shop.shop_name} | wrong token.")
-                logger.error(
-                    f"Error fetching data for status {status}: {response.text}"
+                response = client.post(
+                    url, params=query_params, headers=headers, json=body or {}
                 )
-                error_occurred = True
-                break
-
-            data = response.json()
-            orders = data.get("data", {}).get("orders", [])
-            for order in orders:
-                order["shop_owner"] = {
-                    "id": user.id,
-                    "username": user.username,
-                }
-                order["shop"] = {
-                    "id": shop.id,
-                    "name": shop.shop_name,
-                    "shop_cipher": shop.shop_cipher,
-                    "access_token": shop.access_token,
-                    "app_key":shop.app_key,
-                    "app_secret":shop.app_secret
-                }
-            orders_for_status.extend(orders)
-            page_token = data.get("data", {}).get("next_page_token", "")
-            is_within_range = bool(page_token)
-        return orders_for_status
+                result = check_order_list_response(response, shop, status, errors)
+                if result == "error":
+                    stop.set()
+                if result:
+                    break
+
+                data = response.json()
+                orders = data.get("data", {}).get("orders", [])
+                pages.put((status, attach_order_owner(orders, shop, user)))
+                page_token = data.get("data", {}).get("next_page_token", "")
+                if not page_token:
+                    break
+        except Exception as e:
+            logger.error(f"Error fetching orders for status {status}: {e}")
+            stop.set()
+        finally:
+            pages.put(done)
+
+    with ThreadPoolExecutor(max_workers=len(statuses)) as executor:
+        for status in statuses:
+            executor.submit(fetch_status, status)
+        remaining = len(statuses)
+        try:
+            while remaining:
+                item = pages.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            # Caller dừng sớm: báo các thread không lấy thêm trang
+            stop.set()
 
-    for status in order_status:
-        all_orders.extend(fetch_orders_for_status(status))
-        page_token = ""
-        is_within_range = True
+
+def req_get_order_list_new(
+    shop: Shop,
+    user: User,
+    create_time_ge: int,
+    create_time_lt: int,
+    order_status: tuple,
+    buyer_user_id: str,
+    errors: list,
+    app_key:str, 
+    app_secret:str
+):
+    # Các status được lấy song song, kết quả vẫn ghép theo thứ tự status truyền vào
+    orders_by_status = {}
+    for status, orders in iter_order_list_pages(
+        shop, user, create_time_ge, create_time_lt, order_status,
+        buyer_user_id, errors, app_key, app_secret,
+    ):
+        orders_by_status.setdefault(status, []).extend(orders)
+    all_orders = []
+    for status in dict.fromkeys(order_status):
+        all_orders.extend(orders_by_status.get(status, []))
     return all_orders
 
 
@@ -467,8 +569,12 @@ def process_orders_chunk_by_shop_id(chunk):
 
     with ThreadPoolExecutor(max_workers=10) as executor:
         futures = []
+        shops = registry.get_many(orders_by_shop_id.keys())
         for shop_id, shop_data in orders_by_shop_id.items():
-            shop = shop_data["shop"]
+            shop = shops.get(int(shop_id))
+            if shop is None:
+                logger.error(f"Shop {shop_id} not found, skip order detail")
+                continue
             orders = shop_data["orders"]
             # print("sss", shop_data)
             for sub_chunk in split_into_chunks(orders, 50):
@@ -490,22 +596,19 @@ def process_orders_chunk_by_shop_id(chunk):
                     ]
                     sub_order["packages"] = packages
                     sub_order["item_list"] = detailed_order.get("line_items", [])
-                    sub_order["shop"] = {
-                        key: value
-                        for key, value in shop.items()
-                        if key not in ["access_token", "shop_cipher"]
-                    }
+                    sub_order["shop"] = shop_ref(shop)
             detailed_orders.extend(sub_chunk)
 
     return detailed_orders
 
 
 def req_get_order_detail_new(ids: list, shop, shop_owner):
+    shop = registry.resolve(shop)
     url = TIKTOK_API_URL["url_get_order_detail_new"]
     query_params = {
         "app_key": shop.app_key,
         "timestamp": SIGN.get_timestamp(),
-        "shop_cipher": shop["shop_cipher"],
+        "shop_cipher": shop.shop_cipher,
         "ids": ",".join(ids),
     }
     sign = SIGN.cal_sign(
@@ -514,37 +617,34 @@ def req_get_order_detail_new(ids: list, shop, shop_owner):
         query_params=query_params,
     )
     query_params["sign"] = sign
-    headers = {"x-tts-access-token": shop["access_token"]}
-    response = requests.get(url, params=query_params, headers=headers)
+    headers = {"x-tts-access-token": shop.access_token}
+    response = client.get(url, params=query_params, headers=headers)
     orders = response.json().get("data", {}).get("orders", [])
+    ref = shop_ref(shop)
     for order in orders:
         order["shop_owner"] = shop_owner
-        order["shop"] = {
-            key: value
-            for key, value in shop.items()
-            if key not in ["access_token", "shop_cipher"]
-        }
+        order["shop"] = ref
     return orders
 
 
 def req_get_order_detail_old(ids: list, shop):
-    print("da vao day", ids)
+    shop = registry.resolve(shop)
     url = TIKTOK_API_URL["url_get_order_detail"]
     query_params = {
-        "app_key": shop["app_key"],
+        "app_key": shop.app_key,
         "timestamp": SIGN.get_timestamp(),
-        "shop_cipher": shop["shop_cipher"],
-        "access_token": shop["access_token"],
+        "shop_cipher": shop.shop_cipher,
+        "access_token": shop.access_token,
         "ids": ",".join(ids),
     }
     sign = SIGN.cal_sign(
-        secret=shop["app_secret"],
+        secret=shop.app_secret,
         url=urllib.parse.urlparse(url),
         query_params=query_params,
     )
     query_params["sign"] = sign
-    headers = {"x-tts-access-token": shop["access_token"]}
-    response = requests.get(url, params=query_params, headers=headers)
+    headers = {"x-tts-access-token": shop.access_token}
+    response = client.get(url, params=query_params, headers=headers)
 
     orders = response.json().get("data", {}).get("orders", [])
     # for order in orders:
@@ -575,5 +675,5 @@ def update_tracking_infor(order_ids,shop,tracking_ids):
         body=body,
     )
     query_params["sign"] = sign
-    response = requests.post(url, params=query_params, json=json.loads(body))
+    response = client.post(url, params=query_params, json=json.loads(body))
     return response
\ No newline at end of file
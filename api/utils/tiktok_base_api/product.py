@@ -4,6 +4,7 @@ import urllib.parse
 
 import requests
 
+from api.utils.tiktok_base_api import client
 from api.utils.tiktok_base_api import (
     SIGN,
     TIKTOK_API_URL,
@@ -42,7 +43,7 @@ def callProductList(access_token: str, page_number: str, app_key:str, app_secret
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = client.post(url=url, params=query_params, json=json.loads(body))
 
     logger.info(f"Get product list status code: {response.status_code}")
 
@@ -68,7 +69,7 @@ def callProductDetail(access_token: str, product_id: int, app_key:str, app_secre
 
     query_params["sign"] = sign
 
-    response = requests.get(url=url, params=query_params)
+    response = client.get(url=url, params=query_params)
 
     logger.info(f"Get product detail status code: {response.status_code}")
     # logger.info(f'Get product detail response: {response.text}')
@@ -94,7 +95,7 @@ def callGlobalCategories(access_token: str, app_key, app_secret) -> requests.Res
 
     query_params["sign"] = sign
 
-    response = requests.get(url=url, params=query_params)
+    response = client.get(url=url, params=query_params)
 
     logger.info(f"Get global categories status code: {response.status_code}")
     # logger.info(f'Get global categories response: {response.text}')
@@ -120,7 +121,7 @@ def getCategories(access_token: str, app_key:str, app_secret:str) -> requests.Re
 
     query_params["sign"] = sign
 
-    response = requests.get(url=url, params=query_params)
+    response = client.get(url=url, params=query_params)
 
     logger.info(f"Get categories status code: {response.status_code}")
     # logger.info(f'Get categories response: {response.text}')
@@ -151,7 +152,7 @@ def getWareHouseList(shop) -> requests.Response:
         'x-tts-access-token': shop.access_token,
     }
 
-    response = requests.get(url=url, params=query_params, headers=headers)
+    response = client.get(url=url, params=query_params, headers=headers)
 
     logger.info(f"Get warehouse list status code: {response.status_code}")
     # logger.info(f'Get warehouse list response: {response.text}')
@@ -171,7 +172,7 @@ def getBrands(access_token: str, app_key:str, app_secret:str) -> requests.Respon
     sign = SIGN.cal_sign(app_secret, urllib.parse.urlparse(url), query_params)
     query_params["sign"] = sign
 
-    response = requests.get(url, params=query_params)
+    response = client.get(url, params=query_params)
 
     logger.info(f"Get brands status code: {response.status_code}")
     # logger.info(f'Get brands response: {response.text}')
@@ -192,7 +193,7 @@ def getAttributes(access_token: str, category_id: str, app_key:str, app_secret:s
     sign = SIGN.cal_sign(app_secret, urllib.parse.urlparse(url), query_params)
     query_params["sign"] = sign
 
-    response = requests.get(url, params=query_params)
+    response = client.get(url, params=query_params)
 
     logger.info(f"Get attributes status code: {response.status_code}")
     # logger.info(f'Get attributes response: {response.text}')
@@ -310,7 +311,7 @@ def createProduct(access_token, shop_cipher, title, images_ids, product_object,
     query_params["sign"] = sign
     # print("body", body)
     
-    response = requests.post(url, params=query_params, headers=headers, json=json.loads(body))
+    response = client.post(url, params=query_params, headers=headers, json=json.loads(body))
     return response
 
 
@@ -397,7 +398,7 @@ def callCreateOneProduct(access_token: str, product_object, app_key, app_secret)
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = client.post(url=url, params=query_params, json=json.loads(body))
 
     logger.info(f"Create product status code: {response.status_code}")
     # logger.info(f'Create product response: {response.text}')
@@ -425,7 +426,7 @@ def callUploadImage(access_token: str, img_data: str, app_key:str, app_secret:st
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = client.post(url=url, params=query_params, json=json.loads(body))
     print("ressss", response.text)
     if return_id:
         response_data = response.json()
@@ -447,7 +448,7 @@ def callUploadImage(access_token: str, img_data: str, app_key:str, app_secret:st
                 )
                 query_params["sign"] = sign
                 
-                response = requests.post(url=url, params=query_params, json=json.loads(body))
+                response = client.post(url=url, params=query_params, json=json.loads(body))
                 response_data = response.json()
                 print(f"Retry response_data: {response_data}")
                 
@@ -535,7 +536,7 @@ def callEditProduct(access_token, product_object, imgBase64, app_key, app_secret
     sign = SIGN.cal_sign(app_secret, urllib.parse.urlparse(url), query_params, body)
     query_params["sign"] = sign
 
-    response = requests.put(url, params=query_params, json=json.loads(body))
+    response = client.put(url, params=query_params, json=json.loads(body))
     return response
 
 
@@ -558,7 +559,7 @@ def callGetAttribute(access_token, category_id, app_key, app_secret):
 
     query_params["sign"] = sign
 
-    response = requests.get(url, params=query_params)
+    response = client.get(url, params=query_params)
 
     try:
         response_data = response.json()
@@ -642,7 +643,7 @@ def callCreateOneProductDraf(access_token, product_object, app_key, app_secret):
     sign = SIGN.cal_sign(app_secret, urllib.parse.urlparse(url), query_params, body)
     query_params["sign"] = sign
 
-    response = requests.post(url, params=query_params, json=json.loads(body))
+    response = client.post(url, params=query_params, json=json.loads(body))
 
     logger.info(f"Create product draf response: {response.text}")
 
@@ -664,7 +665,7 @@ def categoryRecommend(access_token, product_title, app_key, app_secret):
     sign = SIGN.cal_sign(app_secret, urllib.parse.urlparse(url), query_params, body)
     query_params["sign"] = sign
 
-    response = requests.post(url, params=query_params, json=json.loads(body))
+    response = client.post(url, params=query_params, json=json.loads(body))
 
     logger.info(f"Category recommend response: {response.text}")
 
@@ -686,7 +687,7 @@ def delete_product(access_token, product_ids, app_key, app_secret):
     sign = SIGN.cal_sign(app_secret, urllib.parse.urlparse(url), query_params, body)
     query_params["sign"] = sign
 
-    response = requests.delete(url, params=query_params, json=json.loads(body))
+    response = client.delete(url, params=query_params, json=json.loads(body))
 
     logger.info(f"delete product: {response.text}")
 
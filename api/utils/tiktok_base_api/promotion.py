@@ -7,10 +7,11 @@ import urllib.parse
 from datetime import datetime
 from uuid import uuid4
 from django.http import JsonResponse as JsonResponse
-import requests
 from rest_framework import status
 from rest_framework.response import Response
 
+from api.utils.constant import PROMOTION_CREATE_PACK_DELAY, PROMOTION_CREATE_START_DELAY
+from api.utils.tiktok_base_api import aio, client
 from api.utils.tiktok_base_api import SIGN, TIKTOK_API_URL, app_key, logger, secret
 from tiktok.middleware import BadRequestException
 
@@ -18,17 +19,39 @@ from .product import callProductList
 
 PROMOTION_SKUS_LIMIT = 2999
 
-semaphore = asyncio.Semaphore(10)
 
+def get_active_products(access_token: str, page_number: int, page_size: int):
+    """
+    Get products
+    """
+    url = TIKTOK_API_URL["url_product_list"]
 
-async def limiter(func):
-    async with semaphore:
-        return await func()
+    query_params = {"app_key": app_key, "access_token": access_token, "timestamp": SIGN.get_timestamp()}
 
+    body = json.dumps(
+        {
+            "page_size": page_size,
+            "page_number": page_number,
+            "search_status": 4,
+        }
+    )
 
-def get_active_products(access_token: str, page_number: int, page_size: int):
+    sign = SIGN.cal_sign(secret=secret, url=urllib.parse.urlparse(url), query_params=query_params, body=body)
+
+    query_params["sign"] = sign
+
+    response = client.post(url=url, params=query_params, json=json.loads(body))
+
+    data = response.json()
+    if data["code"] != 0:
+        raise BadRequestException(data["message"])
+
+    return data["data"]
+
+
+async def get_active_products_async(access_token: str, page_number: int, page_size: int):
     """
-    Get products
+    Get products (async)
     """
     url = TIKTOK_API_URL["url_product_list"]
 
@@ -46,7 +69,7 @@ def get_active_products(access_token: str, page_number: int, page_size: int):
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = await aio.post(url, body=body, params=query_params)
 
     data = response.json()
     if data["code"] != 0:
@@ -63,7 +86,7 @@ async def get_all_no_promotion_products(access_token: str):
     end_page = 0
     page_size = 100
 
-    first_page_data = await get_active_products(access_token, 1, 1)
+    first_page_data = await get_active_products_async(access_token, 1, 1)
 
     all_products = []
     total_count = first_page_data["total"]
@@ -74,14 +97,14 @@ async def get_all_no_promotion_products(access_token: str):
     if end_page <= 0:
         tasks = []
         for i in range(start_page, max_page + 1):
-            tasks.append(limiter(lambda i=i: get_active_products(access_token, i, page_size)))
+            tasks.append(get_active_products_async(access_token, i, page_size))
 
         results = await asyncio.gather(*tasks)
 
     else:
         tasks = []
         for i in range(start_page, end_page + 1):
-            tasks.append(limiter(lambda i=i: get_active_products(access_token, i, page_size)))
+            tasks.append(get_active_products_async(access_token, i, page_size))
 
         results = await asyncio.gather(*tasks)
 
@@ -125,7 +148,7 @@ async def get_promotions(access_token: str, status: int = None, title: str = Non
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = await aio.post(url, body=body, params=query_params)
 
     data = response.json()
     if data["code"] != 0:
@@ -148,7 +171,7 @@ def get_promotion_detail(access_token: str, promotion_id: str):
 
     query_params["sign"] = sign
 
-    response = requests.get(url=url, params=query_params)
+    response = client.get(url=url, params=query_params)
 
     data = response.json()
     if data["code"] != 0:
@@ -189,7 +212,7 @@ async def create_simple_promotion(
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = await aio.post(url, body=body, params=query_params)
 
     data = response.json()
     if data["code"] != 0:
@@ -254,7 +277,7 @@ async def create_promotion_with_products(
             }
         )
 
-    await add_or_update_promotion_discount(access_token, promotion_id, product_list)
+    await add_or_update_promotion_discount_async(access_token, promotion_id, product_list)
 
     return promotion_id
 
@@ -288,7 +311,7 @@ async def create_promotion(
         products_pack.append(pack)
 
     # await deactivate_all_promotions(access_token)
-    await asyncio.sleep(4)
+    await asyncio.sleep(PROMOTION_CREATE_START_DELAY)
 
     logger.info(
         f"Creating promotion with {len(all_products)} products - {len(products_pack)} packs of {PROMOTION_SKUS_LIMIT} skus"
@@ -307,7 +330,8 @@ async def create_promotion(
             products=pack,
         )  # noqa: E501
 
-        await asyncio.sleep(6)
+        # Ngoài rate limiter (nhóm promotions), giữ khoảng nghỉ giữa các promotion như trước
+        await asyncio.sleep(PROMOTION_CREATE_PACK_DELAY)
         promotion_ids.append(promotion_id)
 
     return {
@@ -340,7 +364,36 @@ def add_or_update_promotion_discount(access_token: str, promotion_id: int, produ
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = client.post(url=url, params=query_params, json=json.loads(body))
+
+    data = response.json()
+    if data["code"] != 0:
+        raise BadRequestException(data["message"])
+
+    return data["data"]
+
+
+async def add_or_update_promotion_discount_async(access_token: str, promotion_id: int, product_list: list):
+    """
+    Add or update skus for promotion (async)
+    """
+    url = TIKTOK_API_URL["url_add_or_update_promotion"]
+
+    query_params = {"app_key": app_key, "access_token": access_token, "timestamp": SIGN.get_timestamp()}
+
+    body_json = {
+        "product_list": product_list,
+        "promotion_id": promotion_id,
+        "request_serial_no": "update_promo" + str(uuid4()),
+    }
+
+    body = json.dumps(body_json)
+
+    sign = SIGN.cal_sign(secret=secret, url=urllib.parse.urlparse(url), query_params=query_params, body=body)
+
+    query_params["sign"] = sign
+
+    response = await aio.post(url, body=body, params=query_params)
 
     data = response.json()
     if data["code"] != 0:
@@ -369,7 +422,7 @@ def add_or_update_promotion_flashdeal(access_token: str, promotion_id: int, prod
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = client.post(url=url, params=query_params, json=json.loads(body))
 
     data = response.json()
     if data["code"] != 0:
@@ -378,7 +431,7 @@ def add_or_update_promotion_flashdeal(access_token: str, promotion_id: int, prod
     return data["data"]
 
 
-async def deactivate_promotion(access_token: str, promotion_id: int):
+async def deactivate_promotion_async(access_token: str, promotion_id: int):
     """
     Deactivate promotion
     """
@@ -397,7 +450,7 @@ async def deactivate_promotion(access_token: str, promotion_id: int):
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = await aio.post(url, body=body, params=query_params)
 
     data = response.json()
     if data["code"] != 0:
@@ -415,7 +468,7 @@ async def deactivate_all_promotions(access_token: str):
     active_promotions = (await get_promotions(access_token, 2))["promotion_list"]
 
     for promotion in active_promotions:
-        await deactivate_promotion(access_token, promotion["promotion_id"])
+        await deactivate_promotion_async(access_token, promotion["promotion_id"])
 
     return True
 
@@ -460,8 +513,8 @@ def get_promotions_discount(access_token: str, status: int = 2, title: str = "Di
 
     query_params_upcomming["sign"] = sign_upcomming
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
-    response_upcomming = requests.post(url=url, params=query_params_upcomming, json=json.loads(body_upcomming_json))
+    response = client.post(url=url, params=query_params, json=json.loads(body))
+    response_upcomming = client.post(url=url, params=query_params_upcomming, json=json.loads(body_upcomming_json))
 
     data = response.json()
     data_comming = response_upcomming.json()
@@ -516,8 +569,8 @@ def get_promotions_flashdeal(
 
     query_params_upcomming["sign"] = sign_upcomming
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
-    response_upcomming = requests.post(url=url, params=query_params_upcomming, json=json.loads(body_upcomming_json))
+    response = client.post(url=url, params=query_params, json=json.loads(body))
+    response_upcomming = client.post(url=url, params=query_params_upcomming, json=json.loads(body_upcomming_json))
 
     data = response.json()
     data_comming = response_upcomming.json()
@@ -600,7 +653,7 @@ def create_promotion_form(access_token: str, title: str, begin_time: int, end_ti
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = client.post(url=url, params=query_params, json=json.loads(body))
 
     data = response.json()
     if data["code"] != 0:
@@ -778,7 +831,7 @@ def deactivate_promotion(access_token: str, promotion_id: int):
 
     query_params["sign"] = sign
 
-    response = requests.post(url=url, params=query_params, json=json.loads(body))
+    response = client.post(url=url, params=query_params, json=json.loads(body))
 
     data = response.json()
     if data["code"] != 0:
@@ -806,7 +859,7 @@ def detail_promotion(access_token: str, promotion_id: int):
 
     query_params["sign"] = sign
 
-    response = requests.get(url=url, params=query_params)
+    response = client.get(url=url, params=query_params)
 
     data = response.json()
     if data["code"] != 0:
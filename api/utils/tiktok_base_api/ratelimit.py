@@ -0,0 +1,257 @@
+"""
+Token bucket rate limiter cho TikTok API.
+
+Mỗi request lấy 1 token từ 2 bucket của nhóm endpoint tương ứng (orders, products,
+promotions, finance): bucket theo shop (app_key + shop_cipher) và bucket theo app_key.
+State được giữ trong Redis (script Lua, atomic) nên mọi gunicorn/celery worker dùng chung
+giới hạn; nếu Redis không kết nối được (hoặc chưa cài package redis) thì fallback về bucket
+trong process.
+
+Dùng được từ thread (``acquire``) và từ asyncio (``acquire_async``).
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import urllib.parse
+import weakref
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:
+    # redis là tuỳ chọn: không có thì chỉ dùng bucket trong process
+    redis = aioredis = None
+
+from api.utils.constant import (
+    TIKTOK_RATE_LIMIT_ENABLED,
+    TIKTOK_RATE_LIMIT_MAX_WAIT,
+    TIKTOK_RATE_LIMIT_REDIS_URL,
+    TIKTOK_RATE_LIMITS,
+)
+from api.utils.tiktok_base_api import logger
+
+KEY_PREFIX = "tiktok:ratelimit"
+# Sau khi Redis lỗi, dùng bucket local trong khoảng thời gian này rồi mới thử lại Redis
+REDIS_RETRY_INTERVAL = 30
+
+# Prefix path -> nhóm endpoint, kiểm tra theo thứ tự
+ENDPOINT_FAMILIES = (
+    ("/api/promotion/", "promotions"),
+    ("/finance/", "finance"),
+    ("/order/", "orders"),
+    ("/fulfillment/", "orders"),
+    ("/api/fulfillment/", "orders"),
+    ("/api/reverse/", "orders"),
+    ("/logistics/", "orders"),
+    ("/product/", "products"),
+    ("/api/product/", "products"),
+    ("/api/products", "products"),
+)
+
+# KEYS: các bucket; ARGV: rate, burst của từng bucket theo thứ tự.
+# Trả về số ms cần chờ, 0 nếu đã lấy được token ở tất cả bucket.
+TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local value = tonumber(state[1])
+    local ts = tonumber(state[2])
+    if value == nil or ts == nil then
+        value = burst
+        ts = now
+    end
+    value = math.min(burst, value + math.max(0, now - ts) * rate / 1000)
+    tokens[i] = value
+    if value < 1 then
+        wait = math.max(wait, (1 - value) * 1000 / rate)
+    end
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    local value = tokens[i]
+    if wait == 0 then
+        value = value - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(value), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(burst * 1000 / rate) + 1000)
+end
+return math.ceil(wait)
+"""
+
+
+def endpoint_family(url: str) -> str:
+    path = urllib.parse.urlparse(url).path
+    for prefix, family in ENDPOINT_FAMILIES:
+        if path.startswith(prefix):
+            return family
+    return "default"
+
+
+def shop_key(app_key, shop_cipher=None, access_token=None) -> str:
+    """
+    Khoá bucket theo shop. Các API cũ (202212) không có shop_cipher, khi đó dùng hash
+    của access_token để phân biệt shop (không lưu token vào Redis).
+    """
+    if shop_cipher:
+        return f"{app_key}:{shop_cipher}"
+    if access_token:
+        return f"{app_key}:t{hashlib.sha1(access_token.encode()).hexdigest()[:16]}"
+    return f"{app_key}:-"
+
+
+class _LocalBuckets:
+    """Bucket trong process, dùng khi không có Redis."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def take(self, buckets) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            tokens = []
+            for key, rate, burst in buckets:
+                value, ts = self._state.get(key, (burst, now))
+                value = min(burst, value + (now - ts) * rate)
+                tokens.append(value)
+                if value < 1:
+                    wait = max(wait, (1 - value) / rate)
+            for (key, rate, burst), value in zip(buckets, tokens):
+                self._state[key] = (value - 1 if wait == 0 else value, now)
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, redis_url=TIKTOK_RATE_LIMIT_REDIS_URL, limits=None, enabled=TIKTOK_RATE_LIMIT_ENABLED):
+        self.redis_url = redis_url
+        self.limits = limits or TIKTOK_RATE_LIMITS
+        self.enabled = enabled
+        self._local = _LocalBuckets()
+        self._redis = None
+        self._script = None
+        self._async_scripts = weakref.WeakKeyDictionary()
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+
+    def _buckets(self, family: str, key: str):
+        limits = self.limits.get(family) or self.limits["default"]
+        app = key.split(":", 1)[0]
+        shop_rate, shop_burst = limits["shop"]
+        app_rate, app_burst = limits["app"]
+        return [
+            (f"{KEY_PREFIX}:{family}:shop:{key}", shop_rate, shop_burst),
+            (f"{KEY_PREFIX}:{family}:app:{app}", app_rate, app_burst),
+        ]
+
+    def _redis_available(self) -> bool:
+        return redis is not None and bool(self.redis_url) and time.monotonic() >= self._redis_down_until
+
+    def _mark_redis_down(self, exc):
+        if time.monotonic() >= self._redis_down_until:
+            logger.warning(f"Rate limiter: Redis unavailable, falling back to local buckets: {exc}")
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+
+    def _get_script(self):
+        if self._script is None:
+            with self._lock:
+                if self._script is None:
+                    self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=1, socket_connect_timeout=1)
+                    self._script = self._redis.register_script(TOKEN_BUCKET_LUA)
+        return self._script
+
+    def _get_async_script(self):
+        # Client redis.asyncio gắn với event loop đang chạy
+        loop = asyncio.get_running_loop()
+        script = self._async_scripts.get(loop)
+        if script is None:
+            client = aioredis.Redis.from_url(self.redis_url, socket_timeout=1, socket_connect_timeout=1)
+            script = client.register_script(TOKEN_BUCKET_LUA)
+            self._async_scripts[loop] = script
+        return script
+
+    @staticmethod
+    def _script_args(buckets):
+        keys = [key for key, _, _ in buckets]
+        args = []
+        for _, rate, burst in buckets:
+            args.extend([rate, burst])
+        return keys, args
+
+    def try_acquire(self, family: str, key: str) -> float:
+        """Lấy 1 token, trả về số giây cần chờ (0 nếu lấy được)."""
+        buckets = self._buckets(family, key)
+        if self._redis_available():
+            keys, args = self._script_args(buckets)
+            try:
+                return int(self._get_script()(keys=keys, args=args)) / 1000
+            except redis.RedisError as e:
+                self._mark_redis_down(e)
+        return self._local.take(buckets)
+
+    async def try_acquire_async(self, family: str, key: str) -> float:
+        buckets = self._buckets(family, key)
+        if self._redis_available():
+            keys, args = self._script_args(buckets)
+            try:
+                return int(await self._get_async_script()(keys=keys, args=args)) / 1000
+            except redis.RedisError as e:
+                self._mark_redis_down(e)
+        return self._local.take(buckets)
+
+    def acquire(self, family: str, key: str, max_wait: float = TIKTOK_RATE_LIMIT_MAX_WAIT) -> float:
+        """Chờ tới khi có token (tối đa max_wait giây). Trả về tổng thời gian đã chờ."""
+        if not self.enabled:
+            return 0.0
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(family, key)
+            if wait <= 0:
+                return waited
+            if waited + wait > max_wait:
+                logger.warning(f"Rate limiter: waited {waited:.2f}s for {family}/{key}, sending anyway")
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, family: str, key: str, max_wait: float = TIKTOK_RATE_LIMIT_MAX_WAIT) -> float:
+        if not self.enabled:
+            return 0.0
+        waited = 0.0
+        while True:
+            wait = await self.try_acquire_async(family, key)
+            if wait <= 0:
+                return waited
+            if waited + wait > max_wait:
+                logger.warning(f"Rate limiter: waited {waited:.2f}s for {family}/{key}, sending anyway")
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+limiter = RateLimiter()
+
+
+def request_key(url: str, params: dict = None, headers: dict = None):
+    """Tính (family, key) cho một request TikTok từ url, query params và headers."""
+    params = params or {}
+    headers = headers or {}
+    access_token = params.get("access_token") or headers.get("x-tts-access-token")
+    key = shop_key(params.get("app_key"), params.get("shop_cipher"), access_token)
+    return endpoint_family(url), key
+
+
+def acquire_for_request(url: str, params: dict = None, headers: dict = None) -> float:
+    return limiter.acquire(*request_key(url, params, headers))
+
+
+async def acquire_for_request_async(url: str, params: dict = None, headers: dict = None) -> float:
+    return await limiter.acquire_async(*request_key(url, params, headers))
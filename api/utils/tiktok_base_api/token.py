@@ -3,7 +3,7 @@ import urllib.parse
 
 import requests
 
-from api.utils.tiktok_base_api import SIGN, TIKTOK_API_URL, logger
+from api.utils.tiktok_base_api import SIGN, TIKTOK_API_URL, client, logger
 
 
 def getAccessToken(auth_code: str, app_key:str, app_secret:str) -> requests.Response:
@@ -13,7 +13,7 @@ def getAccessToken(auth_code: str, app_key:str, app_secret:str) -> requests.Resp
         {"app_key": app_key, "app_secret": app_secret, "auth_code": auth_code, "grant_type": "authorized_code"}
     )
 
-    response = requests.post(url=url, json=json.loads(body))
+    response = client.post(url=url, json=json.loads(body))
     print("responsesss", response.text)
     logger.info(f"Get access token status code: {response.status_code}")
 
@@ -27,7 +27,7 @@ def refreshToken(refresh_token: str, app_key:str, app_secret:str) -> requests.Re
         {"app_key": app_key, "app_secret": app_secret, "refresh_token": refresh_token, "grant_type": "refresh_token"}
     )
 
-    response = requests.post(url=url, json=json.loads(body))
+    response = client.post(url=url, json=json.loads(body))
 
     logger.info(f"Refresh token status code: {response.status_code}")
 
@@ -45,7 +45,7 @@ def get_author_shop(access_token: str, app_key:str, app_secret:str) -> requests.
     sign = SIGN.cal_sign(app_secret, urllib.parse.urlparse(url), query_params)
     query_params["sign"] = sign
 
-    response = requests.get(url, params=query_params)
+    response = client.get(url, params=query_params)
     print("rssssss0", response.text)
     logger.info(f"Get brands status code: {response.status_code}")
 
@@ -4,10 +4,19 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.viewsets import ViewSet
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from api.models import CombineLabelTask
 from api.serializers import CombineLabelTaskSerializer
+from api.utils.constant import (
+    COMBINE_PROGRESS_INTERVAL_SECONDS,
+    COMBINE_PROGRESS_STREAM_ENABLED,
+    COMBINE_PROGRESS_STREAM_MAX_SECONDS,
+)
+import json
 import logging
+import time
 
 # Import Celery app để đảm bảo tasks được register
 from tiktok.celery import app
@@ -15,6 +24,44 @@ from api.tasks import process_combine_label_task
 
 logger = logging.getLogger(__name__)
 
+# Các cột tiến độ trả về cho frontend (không kèm urls / successful_urls / failed_urls)
+PROGRESS_FIELDS = (
+    'id', 'status', 'stage', 'total_urls', 'downloaded_count', 'downloaded_bytes',
+    'merged_count', 'merged_bytes', 'output_bytes', 'uploaded_bytes', 'successful_count',
+    'failed_count', 'drive_link', 'error_message', 'started_at', 'completed_at', 'progress_updated_at',
+)
+FINAL_STATUSES = ('COMPLETED', 'FAILED', 'CANCELLED')
+# Gửi comment giữ kết nối SSE khi tiến độ không đổi trong khoảng này (giây)
+PROGRESS_STREAM_KEEPALIVE_SECONDS = 15
+
+
+def progress_events(task_id, user):
+    """
+    Sự kiện SSE tiến độ của task: gửi lại dòng tiến độ mỗi khi thay đổi (đọc lại mỗi
+    COMBINE_PROGRESS_INTERVAL_SECONDS giây), kết thúc bằng ``event: end`` khi task xong hoặc sau
+    COMBINE_PROGRESS_STREAM_MAX_SECONDS giây (client kết nối lại).
+    """
+    yield f"retry: {int(COMBINE_PROGRESS_INTERVAL_SECONDS * 1000)}\n\n"
+    deadline = time.monotonic() + COMBINE_PROGRESS_STREAM_MAX_SECONDS
+    last_row = None
+    last_sent = time.monotonic()
+    while True:
+        row = CombineLabelTask.objects.filter(id=task_id, user=user).values(*PROGRESS_FIELDS).first()
+        if row is None:
+            yield "event: end\ndata: {}\n\n"
+            return
+        if row != last_row:
+            yield f"data: {json.dumps(row, cls=DjangoJSONEncoder)}\n\n"
+            last_row = row
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= PROGRESS_STREAM_KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        if row['status'] in FINAL_STATUSES or time.monotonic() >= deadline:
+            yield f"event: end\ndata: {json.dumps({'status': row['status']})}\n\n"
+            return
+        time.sleep(COMBINE_PROGRESS_INTERVAL_SECONDS)
+
 class CombineLabelAPI(ViewSet):
     """
     API endpoints cho Combine Label với background processing
@@ -121,6 +168,56 @@ class CombineLabelAPI(ViewSet):
                 'message': f'Internal server error: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'])
+    def progress_list(self, request):
+        """
+        GET /api/combine-label/progress/?ids=1,2,3
+        Tiến độ của nhiều task (mặc định: các task đang PENDING / PROCESSING), chỉ đọc các cột tiến độ
+        """
+        tasks = CombineLabelTask.objects.filter(user=request.user)
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                tasks = tasks.filter(id__in=[int(task_id) for task_id in ids.split(',') if task_id.strip()])
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'message': 'ids must be a comma-separated list of task ids'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            tasks = tasks.filter(status__in=['PENDING', 'PROCESSING'])
+        
+        return Response({
+            'success': True,
+            'data': list(tasks.values(*PROGRESS_FIELDS))
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """
+        GET /api/combine-label/{task_id}/progress/
+        Tiến độ của task; ?stream=1 để nhận liên tục dạng Server-Sent Events tới khi task xong
+        (chỉ khi COMBINE_PROGRESS_STREAM_ENABLED, ngược lại trả về tiến độ hiện tại để client poll)
+        """
+        row = CombineLabelTask.objects.filter(id=pk, user=request.user).values(*PROGRESS_FIELDS).first()
+        if row is None:
+            return Response({
+                'success': False,
+                'message': 'Task not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if COMBINE_PROGRESS_STREAM_ENABLED and request.query_params.get('stream') in ('1', 'true'):
+            response = StreamingHttpResponse(progress_events(pk, request.user), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            # Tắt buffer của nginx để sự kiện tới client ngay
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        
+        return Response({
+            'success': True,
+            'data': row
+        }, status=status.HTTP_200_OK)
+    
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """
@@ -130,16 +227,18 @@ class CombineLabelAPI(ViewSet):
         try:
             task = CombineLabelTask.objects.get(id=pk, user=request.user)
             
-            if task.status != 'PENDING':
+            # Chỉ huỷ nếu task vẫn PENDING lúc ghi (worker có thể vừa claim task)
+            cancelled = CombineLabelTask.objects.filter(id=task.id, status='PENDING').update(
+                status='CANCELLED',
+                completed_at=timezone.now(),
+                updated_at=timezone.now()
+            )
+            if not cancelled:
                 return Response({
                     'success': False,
                     'message': 'Can only cancel pending tasks'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            task.status = 'CANCELLED'
-            task.completed_at = timezone.now()
-            task.save()
-            
             return Response({
                 'success': True,
                 'message': 'Task cancelled successfully'
@@ -1,4 +1,3 @@
-import concurrent
 import json
 from django.contrib.auth.models import User
 from django.http import JsonResponse
@@ -7,10 +6,10 @@ from api.models import Shop, UserGroup, UserShop,Package
 from api.utils.constants.order import order_status
 from api.utils.pagination import get_pagination
 from api.views import APIView, Response, get_object_or_404
-from api.utils.tiktok_base_api import order
+from api.utils import order_pagination, order_sync
+from api.utils.tiktok_base_api import aio, order
 from datetime import datetime, timedelta
 import pytz
-from concurrent.futures import ThreadPoolExecutor
 from api.utils.tiktok_base_api.order import update_tracking_infor
 from rest_framework.response import Response
 from rest_framework import status
@@ -46,10 +45,32 @@ def fetch_orders_for_shop(shop, filters, user_ids, errors):
     return []
 
 
+def get_shop_users(shops, user_ids):
+    """
+    Resolve (shop, user) cho từng shop giống fetch_orders_for_shop nhưng bằng một query,
+    để phần gọi TikTok API chạy async mà không query DB trong event loop.
+    """
+    shops = list(shops)
+    shop_users = []
+    user_shops = (
+        UserShop.objects.filter(shop_id__in=[shop.id for shop in shops])
+        .select_related("user")
+        .order_by("id")
+    )
+    first_user = {}
+    for user_shop in user_shops:
+        if user_shop.user_id in user_ids:
+            first_user.setdefault(user_shop.shop_id, user_shop.user)
+    for shop in shops:
+        if shop.id in first_user:
+            shop_users.append((shop, first_user[shop.id]))
+    return shop_users
+
+
 def sort_orders(all_orders, sorts):
     sort_criteria = list(sorts.items())
-    for field, order in reversed(sort_criteria):
-        all_orders.sort(key=lambda x: x[field], reverse=(order == "desc"))
+    for field, direction in reversed(sort_criteria):
+        all_orders.sort(key=lambda x: x[field], reverse=(direction == "desc"))
     return all_orders
 
 
@@ -106,8 +127,7 @@ def get_shop_list(user, filters):
     return shops, user_ids
 
 
-def get_all_order(user, filters, errors):
-    shops, user_ids = get_shop_list(user, filters)
+def build_order_filters(filters):
     now = datetime.now(pytz.utc)
     default_create_time_ge = int((now - timedelta(days=3)).timestamp())
     default_create_time_lt = int(now.timestamp())
@@ -122,7 +142,7 @@ def get_all_order(user, filters, errors):
         )
     )
 
-    filters = {
+    return {
         "create_time_ge": int(
             filters.get("create_time", {}).get("$gte", default_create_time_ge)
         ),
@@ -132,19 +152,40 @@ def get_all_order(user, filters, errors):
         "order_status": order_status_tuple,
         "buyer_user_id": filters.get("buyer_user_id", {}).get("$eq", ""),
     }
-    all_orders = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_shop = {
-            executor.submit(fetch_orders_for_shop, shop, filters, user_ids, errors): shop
-            for shop in shops
-        }
-        for future in concurrent.futures.as_completed(future_to_shop):
-            all_orders.extend(future.result())
+
+
+def split_shop_users(user, filters, order_filters):
+    """
+    Trả về (mirrored, live): shop đã có mirror đầy đủ thì đọc từ Postgres,
+    shop chưa sync thì gọi TikTok API.
+    """
+    shops, user_ids = get_shop_list(user, filters)
+    shop_users = get_shop_users(shops, user_ids)
+    mirrored_ids = order_sync.mirrored_shop_ids(
+        [shop.id for shop, _ in shop_users], order_filters["create_time_ge"]
+    )
+    mirrored = [(shop, user) for shop, user in shop_users if shop.id in mirrored_ids]
+    live = [(shop, user) for shop, user in shop_users if shop.id not in mirrored_ids]
+    return mirrored, live
+
+
+def get_all_order(user, filters, errors=None):
+    if errors is None:
+        errors = []
+    order_filters = build_order_filters(filters)
+    mirrored_shop_users, live_shop_users = split_shop_users(user, filters, order_filters)
+    all_orders = order_sync.get_mirrored_orders(mirrored_shop_users, order_filters)
+    if live_shop_users:
+        all_orders.extend(aio.run(aio.get_order_lists, live_shop_users, order_filters, errors))
     return all_orders
 
 
 class ListOderOfUserView(APIView):
     def get(self, request):
+        """
+        Danh sách đơn của các shop, sort theo create_time giảm dần và phân trang phía server.
+        Trang tiếp theo lấy bằng offset (số thứ tự trang) hoặc page_token trả về trong meta.next_page_token.
+        """
         try:
             pagination, filters, sorts = get_pagination(
                 request,
@@ -152,34 +193,21 @@ class ListOderOfUserView(APIView):
             )
             user = request.user
             errors = []
-            all_orders = get_all_order(user, filters, errors)
-            limit = pagination.get("limit", 10)
-            offset = pagination.get("offset", 0)
-            total_items = len(all_orders)
-            total_pages = (total_items // limit) + (1 if total_items % limit > 0 else 0)
-            custom_response = {
-                "status": "success",
-                "meta": {
-                    "total_items": total_items,
-                    "total_pages": total_pages,
-                    "offset": offset,
-                    "limit": limit,
-                },
-                "data": all_orders,
-                "error": errors
-            }
-            return JsonResponse(custom_response)
-            print("all_orders11111111", all_orders)
-            sorts.setdefault("create_time", "desc")
-            sorted_orders = sort_orders(all_orders, sorts)
             limit = pagination.get("limit", 10)
             offset = pagination.get("offset", 0)
-            paginated_orders = order.process_orders_chunk_by_shop_id(
-                sorted_orders[offset * limit : (offset + 1) * limit]
+            page_token = request.query_params.get("page_token", "")
+
+            order_filters = build_order_filters(filters)
+            mirrored_shop_users, live_shop_users = split_shop_users(user, filters, order_filters)
+            orders, next_page_token, total_items = order_pagination.get_order_page(
+                live_shop_users,
+                mirrored_shop_users,
+                order_filters,
+                errors,
+                offset=offset,
+                limit=limit,
+                page_token=page_token,
             )
-            sorted_orders = sort_orders(paginated_orders, sorts)
-            total_items = len(all_orders)
-            total_pages = (total_items // limit) + (1 if total_items % limit > 0 else 0)
 
             shop_id_value = filters.get("shop_id", {}).get("$in", "")
             shop_id_tuple = (
@@ -187,9 +215,12 @@ class ListOderOfUserView(APIView):
                 if shop_id_value
                 else ()
             )
-            if len(shop_id_tuple) == 1 & len(errors) > 0:
+            if len(shop_id_tuple) == 1 and len(errors) > 0:
                 return JsonResponse({"error": errors[0]}, status=400)
 
+            # total_items chính xác ở trang cuối, các trang khác là ước lượng (xem get_order_page)
+            total_pages = (total_items // limit) + (1 if total_items % limit > 0 else 0)
+
             custom_response = {
                 "status": "success",
                 "meta": {
@@ -197,12 +228,15 @@ class ListOderOfUserView(APIView):
                     "total_pages": total_pages,
                     "offset": offset,
                     "limit": limit,
+                    "has_more": next_page_token is not None,
+                    "next_page_token": next_page_token,
                 },
-                "data": sorted_orders,
+                "data": orders,
                 "error": errors
             }
-
             return JsonResponse(custom_response)
+        except order_pagination.InvalidPageToken as e:
+            return JsonResponse({"error": str(e)}, status=400)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=400)
 
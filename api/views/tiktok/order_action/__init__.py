@@ -6,14 +6,15 @@ import pytz
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from django.db.models import OuterRef, Subquery
-
-import requests
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
 from django.db.models import Count
 
 from api import setup_logging
-from api.utils import constant
+from api.utils import constant, design_sku, number_sort, package_bulk, package_query
+from api.utils.constants import package as constants_package
 from api.utils.google.googleapi import search_file, upload_pdf
+from api.utils.pdf.download_pdf import download_pdf_from_url
 from api.utils.pdf.ocr_pdf import process_pdf_to_info
 from api.utils.tiktok_base_api import order
 from api.views import (
@@ -24,7 +25,6 @@ from api.views import (
     IsAuthenticated,
     JsonResponse,
     PageNumberPagination,
-    Q,
     Response,
     get_object_or_404,
     status,
@@ -58,7 +58,6 @@ setup_logging(logger, is_root=False, level=logging.INFO)
 """Orders"""
 
 from .ListOrderAPI import *
-from django.db.models import Max
 
 class ListOrder(APIView):
     def get(self, request, shop_id):
@@ -625,12 +624,7 @@ class DesignSkuSearch(APIView):
                 )
             designskus = designskus.filter(department_id=group_id)
 
-        if search_query:
-            designskus = designskus.filter(
-                Q(sku_id__icontains=search_query)
-                | Q(product_name__icontains=search_query)
-                | Q(variation__icontains=search_query)
-            )
+        designskus = design_sku.search_design_skus(designskus, search_query)
 
         paginator = self.pagination_class()
         result_page = paginator.paginate_queryset(designskus, request)
@@ -689,20 +683,18 @@ class ShippingDoc(APIView):
 
 class UploadDriver(APIView):
     def download_and_upload(self, order_document):
-        order_id = order_document.get("package_id")
+        package_id = order_document.get("package_id")
         doc_url = order_document.get("doc_url")
 
-        if order_id and doc_url:
+        if package_id and doc_url:
             try:
-                # Download the file from doc_url
-                response = requests.get(doc_url)
-                if response.status_code == 200:
-                    # Save the file with order_id as the name
-                    file_name = f"{order_id}.pdf"
-                    file_path = os.path.join(constant.PDF_DIRECTORY_WINDOW, file_name)
-                    with open(file_path, "wb") as f:
-                        f.write(response.content)
-                        print(f"File saved: {file_path}")
+                # Download the file from doc_url (hoặc lấy từ label cache, dùng chung với ToShipOrderAPI)
+                # Save the file with package_id as the name
+                file_name = f"{package_id}.pdf"
+                file_path = os.path.join(constant.PDF_DIRECTORY_WINDOW, file_name)
+                result = download_pdf_from_url(doc_url, path=file_path, package_id=package_id)
+                if result["success"]:
+                    print(f"File saved: {file_path}")
 
             except Exception as e:
                 print(f"Error downloading/uploading: {str(e)}")
@@ -730,77 +722,65 @@ class ToShipOrderAPI(APIView):
         doc_url = order_document.get("label")
         package_id = order_document.get("package_id")
 
-        # Tải file PDF từ doc_url
-        try:
-            response = requests.get(doc_url)
-        except Exception as e:
-            logger.error("Error when downloading PDF file", exc_info=e)
+        file_name = f"{package_id}.pdf"
+
+        platform_name = platform.system()
+        parent_dir = (
+            constant.PDF_DIRECTORY_WINDOW
+            if platform_name == "Windows"
+            else constant.PDF_DIRECTORY_UNIX
+        )
+        os.makedirs(parent_dir, exist_ok=True)
+        file_path = os.path.join(parent_dir, file_name)
+
+        # Tải file PDF từ doc_url (label đã tải trước đó được lấy từ label cache)
+        download_result = download_pdf_from_url(doc_url, path=file_path, package_id=package_id)
+        if not download_result["success"]:
+            logger.error(f"Error when downloading PDF file: {download_result['error']}")
             error_response = {
                 "status": "error",
-                "message": f"Có lỗi xảy ra khi tải file PDF label: {str(e)}",
+                "message": f"Có lỗi xảy ra khi tải file PDF label: {download_result['error']}",
                 "data": None,
             }
             return error_response
 
-        if response.status_code == 200:
-            file_name = f"{package_id}.pdf"
-
-            platform_name = platform.system()
-            parent_dir = (
-                constant.PDF_DIRECTORY_WINDOW
-                if platform_name == "Windows"
-                else constant.PDF_DIRECTORY_UNIX
-            )
-            os.makedirs(parent_dir, exist_ok=True)
-            file_path = os.path.join(parent_dir, file_name)
-
-            with open(file_path, "wb") as file:
-                file.write(response.content)
-
-            order_ids = (
-                [item.get("id") for item in order_list] if order_list else []
-            )
-
-            # Call OrderDetail API
-            try:
-                order_details: dict = order.callOrderDetail(
-                    shop=self.shop, orderIds=order_ids
-                ).json()
-            except Exception as e:
-                logger.error("Error when calling OrderDetail API", exc_info=e)
-                error_response = {
-                    "status": "error",
-                    "message": "Có lỗi xảy ra khi gọi API OrderDetail",
-                    "data": None,
-                }
-                return error_response
+        order_ids = (
+            [item.get("id") for item in order_list] if order_list else []
+        )
 
-            logger.info(f"OrderDetail response: {order_details}")
+        # Call OrderDetail API
+        try:
+            order_details: dict = order.callOrderDetail(
+                shop=self.shop, orderIds=order_ids
+            ).json()
+        except Exception as e:
+            logger.error("Error when calling OrderDetail API", exc_info=e)
+            error_response = {
+                "status": "error",
+                "message": "Có lỗi xảy ra khi gọi API OrderDetail",
+                "data": None,
+            }
+            return error_response
 
-            # Check the response from TikTok API
-            if order_details.get("data") is None:
-                error_response = {
-                    "status": "error",
-                    "message": f'Có lỗi xảy ra khi gọi API OrderDetail: {order_details.get("message")}',
-                    "data": None,
-                }
-                return error_response
-            else:
-                order_details["ocr_result"] = process_pdf_to_info(file_path)
-                success_response = {
-                    "status": "success",
-                    "message": "Thành công",
-                    "data": order_details,
-                }
+        logger.info(f"OrderDetail response: {order_details}")
 
-                return success_response
-        else:
+        # Check the response from TikTok API
+        if order_details.get("data") is None:
             error_response = {
                 "status": "error",
-                "message": "Có lỗi xảy ra khi tải file PDF",
-                "data": response.text,
+                "message": f'Có lỗi xảy ra khi gọi API OrderDetail: {order_details.get("message")}',
+                "data": None,
             }
             return error_response
+        else:
+            order_details["ocr_result"] = process_pdf_to_info(file_path)
+            success_response = {
+                "status": "success",
+                "message": "Thành công",
+                "data": order_details,
+            }
+
+            return success_response
 
     def post(self, request, shop_id):
         data = []
@@ -895,9 +875,42 @@ class PackageCreateForTeeClub(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class PackageBulkCreate(APIView):
+    """
+    Tạo nhiều package cho một fulfillment trong một request.
+    Body: {"packages": [{...giống PackageCreateFor*...}, ...]}, ?stream=1 để nhận tiến độ dạng NDJSON.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, shop_id, fulfillment_name, format=None):
+        if fulfillment_name not in constants_package.bulk_create_fulfillment_list:
+            return Response({"error": f"Invalid fulfillment_name: {fulfillment_name}"}, status=status.HTTP_400_BAD_REQUEST)
+        rows = request.data.get("packages") if isinstance(request.data, dict) else None
+        if not isinstance(rows, list) or not rows:
+            return Response({"error": "packages must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > constant.PACKAGE_BULK_MAX_ROWS:
+            return Response(
+                {"error": f"Too many packages. Maximum allowed: {constant.PACKAGE_BULK_MAX_ROWS}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        shop = None if shop_id == 0 else get_object_or_404(Shop, id=shop_id)
+        seller = request.user.username
+
+        if request.query_params.get("stream") in ("1", "true"):
+            events = package_bulk.iter_bulk_create(rows, shop, fulfillment_name, seller)
+            return StreamingHttpResponse(
+                (json.dumps(event) + "\n" for event in events), content_type="application/x-ndjson"
+            )
+
+        result = package_bulk.bulk_create_packages(rows, shop, fulfillment_name, seller)
+        result.pop("event")
+        response_status = status.HTTP_201_CREATED if result["created"] else status.HTTP_400_BAD_REQUEST
+        return Response(result, status=response_status)
+
+
 class PackageListByShop(APIView):
     def get(self, request, shop_id, format=None):
-        packages = Package.objects.filter(shop_id=shop_id)
+        packages = list(package_query.with_related(Package.objects.filter(shop_id=shop_id)))
 
         # Kiểm tra nếu không có gói hàng nào được tìm thấy
         if not packages:
@@ -1077,44 +1090,62 @@ class PackageFilter(APIView):
                 package_filters["status__in"] = status_names
             product_name = request.GET.get("product_name")
             order_id = request.GET.get("order_id")
-            if product_name:
-                package_filters["products__product_name__icontains"] = product_name
             if order_id:
                 package_filters["order_id__icontains"] = order_id
-            print("filter", package_filters)
 
-            # Truy vấn các package với bộ lọc áp dụng
-            packages = Package.objects.filter(**package_filters)
-            # packages = packages.distinct('pack_id')
-            subquery = Package.objects.filter(pack_id=OuterRef('pack_id')).order_by('created_at').values('id')[:1]
-            packages = packages.filter(id__in=Subquery(subquery))
+            # Chỉ lấy package đầu tiên của mỗi pack_id (cờ is_primary)
+            packages = package_query.primary_packages().filter(**package_filters)
+            if product_name:
+                # EXISTS thay cho join để một package không bị lặp lại theo số product khớp
+                packages = packages.filter(
+                    Exists(ProductPackage.objects.filter(package=OuterRef("pk"), product_name__icontains=product_name))
+                )
 
-            # Áp dụng sắp xếp
+            # Áp dụng sắp xếp (trường sort đầu tiên), id để thứ tự ổn định
             sorts.setdefault("created_at", "desc")
-            sort_criteria = list(sorts.items())
-            for field, order in reversed(sort_criteria):
-                packages = packages.order_by(f"{'-' if order == 'desc' else ''}{field}")
+            sort_field, sort_order = next(iter(sorts.items()))
+            # get_sort trả về 1 / -1, mặc định là "desc"
+            descending = sort_order in ("desc", -1)
+            prefix = "-" if descending else ""
+            packages = packages.order_by(f"{prefix}{sort_field}", f"{prefix}id")
+
+            # count=exact (mặc định) | estimate (ước lượng từ EXPLAIN) | none
+            count_mode = request.GET.get("count", "exact")
+            if count_mode == "estimate":
+                total_items = package_query.estimate_count(packages)
+            elif count_mode == "none":
+                total_items = None
+            else:
+                total_items = packages.count()
 
-            # Phân trang
             limit = pagination.get("limit", 10)
-            offset = pagination.get("offset", 0)
-            paginated_packages = packages[offset * limit : (offset + 1) * limit]
+            meta = {"total_items": total_items, "count": count_mode, "limit": limit}
+            if total_items is not None:
+                meta["total_pages"] = (total_items // limit) + (1 if total_items % limit > 0 else 0)
+
+            if "cursor" in request.GET:
+                # Phân trang keyset theo (created_at, id), cursor rỗng là trang đầu
+                if sort_field != "created_at":
+                    return JsonResponse({"error": "Cursor pagination only supports sorting by created_at."}, status=400)
+                cursor = request.GET.get("cursor")
+                if cursor:
+                    packages = package_query.after_cursor(packages, cursor, descending)
+                page = list(packages[: limit + 1])
+                has_next = len(page) > limit
+                page = page[:limit]
+                meta["has_next"] = has_next
+                meta["next_cursor"] = package_query.encode_cursor(page[-1]) if has_next else None
+            else:
+                offset = pagination.get("offset", 0)
+                page = packages[offset * limit : (offset + 1) * limit]
+                meta["offset"] = offset
 
             # Serialize kết quả
-            serializer = self.serializer_class(paginated_packages, many=True)
-
-            # Tạo metadata cho phản hồi
-            total_items = packages.count()
-            total_pages = (total_items // limit) + (1 if total_items % limit > 0 else 0)
+            serializer = self.serializer_class(page, many=True)
 
             custom_response = {
                 "status": "success",
-                "meta": {
-                    "total_items": total_items,
-                    "total_pages": total_pages,
-                    "offset": offset,
-                    "limit": limit,
-                },
+                "meta": meta,
                 "data": serializer.data,
                 "error": errors
             }
@@ -1189,40 +1220,137 @@ class UpdateFulfillmentNameView(APIView):
         
         return Response({"message": "Dữ liệu không hợp lệ.", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
+class PackageBulkTransition(APIView):
+    """
+    Chuyển status và/hoặc fulfillment_name cho nhiều package.
+    Body: {"ids": [...]} hoặc {"filter": {"shop_id": [...], "fulfillment_name": [...], "status": [...], "pack_id": [...]}},
+    cùng "status" và/hoặc "fulfillment_name" mới. Chỉ áp dụng cho package thuộc shop của người dùng.
+    Trả về số package đã đổi / không cần đổi / bị thay đổi đồng thời.
+    """
+    permission_classes = (IsAuthenticated,)
+    filter_fields = {
+        "shop_id": "shop__id__any",
+        "fulfillment_name": "fulfillment_name__any",
+        "status": "status__any",
+        "pack_id": "pack_id__any",
+    }
+
+    def post(self, request):
+        data = request.data
+        new_status = data.get("status")
+        fulfillment_name = data.get("fulfillment_name")
+        if new_status is None and fulfillment_name is None:
+            return Response({"error": "status or fulfillment_name is required"}, status=status.HTTP_400_BAD_REQUEST)
+        # Cùng quy tắc với UpdatePackageStatusView / UpdateFulfillmentNameView (package_bulk.check_transition)
+        for serializer_class, field, value in (
+            (PackageStatusUpdateSerializer, "status", new_status),
+            (PackageFulfillmentNameUpdateSerializer, "fulfillment_name", fulfillment_name),
+        ):
+            if value is None:
+                continue
+            serializer = serializer_class(data={field: value}, partial=True)
+            if not serializer.is_valid():
+                return Response(
+                    {"message": "Dữ liệu không hợp lệ.", "errors": serializer.errors},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        ids = data.get("ids")
+        filters = data.get("filter")
+        if ids:
+            if not isinstance(ids, list):
+                return Response({"error": "ids must be a list"}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                lookups = {"id__any": [int(package_id) for package_id in ids]}
+            except (TypeError, ValueError):
+                return Response({"error": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(filters, dict) and filters:
+            lookups = {}
+            for key, values in filters.items():
+                if key not in self.filter_fields:
+                    return Response({"error": f"Unsupported filter: {key}"}, status=status.HTTP_400_BAD_REQUEST)
+                lookups[self.filter_fields[key]] = values if isinstance(values, list) else [values]
+        else:
+            return Response({"error": "ids or filter is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Chỉ các package thuộc shop mà người dùng được xem (giống PackageFilter)
+        shops, _ = get_shop_list(request.user, {})
+        packages = Package.objects.filter(shop__in=shops, **lookups)
+        if packages.count() > constant.PACKAGE_BULK_MAX_ROWS:
+            return Response(
+                {"error": f"Too many packages. Maximum allowed: {constant.PACKAGE_BULK_MAX_ROWS}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        customuser = getattr(request.user, "customuser", None)
+        result = package_bulk.bulk_transition(
+            packages,
+            status=new_status,
+            fulfillment_name=fulfillment_name,
+            update_by_id=customuser.id if customuser else None,
+        )
+        return Response(result, status=status.HTTP_200_OK)
+
+
 class GetNumbersortMax(APIView):
+    """
+    GET: number_sort đã dùng trong ngày của fulfillment (mặc định Teelover), ?all=0 để chỉ lấy max.
+    POST {"fulfillment_name", "count"}: cấp ``count`` number_sort liên tiếp (api/utils/number_sort.py),
+    client dùng thay cho việc tự lấy max + 1.
+    """
     permission_classes = (IsAuthenticated,)
     serializer_class = PackageSerializer
 
     def get(self, request):
         try:
-            # Lấy múi giờ Asia/Ho_Chi_Minh
-            local_tz = pytz.timezone("Asia/Ho_Chi_Minh")
-            today_start = datetime.now(local_tz).replace(hour=0, minute=0, second=0, microsecond=0)
-            today_end = datetime.now(local_tz).replace(hour=23, minute=59, second=59, microsecond=999999)
-
-            # Lọc các package có fulfillment_name='Teelover' và supify_create_time trong ngày
-            packages = Package.objects.filter(
-                fulfillment_name="Teelover",
-                supify_create_time__gte=today_start,
-                supify_create_time__lte=today_end
-            )
-
-            # Lấy tất cả các number_sort
-            number_sort_values = packages.values_list('number_sort', flat=True)
-
-            # Tìm giá trị lớn nhất
-            max_number_sort = number_sort_values.aggregate(Max('number_sort'))['number_sort__max']
+            fulfillment_name = request.GET.get("fulfillment_name", constants_package.fulfillment_name["TEELOVER"])
+            # Số lớn nhất đã cấp qua allocator (gồm cả số đã giữ nhưng package chưa lưu)
+            allocated_max = number_sort.current(fulfillment_name)
+            number_sort_values = None
+            if request.GET.get("all", "1") != "0":
+                _, today_start, today_end = number_sort.local_day_bounds()
+                # Lọc các package của fulfillment và supify_create_time trong ngày
+                packages = Package.objects.filter(
+                    fulfillment_name=fulfillment_name,
+                    supify_create_time__gte=today_start,
+                    supify_create_time__lte=today_end
+                )
+                # Lấy tất cả các number_sort, giá trị lớn nhất tính luôn từ danh sách
+                number_sort_values = list(packages.values_list('number_sort', flat=True))
+                used_max = max((value for value in number_sort_values if value is not None), default=None)
+            else:
+                # Package ghi bằng luồng cũ (GET max + 1) không đi qua counter
+                used_max = number_sort.existing_max(fulfillment_name, None) or None
+
+            values = [value for value in (used_max, allocated_max) if value is not None]
+            data = {"max_number_sort": max(values) if values else None}
+            if number_sort_values is not None:
+                data["all_number_sort"] = number_sort_values
+            return JsonResponse({"status": "success", "data": data})
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
 
-            custom_response = {
+    def post(self, request):
+        fulfillment_name = request.data.get("fulfillment_name", constants_package.fulfillment_name["TEELOVER"])
+        if fulfillment_name not in constants_package.fulfillment_name.values():
+            return JsonResponse({"error": f"Invalid fulfillment_name: {fulfillment_name}"}, status=400)
+        try:
+            count = int(request.data.get("count", 1))
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "count must be an integer"}, status=400)
+        if not 1 <= count <= constant.PACKAGE_BULK_MAX_ROWS:
+            return JsonResponse({"error": f"count must be between 1 and {constant.PACKAGE_BULK_MAX_ROWS}"}, status=400)
+        numbers = number_sort.allocate(fulfillment_name, count)
+        return JsonResponse(
+            {
                 "status": "success",
                 "data": {
-                    "all_number_sort": list(number_sort_values),
-                    "max_number_sort": max_number_sort
-                }
+                    "fulfillment_name": fulfillment_name,
+                    "start": numbers.start,
+                    "end": numbers.stop - 1,
+                    "numbers": list(numbers),
+                },
             }
-            return JsonResponse(custom_response)
-        except Exception as e:
-            return JsonResponse({"error": str(e)}, status=400)
+        )
 
 
 class CsvFulfillmentSkuValidationAPI(APIView):
@@ -1291,45 +1419,28 @@ class CsvFulfillmentSkuValidationAPI(APIView):
                 )
             
             # Limit the number of SKUs that can be validated at once
-            max_skus = 1000
+            max_skus = constant.CSV_SKU_VALIDATION_MAX
             if len(sku_ids) > max_skus:
                 return Response(
                     {"error": f"Too many SKU IDs. Maximum allowed: {max_skus}"}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+            # Lấy design của mọi SKU trong một query (sku_id = ANY(...))
+            designs = design_sku.find_design_skus(group_custom, sku_ids)
+            serialized = {
+                sku_id: design_data
+                for sku_id, design_data in zip(designs, DesignSkuSerializer(list(designs.values()), many=True).data)
+            }
+
             results = []
-            
             for sku_id in sku_ids:
-                try:
-                    # Check if design exists for this SKU ID in user's group
-                    design_sku = DesignSku.objects.filter(
-                        department=group_custom, 
-                        sku_id=sku_id
-                    ).first()
-                    
-                    if design_sku:
-                        serializer = DesignSkuSerializer(design_sku)
-                        results.append({
-                            "sku_id": sku_id,
-                            "exists": True,
-                            "design": serializer.data
-                        })
-                    else:
-                        results.append({
-                            "sku_id": sku_id,
-                            "exists": False,
-                            "design": None
-                        })
-                        
-                except Exception as e:
-                    logger.error(f"Error validating SKU {sku_id}", exc_info=e)
-                    results.append({
-                        "sku_id": sku_id,
-                        "exists": False,
-                        "design": None,
-                        "error": str(e)
-                    })
+                design = serialized.get(str(sku_id))
+                results.append({
+                    "sku_id": sku_id,
+                    "exists": design is not None,
+                    "design": design
+                })
 
             return Response({"results": results}, status=status.HTTP_200_OK)
 
@@ -1,10 +1,8 @@
 import json
 import logging
 
-from asgiref.sync import async_to_sync
-
 from api import setup_logging
-from api.utils.tiktok_base_api import promotion
+from api.utils.tiktok_base_api import aio, promotion
 from api.views import APIView, JsonResponse, get_object_or_404
 
 from ....models import Shop
@@ -23,7 +21,8 @@ class GetPromotionsView(APIView):
         page_size = request.GET.get("page_size")
         title = request.GET.get("title")
 
-        data = async_to_sync(promotion.get_promotions)(
+        data = aio.run(
+            promotion.get_promotions,
             access_token=shop.access_token, status=status, title=title, page_number=page_number, page_size=page_size
         )
 
@@ -47,7 +46,7 @@ class CreatePromotionView(APIView):
         body_raw = request.body.decode("utf-8")
         promotion_data = json.loads(body_raw)
 
-        data = async_to_sync(promotion.create_promotion)(access_token=shop.access_token, **promotion_data)
+        data = aio.run(promotion.create_promotion, access_token=shop.access_token, **promotion_data)
 
         return JsonResponse(data)
 
@@ -8,18 +8,21 @@ import pytz
 
 from api.models import UserShop, Shop
 from api.utils.constants.statement import payment_status
+from api.utils import rollup, statement_sync
 from api.utils.pagination import get_pagination
-from api.utils.tiktok_base_api.finance import (
-    get_statements_all,
-    get_statement_transactions,
+from api.utils.statistics import aggregate_order_stats, aggregate_statement_stats
+from api.views.tiktok import (
+    build_order_filters,
+    get_all_order,
+    get_shop_list,
+    get_shop_users,
 )
-from api.views.tiktok import get_all_order, get_shop_list
 from concurrent.futures import ThreadPoolExecutor
 
 
 class StatisticsFinanceApi(APIView):
     def fetch_statements(
-        self, shop: Shop, filters: dict, user_ids: list, payment_status: tuple
+        self, shop: Shop, filters: dict, user_ids: list, payment_status: tuple, errors: list = None
     ):
         user_shop = UserShop.objects.filter(shop_id=shop.id).first()
         user = None
@@ -27,19 +30,13 @@ class StatisticsFinanceApi(APIView):
             user = User.objects.filter(id=user_shop.user_id).first()
         if user.id not in user_ids:
             return []
-        query = {
-            "shop_cipher": shop.shop_cipher,
-        }
-        query.update(filters)
-        return get_statements_all(shop, user, query, payment_status)
+        # Statement của các ngày đã chốt đọc từ Postgres, chỉ gọi TikTok API cho phần còn mở
+        return statement_sync.get_shop_statements(shop, user, filters, payment_status, errors)
 
     def fetch_statements_with_order(self, statement):
-        statement_id = statement.get("id")
-        shop = statement.get("shop")
-        statement_with_order = get_statement_transactions(statement_id, shop, {})
-        return statement_with_order
+        return statement_sync.get_statement_with_transactions(statement)
 
-    def get_statements(self, filters, shops, user_ids):
+    def build_statement_filters(self, filters):
         now = datetime.now(pytz.utc)
         default_time_ge = int((now - timedelta(days=1)).timestamp())
         default_time_lt = int(now.timestamp())
@@ -51,7 +48,7 @@ class StatisticsFinanceApi(APIView):
             else (payment_status["PAID"],)
         )
 
-        filters = {
+        statement_filters = {
             "statement_time_ge": int(
                 filters.get("statement_time", {}).get("$gte", default_time_ge)
             ),
@@ -61,6 +58,10 @@ class StatisticsFinanceApi(APIView):
             "sort_field": "statement_time",
             "page_size": 100,
         }
+        return statement_filters, payment_status_tuple
+
+    def get_statements(self, filters, shops, user_ids, errors=None):
+        filters, payment_status_tuple = self.build_statement_filters(filters)
 
         statements = []
         with ThreadPoolExecutor(max_workers=10) as executor:
@@ -71,6 +72,7 @@ class StatisticsFinanceApi(APIView):
                     filters,
                     user_ids,
                     payment_status_tuple,
+                    errors,
                 ): shop
                 for shop in shops
             }
@@ -108,211 +110,27 @@ class StatisticsFinanceApi(APIView):
                 ],
             )
             user = request.user
+            errors = []
             shops, user_ids = get_shop_list(user, filters)
-            statements = self.get_statements(filters, shops, user_ids)
-
-            stats = {}
-            for statement in statements:
-                date_str = datetime.fromtimestamp(
-                    statement["statement_time"], pytz.utc
-                ).strftime("%Y-%m-%d")
-                if date_str not in stats:
-                    stats[date_str] = {
-                        "statements": {
-                            "status": {},
-                            "shops": [],
-                        },
-                    }
-                payment_status = statement["payment_status"]
-                revenue_amount = float(statement["revenue_amount"])
-                settlement_amount = float(statement["settlement_amount"])
-                fee_amount = float(statement["fee_amount"])
-                adjustment_amount = float(statement["adjustment_amount"])
-                stats[date_str]["statements"]["status"].setdefault(
-                    "TOTAL",
-                    {
-                        "revenue_amount": 0,
-                        "settlement_amount": 0,
-                        "fee_amount": 0,
-                        "adjustment_amount": 0,
-                    },
-                )
-                stats[date_str]["statements"]["status"].setdefault(
-                    payment_status,
-                    {
-                        "revenue_amount": 0,
-                        "settlement_amount": 0,
-                        "fee_amount": 0,
-                        "adjustment_amount": 0,
-                    },
-                )
-                stats[date_str]["statements"]["status"]["TOTAL"][
-                    "revenue_amount"
-                ] = round(
-                    stats[date_str]["statements"]["status"]["TOTAL"]["revenue_amount"]
-                    + revenue_amount,
-                    2,
-                )
-                stats[date_str]["statements"]["status"][payment_status][
-                    "revenue_amount"
-                ] = round(
-                    stats[date_str]["statements"]["status"][payment_status][
-                        "revenue_amount"
-                    ]
-                    + revenue_amount,
-                    2,
-                )
-                stats[date_str]["statements"]["status"]["TOTAL"][
-                    "settlement_amount"
-                ] = round(
-                    stats[date_str]["statements"]["status"]["TOTAL"][
-                        "settlement_amount"
-                    ]
-                    + settlement_amount,
-                    2,
-                )
-                stats[date_str]["statements"]["status"][payment_status][
-                    "settlement_amount"
-                ] = round(
-                    stats[date_str]["statements"]["status"][payment_status][
-                        "settlement_amount"
-                    ]
-                    + settlement_amount,
-                    2,
-                )
-                stats[date_str]["statements"]["status"]["TOTAL"]["fee_amount"] = round(
-                    stats[date_str]["statements"]["status"]["TOTAL"]["fee_amount"]
-                    + fee_amount,
-                    2,
-                )
-                stats[date_str]["statements"]["status"][payment_status][
-                    "fee_amount"
-                ] = round(
-                    stats[date_str]["statements"]["status"][payment_status][
-                        "fee_amount"
-                    ]
-                    + fee_amount,
-                    2,
-                )
-                stats[date_str]["statements"]["status"]["TOTAL"][
-                    "adjustment_amount"
-                ] = round(
-                    stats[date_str]["statements"]["status"]["TOTAL"][
-                        "adjustment_amount"
-                    ]
-                    + adjustment_amount,
-                    2,
-                )
-                stats[date_str]["statements"]["status"][payment_status][
-                    "adjustment_amount"
-                ] = round(
-                    stats[date_str]["statements"]["status"][payment_status][
-                        "adjustment_amount"
-                    ]
-                    + adjustment_amount,
-                    2,
-                )
-
-                shop_id = str(statement["shop"]["id"])
-                shop_entry = next(
-                    (
-                        p
-                        for p in stats[date_str]["statements"]["shops"]
-                        if p["shop_id"] == shop_id
-                    ),
-                    None,
-                )
-                if not shop_entry:
-                    stats[date_str]["statements"]["shops"].append(
-                        {
-                            "shop_id": shop_id,
-                            "shop_name": str(statement["shop"]["name"]),
-                            "shop_owner_id": str(statement["shop_owner"]["id"]),
-                            "shop_owner_name": str(statement["shop_owner"]["username"]),
-                            "status": {
-                                "TOTAL": {
-                                    "revenue_amount": revenue_amount,
-                                    "settlement_amount": settlement_amount,
-                                    "fee_amount": fee_amount,
-                                    "adjustment_amount": adjustment_amount,
-                                },
-                                payment_status: {
-                                    "revenue_amount": revenue_amount,
-                                    "settlement_amount": settlement_amount,
-                                    "fee_amount": fee_amount,
-                                    "adjustment_amount": adjustment_amount,
-                                },
-                            },
-                        }
-                    )
-                else:
-                    shop_entry["status"].setdefault(
-                        payment_status,
-                        {
-                            "revenue_amount": 0,
-                            "settlement_amount": 0,
-                            "fee_amount": 0,
-                            "adjustment_amount": 0,
-                        },
-                    )
-                    shop_entry["status"]["TOTAL"]["revenue_amount"] = round(
-                        shop_entry["status"]["TOTAL"]["revenue_amount"]
-                        + revenue_amount,
-                        2,
-                    )
-                    shop_entry["status"]["TOTAL"]["settlement_amount"] = round(
-                        shop_entry["status"]["TOTAL"]["settlement_amount"]
-                        + settlement_amount,
-                        2,
-                    )
-                    shop_entry["status"]["TOTAL"]["fee_amount"] = round(
-                        shop_entry["status"]["TOTAL"]["fee_amount"] + fee_amount, 2
-                    )
-                    shop_entry["status"]["TOTAL"]["adjustment_amount"] = round(
-                        shop_entry["status"]["TOTAL"]["adjustment_amount"]
-                        + adjustment_amount,
-                        2,
-                    )
-                    shop_entry["status"][payment_status]["revenue_amount"] = round(
-                        shop_entry["status"][payment_status]["revenue_amount"]
-                        + revenue_amount,
-                        2,
-                    )
-                    shop_entry["status"][payment_status]["settlement_amount"] = round(
-                        shop_entry["status"][payment_status]["settlement_amount"]
-                        + settlement_amount,
-                        2,
-                    )
-                    shop_entry["status"][payment_status]["fee_amount"] = round(
-                        shop_entry["status"][payment_status]["fee_amount"] + fee_amount,
-                        2,
-                    )
-                    shop_entry["status"][payment_status]["adjustment_amount"] = round(
-                        shop_entry["status"][payment_status]["adjustment_amount"]
-                        + adjustment_amount,
-                        2,
-                    )
-                stats[date_str]["statements"]["shops"] = sorted(
-                    stats[date_str]["statements"]["shops"],
-                    key=lambda x: x["status"]["TOTAL"]["revenue_amount"],
-                    reverse=True,
-                )
-
-            formatted_stats = []
-            for date, data in stats.items():
-                formatted_stats.append(
-                    {
-                        "date": date,
-                        "statements": data["statements"],
-                        # "products": data["products"],
-                    }
-                )
-
-            formatted_stats = sorted(
-                formatted_stats, key=lambda x: x["date"], reverse=True
+            statement_filters, payment_status_tuple = self.build_statement_filters(filters)
+            shop_users = get_shop_users(shops, user_ids)
+            rollup_shop_ids = rollup.statement_rollup_shop_ids(
+                [shop.id for shop, _ in shop_users], statement_filters["statement_time_ge"]
             )
-
-            return JsonResponse({"status": "success", "data": formatted_stats})
+            # Mọi shop đã có rollup và khoảng thời gian gồm trọn các ngày UTC thì đọc từ Postgres,
+            # nếu không thì tổng hợp từ TikTok API như cũ
+            if len(rollup_shop_ids) == len(shop_users) and rollup.covers_whole_days(
+                statement_filters["statement_time_ge"], statement_filters["statement_time_lt"]
+            ):
+                formatted_stats = rollup.get_statement_stats(
+                    shop_users, statement_filters, payment_status_tuple
+                )
+            else:
+                statements = self.get_statements(filters, shops, user_ids, errors)
+                formatted_stats = aggregate_statement_stats(statements)
+
+            # Shop không lấy được statement chưa chốt: số liệu chỉ gồm các ngày đã chốt
+            return JsonResponse({"status": "success", "data": formatted_stats, "error": errors})
         except Exception as e:
             print(e)
             return JsonResponse({"error": str(e)})
@@ -340,142 +158,21 @@ class StatisticsApi(APIView):
                     },
                 ),
             }
-            orders = get_all_order(user=user, filters=all_order_filters)
-
-            # with open("data.json", "r", encoding="utf-8") as file:
-            #     orders = json.load(file)
-            # orders = orders["data"]
-            stats = {}
-            for order in orders:
-                date_str = datetime.fromtimestamp(
-                    order["create_time"], pytz.utc
-                ).strftime("%Y-%m-%d")
-                if date_str not in stats:
-                    stats[date_str] = {
-                        "orders": {
-                            "status": {},
-                            "payments": {},
-                            "shops": [],
-                            "shop_owner": {},
-                        },
-                        "products": [],
-                    }
-
-                order_status = order["status"]
-
-                stats[date_str]["orders"]["status"].setdefault("TOTAL", 0)
-                stats[date_str]["orders"]["status"].setdefault(order_status, 0)
-                stats[date_str]["orders"]["status"]["TOTAL"] += 1
-                stats[date_str]["orders"]["status"][order_status] += 1
-
-                for item in order["line_items"]:
-                    product_id = str(item["product_id"])
-                    product_name = item["product_name"]
-                    sku_image = item["sku_image"]
-                    product_entry = next(
-                        (
-                            p
-                            for p in stats[date_str]["products"]
-                            if p["product_id"] == product_id
-                        ),
-                        None,
-                    )
-                    if not product_entry:
-                        stats[date_str]["products"].append(
-                            {
-                                "product_id": product_id,
-                                "product_name": product_name,
-                                "sku_image": sku_image,
-                                "status": {"TOTAL": 1, order_status: 1},
-                                "sale_price": {
-                                    "TOTAL": round(float(item["sale_price"]), 2),
-                                    order_status: round(float(item["sale_price"]), 2),
-                                },
-                            }
-                        )
-                    else:
-                        product_entry["status"].setdefault(order_status, 0)
-                        product_entry["status"]["TOTAL"] += 1
-                        product_entry["status"][order_status] += 1
-                        product_entry["sale_price"].setdefault(order_status, 0)
-                        product_entry["sale_price"]["TOTAL"] = round(
-                            product_entry["sale_price"]["TOTAL"]
-                            + float(item["sale_price"]),
-                            2,
-                        )
-                        product_entry["sale_price"][order_status] = round(
-                            product_entry["sale_price"][order_status]
-                            + float(item["sale_price"]),
-                            2,
-                        )
-                stats[date_str]["products"] = sorted(
-                    stats[date_str]["products"],
-                    key=lambda x: x["status"]["TOTAL"],
-                    reverse=True,
-                )
-
-                shop_id = str(order["shop"]["id"])
-                shop_entry = next(
-                    (
-                        p
-                        for p in stats[date_str]["orders"]["shops"]
-                        if p["shop_id"] == shop_id
-                    ),
-                    None,
-                )
-                if not shop_entry:
-                    stats[date_str]["orders"]["shops"].append(
-                        {
-                            "shop_id": shop_id,
-                            "shop_name": str(order["shop"]["name"]),
-                            "shop_owner_id": str(order["shop_owner"]["id"]),
-                            "shop_owner_name": str(order["shop_owner"]["username"]),
-                            "status": {"TOTAL": 1, order_status: 1},
-                        }
-                    )
-                else:
-                    shop_entry["status"].setdefault(order_status, 0)
-                    shop_entry["status"]["TOTAL"] += 1
-                    shop_entry["status"][order_status] += 1
-                stats[date_str]["orders"]["shops"] = sorted(
-                    stats[date_str]["orders"]["shops"],
-                    key=lambda x: x["status"]["TOTAL"],
-                    reverse=True,
-                )
-
-                stats[date_str]["orders"]["payments"].setdefault("total_amount", {})
-                stats[date_str]["orders"]["payments"]["total_amount"].setdefault(
-                    "TOTAL", 0
-                )
-                stats[date_str]["orders"]["payments"]["total_amount"].setdefault(
-                    order_status, 0
-                )
-                stats[date_str]["orders"]["payments"]["total_amount"]["TOTAL"] = round(
-                    stats[date_str]["orders"]["payments"]["total_amount"]["TOTAL"]
-                    + float(order["payment"]["total_amount"]),
-                    2,
-                )
-                stats[date_str]["orders"]["payments"]["total_amount"][
-                    order_status
-                ] = round(
-                    stats[date_str]["orders"]["payments"]["total_amount"][order_status]
-                    + float(order["payment"]["total_amount"]),
-                    2,
-                )
-
-            formatted_stats = []
-            for date, data in stats.items():
-                formatted_stats.append(
-                    {
-                        "date": date,
-                        "orders": data["orders"],
-                        "products": data["products"],
-                    }
-                )
-
-            formatted_stats = sorted(
-                formatted_stats, key=lambda x: x["date"], reverse=True
+            order_filters = build_order_filters(all_order_filters)
+            shops, user_ids = get_shop_list(user, all_order_filters)
+            shop_users = get_shop_users(shops, user_ids)
+            rollup_shop_ids = rollup.order_rollup_shop_ids(
+                [shop.id for shop, _ in shop_users], order_filters["create_time_ge"]
             )
+            # Mọi shop đã có rollup và khoảng thời gian gồm trọn các ngày UTC thì đọc từ Postgres,
+            # nếu không thì tổng hợp từ đơn như cũ
+            if len(rollup_shop_ids) == len(shop_users) and rollup.covers_whole_days(
+                order_filters["create_time_ge"], order_filters["create_time_lt"]
+            ):
+                formatted_stats = rollup.get_order_stats(shop_users, order_filters)
+            else:
+                orders = get_all_order(user=user, filters=all_order_filters)
+                formatted_stats = aggregate_order_stats(orders)
             return JsonResponse({"status": "success", "data": formatted_stats})
         except Exception as e:
             print(e)
@@ -5,36 +5,33 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated as IsAuthenticated
 from rest_framework.response import Response
 
-from api.models import Notification, NotiMessage, Shop, UserShop
+from api.models import Notification, OrderWebhookEvent, Shop, UserShop
 from api.serializers import NotificationSerializer
 from api.views import APIView
 
 
 class WebhookDataView(APIView):
     def post(self, request):
+        """
+        Chỉ ghi event vào hàng đợi (một câu INSERT) rồi trả về ngay.
+        Thông báo và cập nhật order mirror do api.tasks.process_order_webhook_events xử lý theo batch.
+        """
         try:
             data = json.loads(request.body)
             shop_author_id = data.get("shop_id")
-            shop = Shop.objects.get(shop_id_author=shop_author_id)
-            pre_order_status = data["data"]["order_status"]
-            if pre_order_status == "AWAITING_SHIPMENT":
-                order_status = pre_order_status
-            else:
-                order_status = ""
-            user_shop = UserShop.objects.filter(shop=shop)
+            order_data = data.get("data") or {}
+            order_id = order_data.get("order_id")
+            if not shop_author_id or not order_id:
+                return JsonResponse({"status": "error", "message": "Missing shop_id or order_id"}, status=400)
 
-            if order_status is not None:
-                new_message = NotiMessage.objects.create(
-                    type="Order",
-                    message=f"New order {order_status} from shop: {shop.shop_name} and orderId {data['data']['order_id']}",
-                )
-                new_message.save()
-                notification = Notification.objects.create(
-                    user=user_shop[0].user, shop=shop, message=new_message, is_read=False
-                )
-                notification.save()
+            OrderWebhookEvent.objects.create(
+                shop_id_author=str(shop_author_id),
+                order_id=str(order_id),
+                order_status=order_data.get("order_status"),
+                payload=data,
+            )
 
-            return JsonResponse({"status": "success", "order_id": data["data"]["order_id"], "shop_id": shop.id})
+            return JsonResponse({"status": "success", "order_id": order_id, "shop_id": shop_author_id})
         except json.JSONDecodeError:
             return JsonResponse({"status": "error", "message": "Invalid JSON format"}, status=400)
 
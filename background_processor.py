@@ -3,17 +3,15 @@ import os
 import django
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tiktok.settings')
 django.setup()
 
-from api.models import CombineLabelTask
-from api.utils.pdf.download_pdf import download_pdf_from_url
-from api.utils.pdf.merge_pdf import merge_pdf_files
-from api.utils.google.googleapi import GoogleDriveService
+from api.utils import combine_pipeline, combine_queue
+from api.utils.constant import COMBINE_TASK_IDLE_CHECK_SECONDS
+from django.db import connection
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,6 +23,11 @@ class BackgroundProcessor:
         self.max_workers = max_workers
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
         self.active_tasks = set()  # Track active task IDs
+        # Tên worker ghi vào lease (locked_by) của task đang xử lý
+        self.worker = combine_queue.worker_name()
+        # Pipe để đánh thức vòng lặp khi một task xong hoặc khi stop
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
     
     def start(self):
         """Start background processor"""
@@ -38,17 +41,36 @@ class BackgroundProcessor:
     def stop(self):
         """Stop background processor"""
         self.running = False
+        self._wake()
         if self.thread:
             self.thread.join()
         self.executor.shutdown(wait=True)
         print("✅ Background processor stopped")
     
+    def _wake(self, *args):
+        os.write(self._wake_w, b"x")
+
+    def _drain_wake(self):
+        try:
+            while os.read(self._wake_r, 1024):
+                pass
+        except BlockingIOError:
+            pass
+    
     def _process_loop(self):
-        """Main processing loop"""
+        """
+        Main processing loop: nhận task bằng claim (SKIP LOCKED + lease) nên nhiều processor chạy
+        song song được, rồi chờ NOTIFY task mới hoặc task đang chạy xong thay vì poll mỗi 3 giây
+        """
         futures = {}  # Track futures for active tasks
+        listening = False
         
         while self.running:
             try:
+                if not listening:
+                    combine_queue.listen()
+                    listening = True
+                
                 # Check completed futures
                 completed_futures = []
                 for future in list(futures.keys()):
@@ -67,167 +89,50 @@ class BackgroundProcessor:
                 for future in completed_futures:
                     del futures[future]
                 
-                # Find pending tasks (exclude already processing ones)
-                pending_tasks = CombineLabelTask.objects.filter(
-                    status='PENDING'
-                ).exclude(id__in=self.active_tasks)
-                
-                # Submit new tasks up to max_workers limit
-                available_slots = self.max_workers - len(futures)
-                
-                for task in pending_tasks[:available_slots]:
-                    if not self.running:
+                # Claim pending tasks up to max_workers limit
+                while self.running and len(futures) < self.max_workers:
+                    task = combine_queue.claim_task(self.worker)
+                    if task is None:
                         break
                     
                     print(f"🚀 Starting task {task.id} in background...")
                     future = self.executor.submit(self._process_single_task, task)
+                    future.add_done_callback(self._wake)
                     futures[future] = task.id
                     self.active_tasks.add(task.id)
                 
+                # Task của worker đã chết quá số lần thử
+                combine_queue.fail_exhausted_tasks()
+                
                 # Show status
                 if futures:
-                    print(f"📊 Processing {len(futures)} tasks, {len(pending_tasks) - len(futures)} pending")
+                    print(f"📊 Processing {len(futures)} tasks")
                 
-                # Sleep for 3 seconds before next check
-                time.sleep(3)
+                # Chờ NOTIFY có task mới, task đang chạy xong hoặc hết thời gian kiểm tra định kỳ
+                combine_queue.wait_for_tasks(COMBINE_TASK_IDLE_CHECK_SECONDS, self._wake_r)
+                self._drain_wake()
                 
             except Exception as e:
                 print(f"Error in background processor: {e}")
+                # Mở lại connection (và LISTEN) ở vòng sau
+                connection.close()
+                listening = False
                 time.sleep(10)  # Wait longer on error
+        
+        connection.close()
     
     def _process_single_task(self, task):
-        """Process a single task"""
-        try:
-            # Refresh task from database to get latest status
-            task.refresh_from_db()
-            
-            # Check if task was cancelled
-            if task.status == 'CANCELLED':
-                return f"Task {task.id} was cancelled"
-            
-            # Update status to PROCESSING
-            task.status = 'PROCESSING'
-            task.started_at = timezone.now()
-            task.save()
-            
-            print(f"  [Task {task.id}] Starting processing {len(task.urls)} PDFs...")
-            overall_start_time = timezone.now()
-            
-            # Download PDFs with parallel processing
-            download_results = self._download_pdfs_parallel(task.urls, task.id)
-            successful_downloads = sum(1 for r in download_results if r.get('success', False))
-            
-            # Merge PDFs with optimization
-            print(f"  [Task {task.id}] Merging {successful_downloads} PDFs...")
-            start_merge_time = timezone.now()
-            merge_result = merge_pdf_files(download_results)
-            merge_duration = (timezone.now() - start_merge_time).total_seconds()
-            print(f"  [Task {task.id}] Merge completed in {merge_duration:.1f}s")
-            
-            if not merge_result['success']:
-                # Task failed
-                task.status = 'FAILED'
-                task.completed_at = timezone.now()
-                task.error_message = merge_result['error']
-                task.failed_count = len(task.urls)
-                task.failed_urls = merge_result.get('failed_urls', [])
-                task.save()
-                
-                return f"Task {task.id} failed: {merge_result['error']}"
-            
-            # Upload to Google Drive
-            print(f"  [Task {task.id}] Uploading to Google Drive...")
-            start_upload_time = timezone.now()
-            filename = f"combined_labels_{task.id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            upload_result = GoogleDriveService().upload_pdf_to_drive(
-                merge_result['pdf_buffer'], 
-                filename
-            )
-            upload_duration = (timezone.now() - start_upload_time).total_seconds()
-            print(f"  [Task {task.id}] Upload completed in {upload_duration:.1f}s")
-            
-            if not upload_result['success']:
-                # Upload failed
-                task.status = 'FAILED'
-                task.completed_at = timezone.now()
-                task.error_message = f"Failed to upload to Google Drive: {upload_result['error']}"
-                task.successful_count = len(merge_result['successful_urls'])
-                task.failed_count = len(merge_result['failed_urls'])
-                task.successful_urls = merge_result['successful_urls']
-                task.failed_urls = merge_result['failed_urls']
-                task.save()
-                
-                return f"Task {task.id} upload failed: {upload_result['error']}"
-            
-            # Success - Update task với kết quả
-            task.status = 'COMPLETED'
-            task.completed_at = timezone.now()
-            task.drive_link = upload_result['link']
-            task.successful_count = len(merge_result['successful_urls'])
-            task.failed_count = len(merge_result['failed_urls'])
-            task.successful_urls = merge_result['successful_urls']
-            task.failed_urls = merge_result['failed_urls']
-            task.save()
-            
-            # Calculate total processing time
-            total_duration = (timezone.now() - overall_start_time).total_seconds()
-            print(f"  [Task {task.id}] ✅ Total processing time: {total_duration:.1f}s")
-            
-            return f"Task {task.id} completed successfully in {total_duration:.1f}s! Drive: {upload_result['link']}"
-            
-        except Exception as e:
-            print(f"  ❌ Error processing task {task.id}: {str(e)}")
-            
-            # Update task với error
-            try:
-                task.status = 'FAILED'
-                task.completed_at = timezone.now()
-                task.error_message = str(e)
-                task.save()
-            except:
-                pass
-            
-            return f"Task {task.id} failed: {str(e)}"
-    
-    def _download_pdfs_parallel(self, urls, task_id, max_download_workers=10):
-        """Download PDFs in parallel for faster processing"""
-        download_results = []
-        
-        def download_single_pdf(url_with_index):
-            index, url = url_with_index
-            print(f"    [Task {task_id}] Downloading {index+1}/{len(urls)}: {url[:50]}...")
-            return download_pdf_from_url(url)
-        
-        # Use ThreadPoolExecutor for parallel downloads - increased workers
-        with ThreadPoolExecutor(max_workers=min(max_download_workers, len(urls))) as download_executor:
-            # Submit all download tasks
-            future_to_index = {
-                download_executor.submit(download_single_pdf, (i, url)): i 
-                for i, url in enumerate(urls)
-            }
-            
-            # Collect results in order
-            results_dict = {}
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
-                try:
-                    result = future.result()
-                    results_dict[index] = result
-                except Exception as e:
-                    print(f"    [Task {task_id}] Error downloading URL {index}: {e}")
-                    results_dict[index] = {
-                        'success': False,
-                        'error': str(e),
-                        'url': urls[index]
-                    }
-            
-            # Sort results by index to maintain order
-            download_results = [results_dict[i] for i in sorted(results_dict.keys())]
+        """Process a single claimed task với pipeline dùng chung (api/utils/combine_pipeline.py)"""
+        print(f"  [Task {task.id}] Starting processing {len(task.urls)} PDFs...")
         
-        successful_downloads = sum(1 for r in download_results if r.get('success', False))
-        print(f"    [Task {task_id}] Downloaded {successful_downloads}/{len(urls)} PDFs successfully")
+        def on_progress(stage, done, total):
+            if done == total:
+                print(f"  [Task {task.id}] {stage} {done}/{total}")
         
-        return download_results
+        result = combine_pipeline.process_claimed_task(task, self.worker, on_progress)
+        if result['status'] == 'COMPLETED':
+            return f"Task {task.id} completed successfully in {result['duration']:.1f}s! Drive: {result['drive_link']}"
+        return f"Task {task.id} failed: {result['error']}"
 
 def main():
     """Main function to run background processor"""
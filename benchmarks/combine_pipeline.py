@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+So sánh thời gian combine label: tải hết rồi mới merge (tuần tự theo giai đoạn) với
+combine_pipeline.iter_downloads (merge chạy song song với download qua reorder buffer).
+
+Sinh --labels label PDF giả (text + ảnh ngẫu nhiên), phục vụ bằng HTTP server local với độ trễ
+--latency giây mỗi request, rồi đo: chỉ download, chỉ merge (từ file đã tải), hai giai đoạn nối tiếp
+và pipeline chồng giai đoạn. Label cache được tắt để mỗi lần chạy đều tải thật.
+
+    python benchmarks/combine_pipeline.py --labels 1000 --latency 0.05 --workers 10
+"""
+import argparse
+import functools
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tiktok.settings")
+os.environ["LABEL_CACHE_ENABLED"] = "false"
+
+import django  # noqa: E402
+
+django.setup()
+
+from PyPDF2 import PdfWriter  # noqa: E402
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject  # noqa: E402
+
+from api.utils import combine_pipeline  # noqa: E402
+from api.utils.pdf.download_pdf import download_pdf_from_url  # noqa: E402
+from api.utils.pdf.merge_pdf import merge_pdf_files_to_file  # noqa: E402
+
+
+def generate_labels(directory, count, image_bytes):
+    """Label 4x6 inch, mỗi label một ảnh (nội dung ngẫu nhiên, không nén được) và một dòng text."""
+    for index in range(count):
+        writer = PdfWriter()
+        writer.add_blank_page(288, 432)
+        page = writer.pages[-1]
+        image = DecodedStreamObject()
+        image.set_data(os.urandom(image_bytes))
+        image.update(
+            {
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(image_bytes // 100),
+                NameObject("/Height"): NumberObject(100),
+                NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+            }
+        )
+        font = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): writer._add_object(image)}),
+                NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+            }
+        )
+        content = DecodedStreamObject()
+        content.set_data(f"q 200 0 0 100 44 250 cm /Im0 Do Q BT /F1 18 Tf 44 100 Td (LABEL {index}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+        with open(os.path.join(directory, f"{index}.pdf"), "wb") as file:
+            writer.write(file)
+
+
+def serve(directory, latency):
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    class Server(http.server.ThreadingHTTPServer):
+        # Backlog mặc định (5) làm rơi SYN khi nhiều luồng cùng kết nối, mỗi lần mất 1s retransmit
+        request_queue_size = 128
+
+    server = Server(("127.0.0.1", 0), functools.partial(Handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def download_all(urls, spool_dir, workers):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                lambda index: download_pdf_from_url(urls[index], path=os.path.join(spool_dir, f"{index:05d}.pdf")),
+                range(len(urls)),
+            )
+        )
+
+
+def timed(name, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    return name, elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="độ trễ mỗi request (giây)")
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--image-bytes", type=int, default=40000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as labels_dir:
+        generate_labels(labels_dir, args.labels, args.image_bytes)
+        server = serve(labels_dir, args.latency)
+        urls = [f"http://127.0.0.1:{server.server_port}/{index}.pdf" for index in range(args.labels)]
+
+        rows = []
+        with tempfile.TemporaryDirectory() as spool_dir:
+            rows.append(timed("download only", lambda: download_all(urls, spool_dir, args.workers)))
+            results = rows[-1][2]
+            rows.append(
+                timed("merge only", lambda: merge_pdf_files_to_file(results, os.path.join(spool_dir, "out.pdf")))
+            )
+        with tempfile.TemporaryDirectory() as spool_dir:
+            rows.append(
+                timed(
+                    "download, then merge",
+                    lambda: merge_pdf_files_to_file(
+                        download_all(urls, spool_dir, args.workers), os.path.join(spool_dir, "out.pdf")
+                    ),
+                )
+            )
+        with tempfile.TemporaryDirectory() as spool_dir:
+            rows.append(
+                timed(
+                    "overlapped pipeline",
+                    lambda: merge_pdf_files_to_file(
+                        combine_pipeline.iter_downloads(urls, spool_dir, workers=args.workers),
+                        os.path.join(spool_dir, "out.pdf"),
+                    ),
+                )
+            )
+        server.shutdown()
+
+    print(f"{args.labels} labels, {args.latency * 1000:.0f}ms latency, {args.workers} download workers")
+    for name, elapsed, result in rows:
+        merged = len(result["successful_urls"]) if isinstance(result, dict) else sum(r["success"] for r in result)
+        print(f"  {name:<22} {elapsed:7.2f}s  ({merged} labels)")
+    lower_bound = max(rows[0][1], rows[1][1])
+    print(f"  max(download, merge)   {lower_bound:7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: kích thước payload JSON và RSS của danh sách order khi mỗi order mang cả dict
+credentials của shop (cách cũ) so với tham chiếu gọn {"id", "name"} + shop_registry (cách mới).
+
+    python benchmarks/order_payload.py --orders 20000 --shops 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tiktok.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from api.utils.tiktok_base_api.order import attach_order_owner  # noqa: E402
+
+
+def make_shop(index):
+    return SimpleNamespace(
+        id=index,
+        shop_name=f"Shop {index}",
+        shop_cipher="ROW_" + "c" * 40,
+        access_token="ROW_" + "t" * 120,
+        app_key="6a" + "k" * 11,
+        app_secret="s" * 40,
+    )
+
+
+def make_orders(count, shop_index):
+    # Order JSON để giá trị khác nhau, các shop dict không bị interning
+    return [
+        {
+            "id": f"57{shop_index:04d}{i:012d}",
+            "status": "AWAITING_SHIPMENT",
+            "create_time": 1717000000 + i,
+            "update_time": 1717000500 + i,
+            "buyer_user_id": f"7{i:018d}",
+            "payment": {"currency": "USD", "total_amount": f"{10 + i % 90}.99"},
+            "line_items": [{"id": f"{i}1", "product_id": "172900", "sku_id": "172901", "product_name": "T-Shirt"}],
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_attach(orders, shop, user):
+    for order in orders:
+        order["shop_owner"] = {"id": user.id, "username": user.username}
+        order["shop"] = {
+            "id": shop.id,
+            "name": shop.shop_name,
+            "shop_cipher": shop.shop_cipher,
+            "access_token": shop.access_token,
+            "app_key": shop.app_key,
+            "app_secret": shop.app_secret,
+        }
+    return orders
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def measure(mode, orders_count, shops_count, result):
+    user = SimpleNamespace(id=1, username="seller")
+    attach = legacy_attach if mode == "legacy" else attach_order_owner
+    per_shop = orders_count // shops_count
+    raw = [make_orders(per_shop, index) for index in range(shops_count)]
+
+    rss_before = rss_bytes()
+    tracemalloc.start()
+    orders = []
+    for index, shop_orders in enumerate(raw):
+        orders.extend(attach(shop_orders, make_shop(index), user))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_bytes()
+
+    payload = json.dumps(orders)
+    result[mode] = {
+        "payload": len(payload.encode()),
+        "traced": peak,
+        "rss": rss_after - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--shops", type=int, default=20)
+    args = parser.parse_args()
+
+    manager = multiprocessing.Manager()
+    result = manager.dict()
+    # Mỗi cách chạy ở process riêng để RSS không ảnh hưởng lẫn nhau
+    for mode in ("legacy", "compact"):
+        process = multiprocessing.Process(target=measure, args=(mode, args.orders, args.shops, result))
+        process.start()
+        process.join()
+
+    legacy, compact = result["legacy"], result["compact"]
+    print(f"{args.orders} orders / {args.shops} shops")
+    for key, label in (("payload", "JSON payload"), ("traced", "attach alloc"), ("rss", "RSS delta")):
+        saved = legacy[key] - compact[key]
+        ratio = saved / legacy[key] * 100 if legacy[key] else 0
+        print(f"{label:>13}: legacy {legacy[key] / 1024:10.1f} KiB  compact {compact[key] / 1024:10.1f} KiB  (-{ratio:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Kiểm tra index của Package / ProductPackage bằng EXPLAIN trên dữ liệu sinh ngẫu nhiên.
+
+Sinh --packages package (mỗi package 2 product) trong một transaction, ANALYZE rồi EXPLAIN các
+query giống PackageFilter / GetNumbersortMax và kiểm tra plan có dùng index mong đợi không.
+Transaction được rollback ở cuối nên không để lại dữ liệu.
+
+    python benchmarks/package_indexes.py --packages 200000 --analyze
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tiktok.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import Exists, OuterRef  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from api.models import Package, ProductPackage, Shop  # noqa: E402
+from api.utils import package_query  # noqa: E402
+
+FULFILLMENTS = ["FlashShip", "PrintCare", "Ckf", "DropShip", "TeeClub", "Teelover"]
+STATUSES = [choice for choice, _ in Package.PackageStatus.choices]
+
+
+class Rollback(Exception):
+    pass
+
+
+def generate(packages, shops):
+    shop_ids = [
+        shop.id
+        for shop in Shop.objects.bulk_create(
+            [Shop(shop_name=f"bench {index}", access_token="x", auth_code="x") for index in range(shops)]
+        )
+    ]
+    package_table = Package._meta.db_table
+    product_table = ProductPackage._meta.db_table
+    with connection.cursor() as cursor:
+        # FlashShip/PrintCare chiếm phần lớn, các fulfillment và status còn lại hiếm hơn
+        cursor.execute(
+            f"""
+            INSERT INTO {package_table} (
+                order_id, buyer_address2, fulfillment_name, shop_id, pack_id, package_status,
+                created_at, update_time, supify_create_time, number_sort, status, is_primary
+            )
+            SELECT
+                '57' || lpad((i * 7919 %% 1000000007)::text, 16, '0'),
+                '',
+                (%(fulfillments)s::text[])[1 + (CASE WHEN random() < 0.9 THEN floor(random() * 2) ELSE 2 + floor(random() * 4) END)::int],
+                (%(shop_ids)s::bigint[])[1 + floor(random() * %(shops)s)::int],
+                'PACK' || (i / 3 * 2 + (i %% 3) / 2),
+                TRUE,
+                now() - random() * interval '365 days',
+                now(),
+                CASE WHEN random() < 0.5 THEN now() - random() * interval '30 days' END,
+                i %% 500,
+                (%(statuses)s::text[])[1 + (CASE WHEN random() < 0.95 THEN floor(random() * 3) ELSE 3 + floor(random() * (array_length(%(statuses)s::text[], 1) - 3)) END)::int],
+                FALSE
+            FROM generate_series(1, %(packages)s) AS i
+            """,
+            {
+                "fulfillments": FULFILLMENTS,
+                "shop_ids": shop_ids,
+                "shops": shops,
+                "statuses": STATUSES,
+                "packages": packages,
+            },
+        )
+        cursor.execute(
+            f"""
+            UPDATE {package_table} p SET is_primary = TRUE
+            FROM (
+                SELECT DISTINCT ON (pack_id) id FROM {package_table}
+                WHERE pack_id LIKE 'PACK%%'
+                ORDER BY pack_id, created_at, id
+            ) first
+            WHERE p.id = first.id
+            """
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {product_table} (package_id, product_name, quantity, created_at)
+            SELECT p.id, 'T-Shirt ' || md5(p.id::text || side), 1, p.created_at
+            FROM {package_table} p CROSS JOIN (VALUES ('front'), ('back')) AS s(side)
+            WHERE p.shop_id = ANY(%s)
+            """,
+            [shop_ids],
+        )
+        cursor.execute(f"ANALYZE {package_table}")
+        cursor.execute(f"ANALYZE {product_table}")
+    return shop_ids
+
+
+def index_names(plan):
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= index_names(child)
+    return names
+
+
+def explain(queryset, analyze):
+    sql, params = queryset.query.sql_with_params()
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN ({options}) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def existing_indexes():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename IN (%s, %s)",
+            [Package._meta.db_table, ProductPackage._meta.db_table],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def cases(shop_ids):
+    now = timezone.now()
+    newest = package_query.primary_packages().order_by("-created_at", "-id")
+    first_page = list(newest[:25])
+    yield "default page", newest[:25], {"package_primary_ctime_idx"}
+    yield (
+        "keyset next page",
+        package_query.after_cursor(newest, package_query.encode_cursor(first_page[-1]))[:25],
+        {"package_primary_ctime_idx"},
+    )
+    # Nhiều shop: quét package_primary_ctime_idx theo thứ tự rồi lọc shop thường rẻ hơn
+    yield (
+        "shop__id__in (3 shops)",
+        newest.filter(shop__id__in=shop_ids[:3])[:25],
+        {"package_shop_ctime_idx", "package_primary_ctime_idx"},
+    )
+    yield (
+        "shop__id__in (1 shop)",
+        newest.filter(shop__id__in=shop_ids[:1])[:25],
+        {"package_shop_ctime_idx"},
+    )
+    yield (
+        "fulfillment_name__in",
+        newest.filter(fulfillment_name__in=["TeeClub"])[:25],
+        {"package_ff_ctime_idx", "package_primary_ctime_idx"},
+    )
+    yield (
+        "status__in",
+        newest.filter(status__in=[STATUSES[-1]])[:25],
+        {"package_status_ctime_idx", "package_primary_ctime_idx"},
+    )
+    yield (
+        "shop + supify_create_time range",
+        newest.filter(shop__id__in=shop_ids[:2], supify_create_time__gte=now - timedelta(days=1))[:25],
+        {"package_shop_supify_idx", "package_shop_ctime_idx"},
+    )
+    yield (
+        "GetNumbersortMax",
+        Package.objects.filter(fulfillment_name="Teelover", supify_create_time__gte=now - timedelta(days=1)).values_list(
+            "number_sort", flat=True
+        ),
+        {"package_ff_supify_idx"},
+    )
+    yield (
+        "order_id__icontains",
+        newest.filter(order_id__icontains="0000123")[:25],
+        {"package_order_id_trgm_idx"},
+    )
+    yield (
+        "product_name__icontains",
+        newest.filter(
+            Exists(ProductPackage.objects.filter(package=OuterRef("pk"), product_name__icontains="ab12c"))
+        )[:25],
+        {"product_pkg_name_trgm_idx"},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--packages", type=int, default=200000)
+    parser.add_argument("--shops", type=int, default=50)
+    parser.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE (chạy query thật, có thời gian)")
+    args = parser.parse_args()
+
+    available = existing_indexes()
+    failures = 0
+    try:
+        with transaction.atomic():
+            started = time.perf_counter()
+            shop_ids = generate(args.packages, args.shops)
+            print(f"Generated {args.packages} packages / {args.shops} shops in {time.perf_counter() - started:.1f}s")
+            for name, queryset, expected in cases(shop_ids):
+                if not expected & available:
+                    print(f"SKIP {name}: index {', '.join(sorted(expected))} not created on this server")
+                    continue
+                result = explain(queryset, args.analyze)
+                used = index_names(result["Plan"])
+                ok = bool(used & expected)
+                failures += not ok
+                timing = f" {result['Execution Time']:.2f}ms" if args.analyze else ""
+                print(
+                    f"{'PASS' if ok else 'FAIL'} {name}: cost {result['Plan']['Total Cost']:.0f}{timing}, "
+                    f"indexes {sorted(used) or ['<seq scan>']}"
+                )
+            raise Rollback
+    except Rollback:
+        pass
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+So sánh các cách kiểm tra và ghép label PDF của combine label.
+
+Sinh --labels label PDF giả giống label TikTok: mỗi label nhúng cùng một font (--font, hoặc một
+font program giả --font-bytes byte) và cùng một logo, cộng một ảnh barcode và text riêng. Đo:
+
+- kiểm tra file sau khi tải: PyPDF2.PdfReader (parse toàn bộ) và download_pdf.check_pdf
+- ghép: PyPDF2.PdfMerger (merge_pdf_files, giữ mọi thứ trong bộ nhớ), StreamingPdfMerger không /
+  có dùng chung object, và pikepdf nếu đã cài
+
+    python benchmarks/pdf_backends.py --labels 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tiktok.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from PyPDF2 import PdfReader, PdfWriter  # noqa: E402
+from PyPDF2.generic import (  # noqa: E402
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+)
+
+from api.utils.pdf.download_pdf import check_pdf  # noqa: E402
+from api.utils.pdf.merge_pdf import PikePdfMerger, StreamingPdfMerger, merge_pdf_files  # noqa: E402
+
+
+def image(data, width):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    stream.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(width),
+            NameObject("/Height"): NumberObject(len(data) // width),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        }
+    )
+    return stream
+
+
+def generate_labels(directory, count, font_program, barcode_bytes):
+    """Label 4x6 inch: font nhúng và logo giống nhau ở mọi label, barcode và text riêng từng label."""
+    logo_data = random.Random(1).randbytes(8000)
+    for index in range(count):
+        writer = PdfWriter()
+        writer.add_blank_page(288, 432)
+        page = writer.pages[-1]
+
+        font_file = DecodedStreamObject()
+        font_file.set_data(font_program)
+        font_file[NameObject("/Length1")] = NumberObject(len(font_program))
+        descriptor = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/FontDescriptor"),
+                NameObject("/FontName"): NameObject("/LabelSans"),
+                NameObject("/Flags"): NumberObject(32),
+                NameObject("/FontBBox"): ArrayObject([NumberObject(v) for v in (0, -200, 1000, 900)]),
+                NameObject("/ItalicAngle"): NumberObject(0),
+                NameObject("/Ascent"): NumberObject(900),
+                NameObject("/Descent"): NumberObject(-200),
+                NameObject("/CapHeight"): NumberObject(700),
+                NameObject("/StemV"): NumberObject(80),
+                NameObject("/FontFile2"): writer._add_object(font_file),
+            }
+        )
+        font = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/TrueType"),
+                NameObject("/BaseFont"): NameObject("/LabelSans"),
+                NameObject("/FirstChar"): NumberObject(32),
+                NameObject("/LastChar"): NumberObject(32),
+                NameObject("/Widths"): ArrayObject([NumberObject(500)]),
+                NameObject("/FontDescriptor"): writer._add_object(descriptor),
+            }
+        )
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/XObject"): DictionaryObject(
+                    {
+                        NameObject("/Logo"): writer._add_object(image(logo_data, 100)),
+                        NameObject("/Bar"): writer._add_object(image(os.urandom(barcode_bytes), 100)),
+                    }
+                ),
+                NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+            }
+        )
+        content = DecodedStreamObject()
+        content.set_data(
+            b"q 100 0 0 80 20 330 cm /Logo Do Q q 240 0 0 80 24 200 cm /Bar Do Q "
+            + f"BT /F1 14 Tf 24 120 Td (ORDER {index:08d}) Tj ET".encode()
+        )
+        page[NameObject("/Contents")] = writer._add_object(content)
+        with open(os.path.join(directory, f"{index:05d}.pdf"), "wb") as file:
+            writer.write(file)
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def merge_with(merger_class, paths, output_path, **kwargs):
+    with merger_class(output_path, **kwargs) as merger:
+        for path in paths:
+            merger.append(path)
+    return merger
+
+
+def legacy_merge(paths, output_path):
+    results = []
+    for path in paths:
+        with open(path, "rb") as file:
+            results.append({"success": True, "url": path, "data": BytesIO(file.read())})
+    result = merge_pdf_files(results)
+    with open(output_path, "wb") as file:
+        file.write(result["pdf_buffer"].getbuffer())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", type=int, default=1000)
+    parser.add_argument("--font", help="file font (.ttf) nhúng vào label, mặc định dùng font program giả")
+    parser.add_argument("--font-bytes", type=int, default=40000)
+    parser.add_argument("--barcode-bytes", type=int, default=6000)
+    args = parser.parse_args()
+
+    if args.font:
+        with open(args.font, "rb") as font_file:
+            font_program = font_file.read()
+    else:
+        font_program = random.Random(0).randbytes(args.font_bytes)
+
+    with tempfile.TemporaryDirectory() as directory:
+        labels_dir = os.path.join(directory, "labels")
+        os.makedirs(labels_dir)
+        generate_labels(labels_dir, args.labels, font_program, args.barcode_bytes)
+        paths = sorted(os.path.join(labels_dir, name) for name in os.listdir(labels_dir))
+        input_size = sum(os.path.getsize(path) for path in paths)
+        print(f"{args.labels} labels, {input_size / 1e6:.1f} MB")
+
+        print("validation")
+        for name, check in (("PyPDF2.PdfReader", PdfReader), ("check_pdf", check_pdf)):
+            elapsed, _ = timed(lambda: [check(path) for path in paths])
+            print(f"  {name:<28} {elapsed:7.2f}s  {args.labels / elapsed:8.0f} labels/s")
+
+        backends = [
+            ("PdfMerger (merge_pdf_files)", legacy_merge),
+            ("streaming", lambda p, o: merge_with(StreamingPdfMerger, p, o, dedupe=False)),
+            ("streaming + shared objects", lambda p, o: merge_with(StreamingPdfMerger, p, o)),
+        ]
+        try:
+            import pikepdf  # noqa: F401
+
+            backends.append(("pikepdf", lambda p, o: merge_with(PikePdfMerger, p, o)))
+        except ImportError:
+            print("  (pikepdf is not installed, skipped)")
+
+        print("merge")
+        for name, merge in backends:
+            output_path = os.path.join(directory, "merged.pdf")
+            elapsed, _ = timed(lambda: merge(paths, output_path))
+            pages = len(PdfReader(output_path).pages)
+            size = os.path.getsize(output_path)
+            print(
+                f"  {name:<28} {elapsed:7.2f}s  {args.labels / elapsed:8.0f} labels/s"
+                f"  {size / 1e6:7.1f} MB  ({pages} pages)"
+            )
+            os.remove(output_path)
+
+
+if __name__ == "__main__":
+    main()
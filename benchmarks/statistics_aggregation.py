@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Benchmark: api/utils/statistics.py (một lượt, sort một lần) so với vòng lặp cũ của
+StatisticsApi / StatisticsFinanceApi (tìm entry bằng next(...) và sort lại sau mỗi bản ghi).
+Kiểm tra output giống hệt (so sánh JSON, giữ thứ tự key và thứ tự list) rồi in thời gian.
+
+    python benchmarks/statistics_aggregation.py --orders 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils.statistics import aggregate_order_stats, aggregate_statement_stats  # noqa: E402
+
+ORDER_STATUSES = ("UNPAID", "AWAITING_SHIPMENT", "AWAITING_COLLECTION", "IN_TRANSIT", "DELIVERED", "COMPLETED", "CANCELLED")
+PAYMENT_STATUSES = ("PAID", "FAILED", "PROCESSING")
+
+
+# Vòng lặp cũ, copy nguyên từ FinanceApi.py trước khi tách module
+def legacy_statement_stats(statements):
+    stats = {}
+    for statement in statements:
+        date_str = datetime.fromtimestamp(
+            statement["statement_time"], pytz.utc
+        ).strftime("%Y-%m-%d")
+        if date_str not in stats:
+            stats[date_str] = {
+                "statements": {
+                    "status": {},
+                    "shops": [],
+                },
+            }
+        payment_status = statement["payment_status"]
+        revenue_amount = float(statement["revenue_amount"])
+        settlement_amount = float(statement["settlement_amount"])
+        fee_amount = float(statement["fee_amount"])
+        adjustment_amount = float(statement["adjustment_amount"])
+        stats[date_str]["statements"]["status"].setdefault(
+            "TOTAL",
+            {
+                "revenue_amount": 0,
+                "settlement_amount": 0,
+                "fee_amount": 0,
+                "adjustment_amount": 0,
+            },
+        )
+        stats[date_str]["statements"]["status"].setdefault(
+            payment_status,
+            {
+                "revenue_amount": 0,
+                "settlement_amount": 0,
+                "fee_amount": 0,
+                "adjustment_amount": 0,
+            },
+        )
+        stats[date_str]["statements"]["status"]["TOTAL"][
+            "revenue_amount"
+        ] = round(
+            stats[date_str]["statements"]["status"]["TOTAL"]["revenue_amount"]
+            + revenue_amount,
+            2,
+        )
+        stats[date_str]["statements"]["status"][payment_status][
+            "revenue_amount"
+        ] = round(
+            stats[date_str]["statements"]["status"][payment_status][
+                "revenue_amount"
+            ]
+            + revenue_amount,
+            2,
+        )
+        stats[date_str]["statements"]["status"]["TOTAL"][
+            "settlement_amount"
+        ] = round(
+            stats[date_str]["statements"]["status"]["TOTAL"][
+                "settlement_amount"
+            ]
+            + settlement_amount,
+            2,
+        )
+        stats[date_str]["statements"]["status"][payment_status][
+            "settlement_amount"
+        ] = round(
+            stats[date_str]["statements"]["status"][payment_status][
+                "settlement_amount"
+            ]
+            + settlement_amount,
+            2,
+        )
+        stats[date_str]["statements"]["status"]["TOTAL"]["fee_amount"] = round(
+            stats[date_str]["statements"]["status"]["TOTAL"]["fee_amount"]
+            + fee_amount,
+            2,
+        )
+        stats[date_str]["statements"]["status"][payment_status][
+            "fee_amount"
+        ] = round(
+            stats[date_str]["statements"]["status"][payment_status][
+                "fee_amount"
+            ]
+            + fee_amount,
+            2,
+        )
+        stats[date_str]["statements"]["status"]["TOTAL"][
+            "adjustment_amount"
+        ] = round(
+            stats[date_str]["statements"]["status"]["TOTAL"][
+                "adjustment_amount"
+            ]
+            + adjustment_amount,
+            2,
+        )
+        stats[date_str]["statements"]["status"][payment_status][
+            "adjustment_amount"
+        ] = round(
+            stats[date_str]["statements"]["status"][payment_status][
+                "adjustment_amount"
+            ]
+            + adjustment_amount,
+            2,
+        )
+
+        shop_id = str(statement["shop"]["id"])
+        shop_entry = next(
+            (
+                p
+                for p in stats[date_str]["statements"]["shops"]
+                if p["shop_id"] == shop_id
+            ),
+            None,
+        )
+        if not shop_entry:
+            stats[date_str]["statements"]["shops"].append(
+                {
+                    "shop_id": shop_id,
+                    "shop_name": str(statement["shop"]["name"]),
+                    "shop_owner_id": str(statement["shop_owner"]["id"]),
+                    "shop_owner_name": str(statement["shop_owner"]["username"]),
+                    "status": {
+                        "TOTAL": {
+                            "revenue_amount": revenue_amount,
+                            "settlement_amount": settlement_amount,
+                            "fee_amount": fee_amount,
+                            "adjustment_amount": adjustment_amount,
+                        },
+                        payment_status: {
+                            "revenue_amount": revenue_amount,
+                            "settlement_amount": settlement_amount,
+                            "fee_amount": fee_amount,
+                            "adjustment_amount": adjustment_amount,
+                        },
+                    },
+                }
+            )
+        else:
+            shop_entry["status"].setdefault(
+                payment_status,
+                {
+                    "revenue_amount": 0,
+                    "settlement_amount": 0,
+                    "fee_amount": 0,
+                    "adjustment_amount": 0,
+                },
+            )
+            shop_entry["status"]["TOTAL"]["revenue_amount"] = round(
+                shop_entry["status"]["TOTAL"]["revenue_amount"]
+                + revenue_amount,
+                2,
+            )
+            shop_entry["status"]["TOTAL"]["settlement_amount"] = round(
+                shop_entry["status"]["TOTAL"]["settlement_amount"]
+                + settlement_amount,
+                2,
+            )
+            shop_entry["status"]["TOTAL"]["fee_amount"] = round(
+                shop_entry["status"]["TOTAL"]["fee_amount"] + fee_amount, 2
+            )
+            shop_entry["status"]["TOTAL"]["adjustment_amount"] = round(
+                shop_entry["status"]["TOTAL"]["adjustment_amount"]
+                + adjustment_amount,
+                2,
+            )
+            shop_entry["status"][payment_status]["revenue_amount"] = round(
+                shop_entry["status"][payment_status]["revenue_amount"]
+                + revenue_amount,
+                2,
+            )
+            shop_entry["status"][payment_status]["settlement_amount"] = round(
+                shop_entry["status"][payment_status]["settlement_amount"]
+                + settlement_amount,
+                2,
+            )
+            shop_entry["status"][payment_status]["fee_amount"] = round(
+                shop_entry["status"][payment_status]["fee_amount"] + fee_amount,
+                2,
+            )
+            shop_entry["status"][payment_status]["adjustment_amount"] = round(
+                shop_entry["status"][payment_status]["adjustment_amount"]
+                + adjustment_amount,
+                2,
+            )
+        stats[date_str]["statements"]["shops"] = sorted(
+            stats[date_str]["statements"]["shops"],
+            key=lambda x: x["status"]["TOTAL"]["revenue_amount"],
+            reverse=True,
+        )
+
+    formatted_stats = []
+    for date, data in stats.items():
+        formatted_stats.append(
+            {
+                "date": date,
+                "statements": data["statements"],
+                # "products": data["products"],
+            }
+        )
+
+    formatted_stats = sorted(
+        formatted_stats, key=lambda x: x["date"], reverse=True
+    )
+    return formatted_stats
+
+
+def legacy_order_stats(orders):
+    stats = {}
+    for order in orders:
+        date_str = datetime.fromtimestamp(
+            order["create_time"], pytz.utc
+        ).strftime("%Y-%m-%d")
+        if date_str not in stats:
+            stats[date_str] = {
+                "orders": {
+                    "status": {},
+                    "payments": {},
+                    "shops": [],
+                    "shop_owner": {},
+                },
+                "products": [],
+            }
+
+        order_status = order["status"]
+
+        stats[date_str]["orders"]["status"].setdefault("TOTAL", 0)
+        stats[date_str]["orders"]["status"].setdefault(order_status, 0)
+        stats[date_str]["orders"]["status"]["TOTAL"] += 1
+        stats[date_str]["orders"]["status"][order_status] += 1
+
+        for item in order["line_items"]:
+            product_id = str(item["product_id"])
+            product_name = item["product_name"]
+            sku_image = item["sku_image"]
+            product_entry = next(
+                (
+                    p
+                    for p in stats[date_str]["products"]
+                    if p["product_id"] == product_id
+                ),
+                None,
+            )
+            if not product_entry:
+                stats[date_str]["products"].append(
+                    {
+                        "product_id": product_id,
+                        "product_name": product_name,
+                        "sku_image": sku_image,
+                        "status": {"TOTAL": 1, order_status: 1},
+                        "sale_price": {
+                            "TOTAL": round(float(item["sale_price"]), 2),
+                            order_status: round(float(item["sale_price"]), 2),
+                        },
+                    }
+                )
+            else:
+                product_entry["status"].setdefault(order_status, 0)
+                product_entry["status"]["TOTAL"] += 1
+                product_entry["status"][order_status] += 1
+                product_entry["sale_price"].setdefault(order_status, 0)
+                product_entry["sale_price"]["TOTAL"] = round(
+                    product_entry["sale_price"]["TOTAL"]
+                    + float(item["sale_price"]),
+                    2,
+                )
+                product_entry["sale_price"][order_status] = round(
+                    product_entry["sale_price"][order_status]
+                    + float(item["sale_price"]),
+                    2,
+                )
+        stats[date_str]["products"] = sorted(
+            stats[date_str]["products"],
+            key=lambda x: x["status"]["TOTAL"],
+            reverse=True,
+        )
+
+        shop_id = str(order["shop"]["id"])
+        shop_entry = next(
+            (
+                p
+                for p in stats[date_str]["orders"]["shops"]
+                if p["shop_id"] == shop_id
+            ),
+            None,
+        )
+        if not shop_entry:
+            stats[date_str]["orders"]["shops"].append(
+                {
+                    "shop_id": shop_id,
+                    "shop_name": str(order["shop"]["name"]),
+                    "shop_owner_id": str(order["shop_owner"]["id"]),
+                    "shop_owner_name": str(order["shop_owner"]["username"]),
+                    "status": {"TOTAL": 1, order_status: 1},
+                }
+            )
+        else:
+            shop_entry["status"].setdefault(order_status, 0)
+            shop_entry["status"]["TOTAL"] += 1
+            shop_entry["status"][order_status] += 1
+        stats[date_str]["orders"]["shops"] = sorted(
+            stats[date_str]["orders"]["shops"],
+            key=lambda x: x["status"]["TOTAL"],
+            reverse=True,
+        )
+
+        stats[date_str]["orders"]["payments"].setdefault("total_amount", {})
+        stats[date_str]["orders"]["payments"]["total_amount"].setdefault(
+            "TOTAL", 0
+        )
+        stats[date_str]["orders"]["payments"]["total_amount"].setdefault(
+            order_status, 0
+        )
+        stats[date_str]["orders"]["payments"]["total_amount"]["TOTAL"] = round(
+            stats[date_str]["orders"]["payments"]["total_amount"]["TOTAL"]
+            + float(order["payment"]["total_amount"]),
+            2,
+        )
+        stats[date_str]["orders"]["payments"]["total_amount"][
+            order_status
+        ] = round(
+            stats[date_str]["orders"]["payments"]["total_amount"][order_status]
+            + float(order["payment"]["total_amount"]),
+            2,
+        )
+
+    formatted_stats = []
+    for date, data in stats.items():
+        formatted_stats.append(
+            {
+                "date": date,
+                "orders": data["orders"],
+                "products": data["products"],
+            }
+        )
+
+    formatted_stats = sorted(
+        formatted_stats, key=lambda x: x["date"], reverse=True
+    )
+    return formatted_stats
+
+
+def make_orders(count, days, shops, products, seed):
+    rng = random.Random(seed)
+    start = 1717200000
+    orders = []
+    for i in range(count):
+        shop = rng.randrange(shops)
+        orders.append(
+            {
+                "id": str(i),
+                "create_time": start + rng.randrange(days * 86400),
+                "status": rng.choice(ORDER_STATUSES),
+                "shop": {"id": shop, "name": f"Shop {shop}"},
+                "shop_owner": {"id": shop % 5, "username": f"seller{shop % 5}"},
+                "payment": {"total_amount": f"{rng.randrange(100, 9000) / 100:.2f}"},
+                "line_items": [
+                    {
+                        "product_id": str(product),
+                        "product_name": f"Product {product}",
+                        "sku_image": {"url": f"https://img/{product}.jpg"},
+                        "sale_price": f"{rng.randrange(100, 5000) / 100:.2f}",
+                    }
+                    for product in (rng.randrange(products) for _ in range(rng.choice((1, 1, 1, 2, 3))))
+                ],
+            }
+        )
+    return orders
+
+
+def make_statements(count, days, shops, seed):
+    rng = random.Random(seed)
+    start = 1717200000
+    statements = []
+    for _ in range(count):
+        shop = rng.randrange(shops)
+        # Có cả số tiền 0 và âm để kiểm tra thứ tự khi doanh thu đứng yên / giảm
+        revenue = rng.choice((0, 0, -rng.randrange(1, 500), rng.randrange(1, 5000))) / 100
+        statements.append(
+            {
+                "statement_time": start + rng.randrange(days * 86400),
+                "payment_status": rng.choice(PAYMENT_STATUSES),
+                "revenue_amount": f"{revenue:.2f}",
+                "settlement_amount": f"{rng.randrange(-500, 5000) / 100:.2f}",
+                "fee_amount": f"{-rng.randrange(0, 800) / 100:.2f}",
+                "adjustment_amount": f"{rng.choice((0, 0, rng.randrange(-300, 300))) / 100:.2f}",
+                "shop": {"id": shop, "name": f"Shop {shop}"},
+                "shop_owner": {"id": shop % 5, "username": f"seller{shop % 5}"},
+            }
+        )
+    return statements
+
+
+def timed(func, data):
+    started = time.perf_counter()
+    result = func(data)
+    return result, time.perf_counter() - started
+
+
+def compare(label, legacy_func, new_func, data):
+    legacy, legacy_time = timed(legacy_func, json.loads(json.dumps(data)))
+    new, new_time = timed(new_func, json.loads(json.dumps(data)))
+    same = json.dumps(legacy) == json.dumps(new)
+    print(f"{label:>32}: legacy {legacy_time:8.3f}s  new {new_time:7.3f}s  x{legacy_time / new_time:6.1f}  identical={same}")
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--shops", type=int, default=50)
+    parser.add_argument("--products", type=int, default=500)
+    args = parser.parse_args()
+
+    ok = True
+    # Vài bộ nhỏ nhiều giá trị trùng nhau để kiểm tra thứ tự tie
+    for seed in range(20):
+        ok &= compare(f"orders ties seed={seed}", legacy_order_stats, aggregate_order_stats, make_orders(2000, 2, 8, 12, seed))
+        ok &= compare(f"statements ties seed={seed}", legacy_statement_stats, aggregate_statement_stats, make_statements(2000, 2, 8, seed))
+
+    orders = make_orders(args.orders, args.days, args.shops, args.products, seed=1)
+    ok &= compare(f"{args.orders} orders", legacy_order_stats, aggregate_order_stats, orders)
+    statements = make_statements(args.orders, args.days, args.shops, seed=1)
+    ok &= compare(f"{args.orders} statements", legacy_statement_stats, aggregate_statement_stats, statements)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
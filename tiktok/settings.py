@@ -123,8 +123,7 @@ DATABASES = {
         "PORT": config("DB_PORT"),
         "TEST": {
             "NAME": "tiktok",
-            "CHARSET": "utf8mb4",
-            "COLLATION": "utf8mb4_0900_ai_ci",
+            "CHARSET": "UTF8",
         },
     }
 }
@@ -325,6 +324,18 @@ CELERY_TIMEZONE = 'UTC'
 # Celery Beat Schedule (nếu cần)
 CELERY_BEAT_SCHEDULE = {
     # Có thể thêm periodic tasks ở đây
+    "sync-tiktok-orders": {
+        "task": "api.tasks.sync_all_shop_orders",
+        "schedule": int(os.getenv("ORDER_SYNC_INTERVAL_SECONDS", 60)),
+    },
+    "process-tiktok-order-webhooks": {
+        "task": "api.tasks.process_order_webhook_events",
+        "schedule": int(os.getenv("ORDER_WEBHOOK_INTERVAL_SECONDS", 5)),
+    },
+    "sync-tiktok-statements": {
+        "task": "api.tasks.sync_all_shop_statements",
+        "schedule": int(os.getenv("STATEMENT_SYNC_INTERVAL_SECONDS", 900)),
+    },
 }
 
 PUB_ENVIRONMENT = os.getenv("PUB_ENVIRONMENT", "dev")